@@ -95,6 +95,8 @@ doctype_tree_js = {"WBS item" : "public/js/wbs_item_tree.js",
 # before_install = "project_costing.install.before_install"
 # after_install = "project_costing.install.after_install"
 
+after_migrate = "project_costing.project_costing.utils.indexes.after_migrate"
+
 # Uninstallation
 # ------------
 
@@ -147,6 +149,11 @@ doctype_tree_js = {"WBS item" : "public/js/wbs_item_tree.js",
 # ---------------
 # Hook on document methods and events
 doc_events = {
+    "Item": {
+        "on_update": "project_costing.project_costing.doc_events.item.on_update",
+        "on_trash": "project_costing.project_costing.doc_events.item.on_trash",
+        "after_rename": "project_costing.project_costing.doc_events.item.after_rename"
+    },
     "WBS item": {
         "validate": "project_costing.project_costing.doc_events.wbs_item.validate"
     },
@@ -163,6 +170,7 @@ doc_events = {
         "on_update": "project_costing.project_costing.doc_events.stock_entry.on_update"
     },
 }
+# WBS Quantity Ledger postings; off until the ledger replaces the recomputed WBS balances
 # doc_events = {
 # 	"Material Request":{
 #         "on_submit": "project_costing.project_costing.doc_events.material_request.on_submit",
@@ -186,6 +194,12 @@ doc_events = {
 # ---------------
 
 scheduler_events = {
+	"all": [
+		"project_costing.project_costing.doc_events.wbs_item.process_wbs_recalc_queue",
+	],
+	"hourly": [
+		"project_costing.project_costing.doctype.wbs_item.wbs_item_parallel_import.finish_stale_wbs_imports",
+	],
 	"daily": [
 		"project_costing.project_costing.doctype.wbs_item.wbs_item.update_wbs_items",
 	]
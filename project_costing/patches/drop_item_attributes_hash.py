@@ -0,0 +1,9 @@
+import frappe
+
+from project_costing.project_costing.utils.item_cache import ITEM_CACHE_KEY
+
+
+def execute():
+    # Item attributes used to be cached in one Redis hash without expiry; they now
+    # live under per-item keys that expire, so drop the old hash
+    frappe.cache.delete_value(ITEM_CACHE_KEY)
@@ -0,0 +1,7 @@
+import frappe
+
+
+def execute():
+    # Parallel WBS imports inserted rows under planned names without a serial number
+    if frappe.db.table_exists("WBS item"):
+        frappe.db.sql("UPDATE `tabWBS item` SET `serial_no` = `name` WHERE IFNULL(`serial_no`, '') = ''")
@@ -0,0 +1,9 @@
+import frappe
+
+from project_costing.project_costing.doctype.wbs_quantity_ledger.wbs_quantity_ledger import FOLDED_UPTO_KEY
+
+
+def execute():
+    # The ledger now folds into its own ledger_* fields of WBS item; fold every entry
+    # into them again, from the first one
+    frappe.db.sql("DELETE FROM `tabSeries` WHERE `name` = %s", FOLDED_UPTO_KEY)
@@ -0,0 +1,10 @@
+import frappe
+
+from project_costing.project_costing.doctype.wbs_item.wbs_item import WBS_SERIES_KEY, get_wbs_series_start
+from project_costing.project_costing.utils.naming import seed_series
+
+
+def execute():
+    # WBS item names now come from the "WBS-" counter; start it after the existing names
+    if frappe.db.table_exists("WBS item"):
+        seed_series(WBS_SERIES_KEY, get_wbs_series_start())
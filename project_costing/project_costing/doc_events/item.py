@@ -0,0 +1,10 @@
+from project_costing.project_costing.utils.item_cache import clear_item_attributes
+
+def on_update(self, method):
+    clear_item_attributes(self.name)
+
+def on_trash(self, method):
+    clear_item_attributes(self.name)
+
+def after_rename(self, method, old_name, new_name, merge=False):
+    clear_item_attributes(old_name, new_name)
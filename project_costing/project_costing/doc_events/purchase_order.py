@@ -1,65 +1,23 @@
 import frappe
-from frappe import _
-from project_costing.project_costing.doc_events.wbs_item import get_purchase_order_items
+from project_costing.project_costing.doc_events.wbs_item import queue_wbs_recalculation
+from project_costing.project_costing.doctype.wbs_quantity_ledger.wbs_quantity_ledger import post_wbs_movements, reverse_wbs_movements
         
 def on_update(self, method):
-    for item in self.items:
-        wbs = frappe.get_doc("WBS item", item.custom_wbs)
-        get_purchase_order_items("Purchase Order Item", wbs)
+    # Recomputed once per WBS item by the queue worker, after this save commits
+    queue_wbs_recalculation(item.custom_wbs for item in self.items)
 
 def on_submit(self, method):
-    for row in self.items:
-        if row.custom_wbs:
-            wbs_doc = frappe.get_doc("WBS item", row.custom_wbs)
-            if not wbs_doc:
-                frappe.throw(_("WBS Item {0} not found").format(row.custom_wbs))
-            pr__reserved_qty = wbs_doc.pr__reserved_qty
-            
-            if row.qty > pr__reserved_qty:
-                frappe.throw(
-                    _("Insufficient quantity available for {0}. Requested: {1}, Available: {2}")
-                    .format(row.custom_cost_code, row.qty, pr__reserved_qty)
-                )
-            if row.amount>wbs_doc.available_amount:
-                frappe.throw(
-                    _("Insufficient balance available for {0}. Requested: {1}, Available: {2}")
-                    .format(row.custom_cost_code, row.amount, wbs_doc.available_amount)
-                )
-            
-            # Update the available quantity
-            wbs_doc.pr__reserved_qty = pr__reserved_qty - row.qty
-            wbs_doc.po_reserved_qty= wbs_doc.po_reserved_qty+row.qty
-            wbs_doc.total=wbs_doc.total+row.amount
-            wbs_doc.available_amount=wbs_doc.available_amount-row.amount
-            try:
-                wbs_doc.save(ignore_permissions=True)
-                frappe.db.commit()
-            except Exception as e:
-                frappe.db.rollback()
-                frappe.throw(
-                    _("Failed to update quantity for WBS Item {0}. Please try again.")
-                    .format(row.custom_wbs)
-                )
+    # Append ledger entries only; nothing is checked or locked until the ledger is
+    # the single source of the WBS quantities
+    post_wbs_movements(self, self.items, order_reserved_qty)
+
+def order_reserved_qty(row):
+    return {
+        "pr_reserved_qty": -row.qty,
+        "po_reserved_qty": row.qty,
+        "amount": row.amount,
+        "available_amount": -row.amount,
+    }
 
 def on_cancel(self, method):
-    for row in self.items:
-        if row.custom_wbs:
-            try:
-                wbs_doc = frappe.get_doc("WBS item", row.custom_wbs)
-                if not wbs_doc:
-                    frappe.throw(_("WBS Item {0} not found").format(row.custom_wbs))
-                
-                # Restore the available quantity
-                wbs_doc.pr__reserved_qty = wbs_doc.pr__reserved_qty + row.qty
-                wbs_doc.po_reserved_qty= wbs_doc.po_reserved_qty-row.qty
-                wbs_doc.total=wbs_doc.total-row.amount
-                wbs_doc.available_amount=wbs_doc.available_amount+row.amount
-                
-                wbs_doc.save(ignore_permissions=True)
-                frappe.db.commit()
-            except Exception as e:
-                frappe.db.rollback()
-                frappe.throw(
-                    _("Failed to restore quantity for WBS Item {0}. Please try again.")
-                    .format(row.custom_wbs)
-                )
\ No newline at end of file
+    reverse_wbs_movements(self)
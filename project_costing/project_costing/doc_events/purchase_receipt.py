@@ -1,56 +1,18 @@
 import frappe
-from frappe import _
-from project_costing.project_costing.doc_events.wbs_item import update_petty_cash_data
+from project_costing.project_costing.doc_events.wbs_item import queue_wbs_recalculation
+from project_costing.project_costing.doctype.wbs_quantity_ledger.wbs_quantity_ledger import post_wbs_movements, reverse_wbs_movements
 
 def on_update(self, method):
-    for item in self.items:
-        wbs = frappe.get_doc("WBS item", item.custom_wbs)
-        update_petty_cash_data(wbs)
+    # Recomputed once per WBS item by the queue worker, after this save commits
+    queue_wbs_recalculation(item.custom_wbs for item in self.items)
 
 def on_submit(self, method):
-    for row in self.items:
-        if row.custom_wbs:
-            wbs_doc = frappe.get_doc("WBS item", row.custom_wbs)
-            if not wbs_doc:
-                frappe.throw(_("WBS Item {0} not found").format(row.custom_wbs))
-            
-            if row.qty > wbs_doc.po_reserved_qty:
-                frappe.throw(
-                    _( "Insufficient PO reserved quantity for {0}. Requested: {1}, Available: {2}")
-                    .format(row.custom_cost_code, row.qty, wbs_doc.po_reserved_qty)
-                )
-            
-            # Update quantities
-            wbs_doc.po_reserved_qty -= row.qty
-            wbs_doc.custom_qty_in_hand += row.qty
-            
-            try:
-                wbs_doc.save(ignore_permissions=True)
-                frappe.db.commit()
-            except Exception as e:
-                frappe.db.rollback()
-                frappe.throw(
-                    _( "Failed to update quantity for WBS Item {0}. Please try again.")
-                    .format(row.custom_wbs)
-                )
+    # Append ledger entries only; nothing is checked or locked until the ledger is
+    # the single source of the WBS quantities
+    post_wbs_movements(self, self.items, receive_ordered_qty)
+
+def receive_ordered_qty(row):
+    return {"po_reserved_qty": -row.qty, "qty_in_hand": row.qty}
 
 def on_cancel(self, method):
-    for row in self.items:
-        if row.custom_wbs:
-            try:
-                wbs_doc = frappe.get_doc("WBS item", row.custom_wbs)
-                if not wbs_doc:
-                    frappe.throw(_("WBS Item {0} not found").format(row.custom_wbs))
-                
-                # Restore the quantities
-                wbs_doc.po_reserved_qty += row.qty
-                wbs_doc.custom_qty_in_hand -= row.qty
-                
-                wbs_doc.save(ignore_permissions=True)
-                frappe.db.commit()
-            except Exception as e:
-                frappe.db.rollback()
-                frappe.throw(
-                    _( "Failed to restore quantity for WBS Item {0}. Please try again.")
-                    .format(row.custom_wbs)
-                )
+    reverse_wbs_movements(self)
@@ -1,63 +1,26 @@
 import frappe
-from frappe import _
+from project_costing.project_costing.doc_events.wbs_item import queue_wbs_recalculation
+from project_costing.project_costing.doctype.wbs_quantity_ledger.wbs_quantity_ledger import post_wbs_movements, reverse_wbs_movements
 
 def on_update(self, method):
-    for item in self.items:
-        frappe.get_doc("WBS item", item.custom_wbs).validate()
-        
+    # Recomputed once per WBS item by the queue worker, after this save commits
+    queue_wbs_recalculation(item.custom_wbs for item in self.items)
+
 def on_submit(self, method):
     # Only proceed if the stock entry purpose is Material Issue
     if self.purpose != "Material Issue":
         return
 
-    for row in self.items:
-        if row.custom_wbs:
-            wbs_doc = frappe.get_doc("WBS item", row.custom_wbs)
-            if not wbs_doc:
-                frappe.throw(_("WBS Item {0} not found").format(row.custom_wbs))
-            
-            # Check if enough on-hand quantity is available
-            if row.qty > wbs_doc.custom_qty_in_hand:
-                frappe.throw(
-                    _("Insufficient on-hand quantity available for {0}. Requested: {1}, Available: {2}")
-                    .format(row.custom_cost_code, row.qty, wbs_doc.custom_qty_in_hand)
-                )
-            
-            # Adjust quantities: subtract from on-hand and add to consumed_quantity
-            wbs_doc.custom_qty_in_hand -= row.qty
-            wbs_doc.consumed_quantity = int (wbs_doc.consumed_quantity) + row.qty
-            
-            try:
-                wbs_doc.save(ignore_permissions=True)
-                frappe.db.commit()
-            except Exception as e:
-                frappe.db.rollback()
-                frappe.throw(
-                    _("Failed to update quantity for WBS Item {0}. Please try again.")
-                    .format(row.custom_wbs)
-                )
+    # Append ledger entries only; nothing is checked or locked until the ledger is
+    # the single source of the WBS quantities
+    post_wbs_movements(self, self.items, consume_qty_in_hand)
+
+def consume_qty_in_hand(row):
+    return {"qty_in_hand": -row.qty, "consumed_qty": row.qty}
 
 def on_cancel(self, method):
     # Only proceed if the stock entry purpose is Material Issue
     if self.purpose != "Material Issue":
         return
 
-    for row in self.items:
-        if row.custom_wbs:
-            try:
-                wbs_doc = frappe.get_doc("WBS item", row.custom_wbs)
-                if not wbs_doc:
-                    frappe.throw(_("WBS Item {0} not found").format(row.custom_wbs))
-                
-                # Reverse the changes: add back to on-hand and subtract from consumed_quantity
-                wbs_doc.custom_qty_in_hand += row.qty
-                wbs_doc.consumed_quantity -= row.qty
-                
-                wbs_doc.save(ignore_permissions=True)
-                frappe.db.commit()
-            except Exception as e:
-                frappe.db.rollback()
-                frappe.throw(
-                    _("Failed to restore quantity for WBS Item {0}. Please try again.")
-                    .format(row.custom_wbs)
-                )
+    reverse_wbs_movements(self)
@@ -1,47 +1,60 @@
+from functools import partial
+
 import frappe
+from project_costing.project_costing.doctype.wbs_item.wbs_item import (
+    WBS_TOTAL_FIELDS,
+    get_boq_reservation_totals,
+    recalculate_wbs_items,
+)
+
+# Saving a Material Request, Purchase Order, Purchase Receipt or Stock Entry only
+# records the WBS items it touches in a Redis set, once the save has committed. A
+# deduplicated short-queue job drains the set and recomputes each WBS item once,
+# however many rows or saves pointed at it in the meantime.
+
+WBS_RECALC_QUEUE = "project_costing:wbs_recalc_queue"
+WBS_RECALC_BATCH_SIZE = 500
+WBS_RECALC_JOB_ID = "project_costing::wbs_recalc_queue"
+
+def queue_wbs_recalculation(names):
+    names = {name for name in names if name}
+    if names:
+        frappe.db.after_commit.add(partial(push_wbs_recalculation, names))
+
+def push_wbs_recalculation(names):
+    frappe.cache.sadd(WBS_RECALC_QUEUE, *names)
+    frappe.enqueue(
+        'project_costing.project_costing.doc_events.wbs_item.process_wbs_recalc_queue',
+        queue='short',
+        job_id=WBS_RECALC_JOB_ID,
+        deduplicate=True,
+    )
+
+def process_wbs_recalc_queue():
+    """Recompute the queued WBS items; also scheduled as a safety net for names
+    queued while a previous run was finishing."""
+    while names := pop_queued_wbs(WBS_RECALC_BATCH_SIZE):
+        try:
+            recalculate_wbs_items(names)
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            frappe.cache.sadd(WBS_RECALC_QUEUE, *names)
+            raise
 
-def get_purchase_order_items(doc_name, name):
-    total = 0
-    items = frappe.get_all(doc_name, filters = {"custom_boq": name.boq}, fields=["name", "qty", "custom_boq"])
-    for item in items:
-        if item.custom_boq == name.boq:
-            total = total + item.qty
-    name.po_reserved_qty = total
-    frappe.db.set_value("WBS item", name.name, "po_reserved_qty", total, update_modified=False)
-    frappe.db.commit()
-
-def get_material_request_items(doc_name, name):
-    total = 0
-    docs = frappe.db.get_values(doc_name, {"material_request_type" : "Purchase"}, ["name"])
-    for doc in docs:
-        mr_doc = frappe.get_doc(doc_name, doc[0])
-        for item in mr_doc.items:
-            if item.custom_boq == name.boq:
-                total = total + item.qty
-    name.pr__reserved_qty = total
-    frappe.db.set_value("WBS item", name.name, "pr__reserved_qty", total, update_modified=False)
-    frappe.db.commit()
-
-def update_petty_cash_data(self):
-    total_petty_cash_qty = 0
-    total_petty_cash_amount = 0
-    purchase_receipts = frappe.get_all("Purchase Receipt", filters = {"is_petty_cash" : 1}, fields = ["name"])
-    for pr in purchase_receipts:
-        pr_doc = frappe.get_doc("Purchase Receipt", pr.name)
-        for item in pr_doc.items:
-            if item.custom_boq == self.boq:
-                total_petty_cash_qty = total_petty_cash_qty + item.qty
-                total_petty_cash_amount = total_petty_cash_amount + item.amount
-    self.petty_cash_qty = total_petty_cash_qty
-    self.petty_cash_amount = total_petty_cash_amount
-    frappe.db.set_value("WBS item", self.name, "petty_cash_qty", total_petty_cash_qty, update_modified=False)
-    frappe.db.set_value("WBS item", self.name, "petty_cash_amount", total_petty_cash_amount, update_modified=False)
-    frappe.db.commit()
-    
-def update_wbs_items(self):
-    get_material_request_items("Material Request", self)
-    get_purchase_order_items("Purchase Order Item", self)
-    update_petty_cash_data(self)
+def pop_queued_wbs(count):
+    names = []
+    while len(names) < count:
+        name = frappe.cache.spop(WBS_RECALC_QUEUE)
+        if name is None:
+            break
+        names.append(frappe.safe_decode(name))
+    return names
 
 def validate(self, method):
-    update_wbs_items(self)
\ No newline at end of file
+    # Same totals as the daily job (Purchase requests only for pr__reserved_qty), set
+    # on the document being saved. The ledger_* fields belong to the quantity ledger
+    # and are never touched here.
+    totals = get_boq_reservation_totals([self.boq] if self.boq else [])
+    values = totals.get(self.boq) or {}
+    self.update({field: values.get(field, 0.0) for field in WBS_TOTAL_FIELDS})
@@ -48,7 +48,7 @@ frappe.ui.form.on('BOQ', {
         frm.add_custom_button('Create Missing Items', () => {
             frappe.call({
                 method: 'project_costing.project_costing.doctype.boq.boq.create_items_for_boq',
-                args: { boq: frm.doc.name },
+                args: { boq: frm.doc.name, batched: 1 },
                 callback: function (r) {
                     if (r.message && r.message.created_items && r.message.created_items.length) {
                         frappe.msgprint(__('Total Created Items: ') + r.message.created_items.length);
@@ -63,16 +63,12 @@ frappe.ui.form.on('BOQ', {
         if (frm.doc.task_created == 0 && frm.doc.missing_item_created == 1){
         frm.add_custom_button('Create Task', () => {
             frappe.call({
-                method: 'project_costing.project_costing.doctype.boq.boq.created_task',
+                method: 'project_costing.project_costing.doctype.boq.boq_task_creation.enqueue_task_creation',
                 args: { boq_name: frm.doc.name },
                 callback: function (r) {
-                    if (r.message && r.message.created_task && r.message.created_task.length) {
-                        frappe.msgprint(__('Total Created Task: ') + r.message.created_task.length);
-                        frm.set_value('task_created', 1);
-
-                        frm.reload_doc();
-                    } else {
-                        frappe.msgprint(__('No new task are created.'));
+                    if (r.message && r.message.job) {
+                        frappe.msgprint(__('Task creation queued as job {0}',
+                            [`<a href="/app/project-costing-job/${r.message.job}">${r.message.job}</a>`]));
                     }
                 }
             });
@@ -136,8 +132,30 @@ frappe.ui.form.on('BOQ', {
                                     }
                                 }
                             }
+                        },
+                        {
+                            label: __('Bulk Import'),
+                            fieldname: 'bulk',
+                            fieldtype: 'Check',
+                            default: 1,
+                            description: __('Build the BOQ tree in memory and write it in chunks (recommended for large BOQs)')
+                        },
+                        {
+                            label: __('Run in Background'),
+                            fieldname: 'background',
+                            fieldtype: 'Check',
+                            default: 0,
+                            description: __('Queue the import as a resumable job; progress is kept on a Project Costing Job')
                         }
                     ],
+                    secondary_action_label: __('Validate'),
+                    secondary_action() {
+                        const values = d.get_values();
+                        if (!values) return;
+                        frm.events.show_dry_run_report(frm,
+                            "project_costing.project_costing.doctype.boq.boq.dry_run_boq_import",
+                            { file_path: values.file, boq_name: frm.doc.name });
+                    },
                     primary_action_label: __('Import'),
                     primary_action(values) {
                         if (!values.file) {
@@ -149,6 +167,26 @@ frappe.ui.form.on('BOQ', {
                             return;
                         }
     
+                        if (values.background) {
+                            frappe.call({
+                                method: "project_costing.project_costing.doctype.boq.boq_import_job.enqueue_boq_import",
+                                args: {
+                                    file_path: values.file,
+                                    boq_name: frm.doc.name,
+                                    project_name: frm.doc.project,
+                                    warehouse: frm.doc.warehouse
+                                },
+                                callback(r) {
+                                    if (r.message) {
+                                        frappe.msgprint(__('BOQ import queued as job {0}',
+                                            [`<a href="/app/project-costing-job/${r.message.job}">${r.message.job}</a>`]));
+                                    }
+                                    d.hide();
+                                }
+                            });
+                            return;
+                        }
+
                         // Progress Bar Dialog
                         const progress_dialog = new frappe.ui.Dialog({
                             title: __('Import Progress'),
@@ -191,7 +229,8 @@ frappe.ui.form.on('BOQ', {
                                 file_path: values.file,
                                 boq_name: frm.doc.name,
                                 project_name: frm.doc.project,
-                                warehouse: frm.doc.warehouse
+                                warehouse: frm.doc.warehouse,
+                                bulk: values.bulk
                             },
                             freeze: true,
                             freeze_message: __('Importing data...'),
@@ -224,6 +263,43 @@ frappe.ui.form.on('BOQ', {
                 d.show(); 
             });
         }
+        if (frm.doc.boq_details_created === 1) {
+            frm.add_custom_button(__('Import Revised BOQ'), function () {
+                const d = new frappe.ui.Dialog({
+                    title: __('Import Revised BOQ'),
+                    fields: [
+                        {
+                            label: __('Excel File'),
+                            fieldname: 'file',
+                            fieldtype: 'Attach',
+                            reqd: 1,
+                            description: __('Rows are matched by BOQ ID (or Item Cost Code): new rows are added, changed rows updated and missing rows flagged as removed')
+                        }
+                    ],
+                    primary_action_label: __('Apply Revision'),
+                    primary_action(values) {
+                        frappe.call({
+                            method: "project_costing.project_costing.doctype.boq.boq_revision.import_boq_revision",
+                            args: {
+                                file_path: values.file,
+                                boq_name: frm.doc.name
+                            },
+                            freeze: true,
+                            freeze_message: __('Applying revision...'),
+                            callback(r) {
+                                if (r.message) {
+                                    frappe.msgprint(__('Inserted {0}, updated {1}, removed {2}, restored {3}, unchanged {4}',
+                                        [r.message.inserted, r.message.updated, r.message.removed, r.message.restored, r.message.unchanged]));
+                                    frm.reload_doc();
+                                }
+                                d.hide();
+                            }
+                        });
+                    }
+                });
+                d.show();
+            }, __('Actions'));
+        }
         if (frm.doc.boq_details_created === 1 && frm.doc.wbs_item_created === 0) {
             frm.add_custom_button(__('Import WBS from Excel'), function () {
                 const d = new frappe.ui.Dialog({
@@ -251,6 +327,14 @@ frappe.ui.form.on('BOQ', {
                             }
                         }
                     ],
+                    secondary_action_label: __('Validate'),
+                    secondary_action() {
+                        const values = d.get_values();
+                        if (!values) return;
+                        frm.events.show_dry_run_report(frm,
+                            "project_costing.project_costing.doctype.wbs_item.wbs_item_import.dry_run_wbs_import",
+                            { file_name: values.file, boq_name: frm.doc.name, project_name: frm.doc.project });
+                    },
                     primary_action_label: __('Import'),
                     primary_action(values) {
                         if (!values.file) {
@@ -453,9 +537,60 @@ frappe.ui.form.on('BOQ', {
             );
         }, __('Actions')); 
 
+        frm.add_custom_button(__('Refresh Stock Figures'), function () {
+            frappe.call({
+                method: 'project_costing.project_costing.doctype.wbs_item.wbs_item.refresh_stock_figures',
+                args: { boq: frm.doc.name },
+                freeze: true,
+                freeze_message: __('Reading warehouse balances...'),
+                callback: function (r) {
+                    if (r.message) {
+                        frappe.show_alert({
+                            message: __('Stock figures updated on {0} of {1} WBS items', [r.message.updated, r.message.checked]),
+                            indicator: 'green'
+                        });
+                        frm.reload_doc();
+                    }
+                }
+            });
+        }, __('Actions'));
     
     },
     
+    show_dry_run_report: function (frm, method, args) {
+        frappe.call({
+            method: method,
+            args: args,
+            freeze: true,
+            freeze_message: __('Checking file...'),
+            callback(r) {
+                const report = r.message;
+                if (!report) return;
+
+                const summary = report.summary.map(s =>
+                    `<tr><td>${__(s.level)}</td><td>${frappe.utils.escape_html(s.message)}</td><td>${s.count}</td></tr>`
+                ).join('');
+                const issues = report.errors.concat(report.warnings).slice(0, 100).map(i =>
+                    `<tr><td>${i.row || ''}</td><td>${frappe.utils.escape_html(i.column || '')}</td>
+                    <td>${frappe.utils.escape_html(String(i.value ?? ''))}</td><td>${frappe.utils.escape_html(i.message)}</td></tr>`
+                ).join('');
+
+                frappe.msgprint({
+                    title: report.valid ? __('No errors found') : __('{0} errors found', [report.error_count]),
+                    indicator: report.valid ? 'green' : 'red',
+                    wide: true,
+                    message: `
+                        <p>${__('Rows checked: {0}, warnings: {1}', [report.total_rows, report.warning_count])}</p>
+                        <table class="table table-bordered table-sm">${summary}</table>
+                        <table class="table table-bordered table-sm">
+                            <tr><th>${__('Row')}</th><th>${__('Column')}</th><th>${__('Value')}</th><th>${__('Issue')}</th></tr>
+                            ${issues}
+                        </table>`
+                });
+            }
+        });
+    },
+
     render_unlinked_wbs_html: function (frm) {
         const encodedFilter = encodeURIComponent(`["is", "not set"]`);
         const route = `/app/wbs-item?boq_details=${encodedFilter}`;
@@ -6,8 +6,17 @@ from frappe import _
 from frappe.model.naming import make_autoname
 from frappe.model.mapper import get_mapped_doc
 from frappe.desk.form.linked_with import get_linked_docs
-from frappe.utils import now_datetime
+from frappe.utils import cint
 import time
+from collections import namedtuple
+from project_costing.project_costing.utils.import_report import (
+    ImportReport,
+    get_existing_values,
+    sheet_row_number,
+)
+from project_costing.project_costing.utils.nestedset import deferred_nested_set
+from project_costing.project_costing.utils.progress import ProgressTracker
+from project_costing.project_costing.utils.sheet_reader import iter_sheet_chunks
 
 class BOQ(Document):
     pass
@@ -34,74 +43,248 @@ def safe_int(value):
     except (ValueError, TypeError):
         return 1
     
+BOQ_COLUMN_MAP = {
+    'item_cost_code': 'Item Cost Code',
+    'item': 'Item',
+    'boq_qty': 'BOQ Qty',
+    'takeoff': 'TakeOff',
+    'selling_rate': 'Selling Rate',
+    'original_contract_price': 'Original Contract Price',
+    'div_name': 'DIV. Name',
+    'lvl': 'LvL',
+    'boq_id': 'BOQ ID',
+    'uom': 'Unit',
+}
+
+BOQ_FLOAT_FIELDS = ('boq_qty', 'takeoff', 'selling_rate', 'original_contract_price')
+BOQ_INT_FIELDS = ('lvl',)
+
+# Normalized sheet row: one attribute per BOQ_COLUMN_MAP field, already cleaned and cast
+BOQRow = namedtuple('BOQRow', BOQ_COLUMN_MAP.keys())
+
+def iter_boq_rows(file_path, column_map):
+    """Stream the uploaded BOQ sheet as normalized `BOQRow` tuples"""
+    for chunk in iter_sheet_chunks(get_sheet_path(file_path)):
+        yield from normalize_boq_frame(chunk, column_map)
+
+def get_sheet_path(file_url):
+    file_doc = frappe.get_doc('File', {'file_url': file_url})
+    return file_doc.get_full_path()
+
+def normalize_boq_frame(df, column_map):
+    """Clean and cast every mapped column at once.
+
+    Column-wise equivalent of running safe_float / safe_string / safe_int on each
+    cell: missing numbers become 0.0, missing text "" and missing levels 1.
+    Returns a list of `BOQRow` tuples.
+    """
+    columns = []
+    for field, column in column_map.items():
+        if column in df.columns:
+            values = df[column]
+        else:
+            values = pd.Series(None, index=df.index, dtype=object)
+
+        if field in BOQ_FLOAT_FIELDS:
+            values = to_float_column(values)
+        elif field in BOQ_INT_FIELDS:
+            values = to_int_column(values)
+        else:
+            values = to_string_column(values)
+        columns.append(values.tolist())
+
+    return [BOQRow._make(values) for values in zip(*columns)]
+
+def to_numeric_column(values):
+    if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) in ('string', 'mixed', 'mixed-integer'):
+        # float()/int() accept surrounding whitespace, pd.to_numeric does not
+        stripped = values.str.strip()
+        values = stripped.where(stripped.notna(), values)
+    return pd.to_numeric(values, errors='coerce')
+
+def to_float_column(values):
+    return to_numeric_column(values).fillna(0.0).astype(float)
+
+def to_int_column(values, default=1):
+    numeric = to_numeric_column(values).replace([math.inf, -math.inf], math.nan)
+    if values.dtype == object:
+        # int() truncates numbers but rejects text such as "2.5", like safe_int
+        is_text = values.map(lambda value: isinstance(value, str))
+        is_int_text = values.where(is_text, "").astype(str).str.fullmatch(r"\s*[+-]?\d+\s*")
+        numeric = numeric.where(~is_text | is_int_text)
+    return numeric.fillna(default).apply(math.trunc).astype(int)
+
+def to_string_column(values):
+    missing = values.isna()
+    return values.astype(str).str.strip().astype(object).where(~missing, "")
+
+def sort_rows_by_level(rows):
+    """Order sheet rows by level so parents come before children"""
+    return sorted(rows, key=lambda row: row.lvl)
+
 @frappe.whitelist()
-def import_boq_items_from_excel(file_path: str, boq_name: str, project_name, warehouse, use_boq_id_hierarchy=False):
-    file_doc = frappe.get_doc('File', {'file_url': file_path})
-    absolute_path = file_doc.get_full_path()
-    df = pd.read_excel(absolute_path, header=0)
-    df = df.where(pd.notnull(df), None)
-
-    column_map = {
-        'item_cost_code': 'Item Cost Code',
-        'item': 'Item',
-        'boq_qty': 'BOQ Qty',
-        'takeoff': 'TakeOff',
-        'selling_rate': 'Selling Rate',
-        'original_contract_price': 'Original Contract Price',
-        'div_name': 'DIV. Name',
-        'lvl': 'LvL',
-        'boq_id': 'BOQ ID',
-        'uom': 'Unit',
-    }
+def import_boq_items_from_excel(file_path: str, boq_name: str, project_name, warehouse, use_boq_id_hierarchy=False, bulk=False):
+    rows = iter_boq_rows(file_path, BOQ_COLUMN_MAP)
+    tracker = ProgressTracker.start('BOQ Import', 'BOQ', boq_name, event='boq_import_progress')
 
-    total = len(df)
-    created = 0
+    if cint(bulk):
+        # Build the whole tree in memory and write it with multi-row INSERTs
+        from project_costing.project_costing.doctype.boq.boq_bulk_import import bulk_import_boq_details
+
+        return bulk_import_boq_details(rows, boq_name, project_name, warehouse, use_boq_id_hierarchy, tracker=tracker)
+
+    # One tree renumbering for the whole import instead of per-parent updates
+    with deferred_nested_set('BOQ Details', 'parent_boq_details', {'boq': boq_name}):
+        if use_boq_id_hierarchy:
+            # Use BOQ ID based hierarchy approach
+            result = create_boq_id_hierarchy(rows, boq_name, project_name, warehouse, tracker)
+        else:
+            # Use Level-based hierarchy approach (original)
+            result = create_level_based_hierarchy(rows, boq_name, project_name, warehouse, tracker)
+
+    frappe.db.commit()
+    return result
+
+@frappe.whitelist()
+def dry_run_boq_import(file_path: str, boq_name: str = None, use_boq_id_hierarchy=False):
+    """Check a BOQ sheet the way the import would read it, without writing anything.
+
+    Returns an `ImportReport` dict listing bad rows by spreadsheet row number.
+    """
+    report = ImportReport()
+    use_boq_id_hierarchy = cint(use_boq_id_hierarchy)
+
+    if boq_name and frappe.db.get_value("BOQ", boq_name, "boq_details_created"):
+        report.warning(None, "BOQ Details were already imported for this BOQ")
+
+    rows = []  # [(sheet row label, BOQRow)]
+    offset = 0
+    for chunk in iter_sheet_chunks(get_sheet_path(file_path)):
+        if not offset:
+            required = ['item_cost_code', 'boq_id' if use_boq_id_hierarchy else 'lvl']
+            for field in required:
+                if BOQ_COLUMN_MAP[field] not in chunk.columns:
+                    report.error(None, "Required column is missing", column=BOQ_COLUMN_MAP[field])
+
+        check_boq_numeric_columns(chunk, report)
+        rows.extend(zip(chunk.index, normalize_boq_frame(chunk, BOQ_COLUMN_MAP)))
+        offset += len(chunk)
+
+    report.total_rows = offset
+    rows = check_boq_rows(rows, report)
 
     if use_boq_id_hierarchy:
-        # Use BOQ ID based hierarchy approach
-        return create_boq_id_hierarchy(df, boq_name, project_name, warehouse, column_map)
+        check_boq_id_hierarchy(rows, report)
     else:
-        # Use Level-based hierarchy approach (original)
-        return create_level_based_hierarchy(df, boq_name, project_name, warehouse, column_map)
+        check_level_hierarchy(rows, report)
+
+    return report.as_dict()
+
+def check_boq_numeric_columns(chunk, report):
+    """Flag cells that the import would silently read as 0 (or level 1)"""
+    for field in BOQ_FLOAT_FIELDS + BOQ_INT_FIELDS:
+        column = BOQ_COLUMN_MAP[field]
+        if column not in chunk.columns:
+            continue
+
+        raw = chunk[column]
+        invalid = (to_string_column(raw) != "") & to_numeric_column(raw).isna()
+        for position in invalid.to_numpy().nonzero()[0]:
+            message = "Level is not a number; 1 would be used" if field in BOQ_INT_FIELDS else "Not a number; 0 would be used"
+            report.warning(sheet_row_number(raw.index[position]), message, column=column, value=str(raw.iloc[position]))
+
+def check_boq_rows(rows, report):
+    """Per-row checks plus one UOM lookup for the whole sheet; returns the importable rows"""
+    importable = []
+    boq_ids = set()
+    cost_codes = set()
+    uoms = {}  # {uom: [sheet row numbers]}
+
+    for index, row in rows:
+        number = sheet_row_number(index)
+        if not row.item_cost_code:
+            report.error(number, "Missing Item Cost Code; the row would be skipped", column=BOQ_COLUMN_MAP['item_cost_code'])
+            continue
 
-def create_level_based_hierarchy(df, boq_name, project_name, warehouse, column_map):
+        if row.boq_id:
+            if row.boq_id in boq_ids:
+                report.error(number, "Duplicate BOQ ID", column=BOQ_COLUMN_MAP['boq_id'], value=row.boq_id)
+            boq_ids.add(row.boq_id)
+
+        if row.item_cost_code in cost_codes:
+            report.warning(number, "Duplicate Item Cost Code", column=BOQ_COLUMN_MAP['item_cost_code'], value=row.item_cost_code)
+        cost_codes.add(row.item_cost_code)
+
+        if row.uom:
+            uoms.setdefault(row.uom, []).append(number)
+        importable.append((index, row))
+
+    if uoms:
+        known = get_existing_values("UOM", "name", uoms)
+        for uom, numbers in uoms.items():
+            if uom not in known:
+                for number in numbers:
+                    report.error(number, "Unknown UOM", column=BOQ_COLUMN_MAP['uom'], value=uom)
+
+    return importable
+
+def check_level_hierarchy(rows, report):
+    """Rows with no row at an upper level anywhere in the sheet end up as stray roots"""
+    if not rows:
+        return
+
+    top_level = min(row.lvl for _index, row in rows)
+    if top_level <= 1:
+        return
+
+    for index, row in rows:
+        if row.lvl == top_level:
+            report.error(sheet_row_number(index), "Orphan level: no row at an upper level", column=BOQ_COLUMN_MAP['lvl'], value=row.lvl)
+
+def check_boq_id_hierarchy(rows, report):
+    """BOQ ID prefixes missing from the sheet are generated as `PARENT-` groups"""
+    boq_id_index = BOQIdIndex()
+    present = {row.boq_id for _index, row in rows if row.boq_id}
+    reported = set()
+
+    for index, row in rows:
+        if not row.boq_id:
+            report.warning(sheet_row_number(index), "Missing BOQ ID; the row would be imported as a root", column=BOQ_COLUMN_MAP['boq_id'])
+            continue
+
+        for prefix in boq_id_index.ancestors(row.boq_id):
+            if prefix not in present and prefix not in reported:
+                reported.add(prefix)
+                report.warning(sheet_row_number(index), "Parent BOQ ID missing; a parent group would be generated", column=BOQ_COLUMN_MAP['boq_id'], value=prefix)
+
+def create_level_based_hierarchy(rows, boq_name, project_name, warehouse, tracker):
     """Original level-based hierarchy approach"""
     created = 0
-    total = len(df)
+    
+    # Sort by level to ensure parents are created before children
+    rows = sort_rows_by_level(rows)
+    tracker.set_total(len(rows))
     
     # Store created documents for parent lookup
     doc_map = {}  # {item_cost_code: doc_name}
     level_map = {}  # {level: last_doc_name}
     
-    # Sort by level to ensure parents are created before children
-    df_sorted = df.sort_values(by=[column_map['lvl']]).reset_index(drop=True)
-    
-    for index, row in df_sorted.iterrows():
-        boq_id = safe_string(row.get(column_map['boq_id']))
-        item_cost_code = safe_string(row.get(column_map['item_cost_code']))
-        level = safe_int(row.get(column_map['lvl']))
+    for row in rows:
+        item_cost_code = row.item_cost_code
+        level = row.lvl
         
         if not item_cost_code:
             continue
 
         try:
             doc = frappe.new_doc('BOQ Details')
+            doc.update(row._asdict())
             doc.boq = boq_name
             doc.warehouse = warehouse
-            doc.item_cost_code = item_cost_code
-            doc.item = safe_string(row.get(column_map['item']))
-            doc.boq_qty = safe_float(row.get(column_map['boq_qty']))
-            doc.takeoff = safe_float(row.get(column_map['takeoff']))
-            doc.selling_rate = safe_float(row.get(column_map['selling_rate']))
-            doc.original_contract_price = safe_float(row.get(column_map['original_contract_price']))
-            doc.div_name = safe_string(row.get(column_map['div_name']))
-            doc.boq_id = boq_id
             doc.project = project_name
-            doc.lvl = level
             doc.parent = boq_name
             doc.parenttype = 'BOQ'
             doc.parentfield = 'items'
-            doc.uom = safe_string(row.get(column_map['uom']))
 
             # Find parent based on level hierarchy
             parent_name = None
@@ -126,42 +309,37 @@ def create_level_based_hierarchy(df, boq_name, project_name, warehouse, column_m
                 if l != level:
                     level_map.pop(l, None)
 
-            # Send realtime progress
-            frappe.publish_realtime(
-                "boq_import_progress",
-                {"progress": (created / total) * 100},
-                user=frappe.session.user
-            )
+            tracker.update(created)
 
         except Exception as e:
             frappe.log_error(f"Error importing BOQ item {item_cost_code}: {str(e)}")
+            tracker.add_error(f"Error importing BOQ item {item_cost_code}: {str(e)}")
             continue
 
-    frappe.db.commit()
-
-    # Mark groups based on hierarchy
-    mark_groups_as_is_group(boq_name)
-
+    # Groups and lft/rgt are set when the caller's deferred_nested_set block exits
     frappe.db.set_value("BOQ", boq_name, "boq_details_created", 1)
     frappe.db.commit()
 
-    frappe.publish_realtime("boq_import_progress", {"progress": 100}, user=frappe.session.user)
+    tracker.finish()
     frappe.msgprint(f"Total BOQ Details created: {created}")
 
     return {"success": created}
 
-def create_boq_id_hierarchy(df, boq_name, project_name, warehouse, column_map):
+def create_boq_id_hierarchy(rows, boq_name, project_name, warehouse, tracker):
     """BOQ ID based hierarchy approach - creates missing intermediate levels"""
     created = 0
-    total = len(df)
+    rows = list(rows)
+    tracker.set_total(len(rows))
     
     # First, create all existing items
     existing_items = {}
     all_rows = []
+    boq_id_index = BOQIdIndex()
     
-    for index, row in df.iterrows():
-        boq_id = safe_string(row.get(column_map['boq_id']))
-        item_cost_code = safe_string(row.get(column_map['item_cost_code']))
+    for row in rows:
+        boq_id_index.add(row)
+        boq_id = row.boq_id
+        item_cost_code = row.item_cost_code
         
         if not item_cost_code:
             continue
@@ -170,8 +348,8 @@ def create_boq_id_hierarchy(df, boq_name, project_name, warehouse, column_map):
         all_rows.append(row)
         
         # Create the document
-        parent_name = find_parent_for_boq_id(boq_id, existing_items)
-        doc = create_boq_detail_doc(row, boq_name, project_name, warehouse, parent_name, column_map)
+        parent_name = boq_id_index.find_parent(boq_id, existing_items)
+        doc = create_boq_detail_doc(row, boq_name, project_name, warehouse, parent_name)
         
         if doc:
             created += 1
@@ -179,108 +357,119 @@ def create_boq_id_hierarchy(df, boq_name, project_name, warehouse, column_map):
             if boq_id:
                 existing_items[boq_id] = doc.name
             
-            # Send realtime progress
-            frappe.publish_realtime(
-                "boq_import_progress",
-                {"progress": (created / len(all_rows)) * 100},
-                user=frappe.session.user
-            )
+            tracker.update(created)
+        else:
+            tracker.add_error(f"Error creating BOQ detail {item_cost_code}")
     
     # Then create missing intermediate BOQ ID levels
-    for row in all_rows:
-        boq_id = safe_string(row.get(column_map['boq_id']))
-        if not boq_id or '.' not in boq_id:
-            continue
-            
-        # Create all parent levels for this BOQ ID
-        parts = boq_id.split('.')
-        for i in range(1, len(parts)):
-            parent_boq_id = '.'.join(parts[:i])
-            
+    for row in boq_id_index.first_rows(all_rows):
+        boq_id = row.boq_id
+
+        # Create all parent levels for this BOQ ID, root first
+        parents = boq_id_index.ancestors(boq_id)[::-1]
+        for i, parent_boq_id in enumerate(parents, start=1):
             # If this parent doesn't exist, create it
             if parent_boq_id not in existing_items:
                 # Find the appropriate DIV name for this parent
-                div_name = find_div_name_for_boq_id(parent_boq_id, df, column_map)
+                div_name = boq_id_index.div_name(parent_boq_id)
                 
-                parent_row = {
-                    column_map['item_cost_code']: f"PARENT-{parent_boq_id}",
-                    column_map['item']: f"Parent Group {parent_boq_id}",
-                    column_map['boq_id']: parent_boq_id,
-                    column_map['takeoff']: 0,
-                    column_map['lvl']: i + 3,  # Adjust level based on your structure
-                    column_map['uom']: '',
-                    column_map['boq_qty']: 0,
-                    column_map['selling_rate']: 0,
-                    column_map['original_contract_price']: 0,
-                    column_map['div_name']: div_name or row.get(column_map['div_name'])
-                }
+                parent_row = make_parent_group_row(parent_boq_id, i + 3, div_name or row.div_name)  # Adjust level based on your structure
                 
                 # Find grandparent if exists
                 grandparent_id = None
                 if i > 1:
-                    grandparent_boq_id = '.'.join(parts[:i-1])
-                    grandparent_id = existing_items.get(grandparent_boq_id)
+                    grandparent_id = existing_items.get(parents[i-2])
                 
-                doc = create_boq_detail_doc(parent_row, boq_name, project_name, warehouse, grandparent_id, column_map)
+                doc = create_boq_detail_doc(parent_row, boq_name, project_name, warehouse, grandparent_id)
                 if doc:
                     created += 1
                     existing_items[parent_boq_id] = doc.name
                     existing_items[f"PARENT-{parent_boq_id}"] = doc.name
 
-    frappe.db.commit()
-
-    # Mark groups based on hierarchy
-    mark_groups_as_is_group(boq_name)
-
+    # Groups and lft/rgt are set when the caller's deferred_nested_set block exits
     frappe.db.set_value("BOQ", boq_name, "boq_details_created", 1)
     frappe.db.commit()
 
-    frappe.publish_realtime("boq_import_progress", {"progress": 100}, user=frappe.session.user)
+    tracker.finish()
     frappe.msgprint(f"Total BOQ Details created: {created}")
 
     return {"success": created}
 
-def find_parent_for_boq_id(boq_id, existing_items):
-    """Find parent for a given BOQ ID"""
-    if not boq_id or '.' not in boq_id:
+class BOQIdIndex:
+    """Prefix index over the dotted BOQ IDs of one import.
+
+    Ancestor chains are split once per BOQ ID and the DIV name inherited by each
+    prefix is recorded while the rows stream by, so parent and missing-ancestor
+    lookups no longer rescan the sheet.
+    """
+
+    def __init__(self):
+        self.chains = {}  # {boq_id: proper prefixes, nearest first}
+        self.div_names = {}  # {prefix: DIV name of the first row below it}
+
+    def ancestors(self, boq_id):
+        if not boq_id or '.' not in boq_id:
+            return ()
+        chain = self.chains.get(boq_id)
+        if chain is None:
+            parts = boq_id.split('.')
+            chain = self.chains[boq_id] = tuple('.'.join(parts[:i]) for i in range(len(parts) - 1, 0, -1))
+        return chain
+
+    def add(self, row):
+        for prefix in self.ancestors(row.boq_id):
+            if prefix in self.div_names:
+                # An earlier row under this prefix already covered the rest of the chain
+                break
+            self.div_names[prefix] = row.div_name
+
+    def div_name(self, prefix):
+        """DIV name of the first row below `prefix`"""
+        return self.div_names.get(prefix)
+
+    def find_parent(self, boq_id, existing_items):
+        """Nearest ancestor of `boq_id` already present in `existing_items`"""
+        for prefix in self.ancestors(boq_id):
+            if prefix in existing_items:
+                return existing_items[prefix]
         return None
-        
-    parts = boq_id.split('.')
-    for i in range(len(parts)-1, 0, -1):
-        parent_boq_id = '.'.join(parts[:i])
-        if parent_boq_id in existing_items:
-            return existing_items[parent_boq_id]
-    
-    return None
 
-def find_div_name_for_boq_id(parent_boq_id, df, column_map):
-    """Find appropriate DIV name for a parent BOQ ID by looking at children"""
-    for index, row in df.iterrows():
-        boq_id = safe_string(row.get(column_map['boq_id']))
-        if boq_id and boq_id.startswith(parent_boq_id + '.'):
-            return safe_string(row.get(column_map['div_name']))
-    return None
+    def first_rows(self, rows):
+        """Rows carrying a dotted BOQ ID, first occurrence of each ID only"""
+        seen = set()
+        for row in rows:
+            boq_id = row.boq_id
+            if boq_id in seen or not self.ancestors(boq_id):
+                continue
+            seen.add(boq_id)
+            yield row
+
+def make_parent_group_row(parent_boq_id, level, div_name):
+    """Generated group row for a BOQ ID prefix missing from the sheet"""
+    return BOQRow(
+        item_cost_code=f"PARENT-{parent_boq_id}",
+        item=f"Parent Group {parent_boq_id}",
+        boq_qty=0.0,
+        takeoff=0.0,
+        selling_rate=0.0,
+        original_contract_price=0.0,
+        div_name=div_name,
+        lvl=level,
+        boq_id=parent_boq_id,
+        uom='',
+    )
 
-def create_boq_detail_doc(row, boq_name, project_name, warehouse, parent_name, column_map):
+def create_boq_detail_doc(row, boq_name, project_name, warehouse, parent_name):
     """Helper function to create BOQ Detail document"""
     try:
         doc = frappe.new_doc('BOQ Details')
+        doc.update(row._asdict())
         doc.boq = boq_name
         doc.warehouse = warehouse
-        doc.item_cost_code = safe_string(row.get(column_map['item_cost_code']))
-        doc.item = safe_string(row.get(column_map['item']))
-        doc.boq_qty = safe_float(row.get(column_map['boq_qty']))
-        doc.takeoff = safe_float(row.get(column_map['takeoff']))
-        doc.selling_rate = safe_float(row.get(column_map['selling_rate']))
-        doc.original_contract_price = safe_float(row.get(column_map['original_contract_price']))
-        doc.div_name = safe_string(row.get(column_map['div_name']))
-        doc.boq_id = safe_string(row.get(column_map['boq_id']))
         doc.project = project_name
-        doc.lvl = safe_int(row.get(column_map['lvl']))
         doc.parent = boq_name
         doc.parenttype = 'BOQ'
         doc.parentfield = 'items'
-        doc.uom = safe_string(row.get(column_map['uom']))
         
         if parent_name:
             doc.parent_boq_details = parent_name
@@ -293,14 +482,15 @@ def create_boq_detail_doc(row, boq_name, project_name, warehouse, parent_name, c
 
 def mark_groups_as_is_group(boq_name):
     """Mark items that have children as groups"""
-    child_parents = frappe.get_all(
-        'BOQ Details',
-        filters={'boq': boq_name, 'parent_boq_details': ['!=', '']},
-        fields=['parent_boq_details']
-    )
-    parent_names = set(c['parent_boq_details'] for c in child_parents)
-    for parent_name in parent_names:
-        frappe.db.set_value('BOQ Details', parent_name, 'is_group', 1)
+    frappe.db.sql("""
+        UPDATE `tabBOQ Details` parent
+        JOIN (
+            SELECT DISTINCT `parent_boq_details` AS name
+            FROM `tabBOQ Details`
+            WHERE `boq` = %s AND IFNULL(`parent_boq_details`, '') != ''
+        ) child ON child.name = parent.name
+        SET parent.is_group = 1
+    """, boq_name)
 
 @frappe.whitelist()
 def get_child_data(boq):
@@ -333,23 +523,35 @@ def generate_next_item_code(item_group):
     if not item_group:
         frappe.throw("Item Group is required to generate an Item Code.")
 
-    naming_series = frappe.db.get_value("Item Group", item_group, "custom_group_code")
+    return make_autoname(get_item_naming_series(item_group), "Item")
+
+def get_item_naming_series(item_group, group_code=None):
+    """Item Code series of an Item Group: its `custom_group_code` or its initials"""
+    naming_series = group_code or frappe.db.get_value("Item Group", item_group, "custom_group_code")
     if not naming_series:
         prefix = "".join([word[0] for word in item_group.split() if word]) + "-"
         naming_series = prefix + ".#####"
-
-    return make_autoname(naming_series, "Item")
+    return naming_series
 
 @frappe.whitelist()
-def create_items_for_boq(boq):
+def create_items_for_boq(boq, batched=False):
     if not boq:
         frappe.throw("BOQ is required.")
 
+    if cint(batched):
+        # One lookup query, one series reservation per Item Group, set-based write-back
+        from project_costing.project_costing.doctype.boq.boq_item_creation import create_items_for_boq_batched
+
+        return create_items_for_boq_batched(boq)
+
     boq_doc = frappe.get_doc("BOQ", boq)
     item_names = []
+    tracker = ProgressTracker.start("Item Creation", "BOQ", boq, event="boq_item_creation_progress",
+        total=len(boq_doc.get("boq_details")) + len(boq_doc.get("wbs_item")))
 
     for table_name in ["boq_details", "wbs_item"]:
         for row in boq_doc.get(table_name):
+            tracker.advance()
             item_name = (row.item).strip()
 
             if not item_name:
@@ -398,6 +600,7 @@ def create_items_for_boq(boq):
                     row.db_set("created_item",doc.name)
     boq_doc.db_set("missing_item_created",1)
     boq_doc.save(ignore_permissions=True)
+    tracker.finish(message=f"Created {len(item_names)} items")
     return {"created_items": item_names}
 
 
@@ -431,39 +634,10 @@ def create_sales_order_from_boq(boq_name, customer):
 
 @frappe.whitelist()
 def created_task(boq_name):
-    created_tasks_list = []
-
-    boq_details = frappe.get_all("BOQ Details", filters={"boq": boq_name}, fields=["name", "item_cost_code", "boq", "item","project"])
-    parent_task_map = {}  
-
-    for row in boq_details:
-        boq_task = frappe.new_doc("Task")
-        boq_task.subject = row.item_cost_code or f"Task for BoQ Details {row.name}"
-        boq_task.custom_boq = row.boq
-        boq_task.project = row.project
-        boq_task.custom_boq_details = row.name
-        boq_task.exp_start_date = now_datetime()
-        boq_task.description = row.item
-        boq_task.is_group = 1
-        boq_task.insert()  
-        created_tasks_list.append(boq_task.name)
-
-        parent_task_map[row.name] = boq_task.name
-
-    wbs_items = frappe.get_all("WBS item", filters={"boq": boq_name}, fields=["name","item_code","short_description", "cost_code", "project", "boq", "boq_details"])
-
-    for row in wbs_items:
-        wbs_task = frappe.new_doc("Task")
-        wbs_task.subject = row.short_description or f"Task for WBS {row.name}"
-        wbs_task.custom_boq = row.boq
-        wbs_task.project = row.project
-        wbs_task.custom_wbs_item = row.name
-        wbs_task.description = row.item_code
-        wbs_task.exp_start_date = now_datetime()
-
-        if row.boq_details and row.boq_details in parent_task_map:
-            wbs_task.parent_task = parent_task_map[row.boq_details]
-
-        wbs_task.insert()
-        created_tasks_list.append(wbs_task.name)
+    """Create the missing Tasks in this request; the form queues `enqueue_task_creation` instead"""
+    from project_costing.project_costing.doctype.boq.boq_task_creation import create_missing_tasks
+
+    tracker = ProgressTracker.start("Task Creation", "BOQ", boq_name, event="boq_task_progress")
+    created_tasks_list = create_missing_tasks(boq_name, tracker)
+    tracker.finish(message=f"Created {len(created_tasks_list)} tasks")
     return {"created_task": created_tasks_list}
@@ -0,0 +1,167 @@
+import time
+
+import frappe
+from frappe.utils import cint, flt
+
+from project_costing.project_costing.doctype.boq.boq import (
+    BOQIdIndex,
+    make_parent_group_row,
+    sort_rows_by_level,
+)
+from project_costing.project_costing.utils.bulk import bulk_insert_docs
+from project_costing.project_costing.utils.naming import make_series_names
+from project_costing.project_costing.utils.nestedset import rebuild_tree_subset
+from project_costing.project_costing.utils.progress import ProgressTracker
+
+# Bulk BOQ Details import: the whole tree is planned in memory (names, parents,
+# is_group) and written with multi-row INSERTs, instead of running the BOQ Details
+# controller once per sheet row. lft/rgt are set in one pass after the INSERTs.
+
+
+def plan_level_based_rows(rows):
+    """In-memory version of `create_level_based_hierarchy`.
+
+    Returns row dicts in insertion order; `_parent` holds the index of the parent row.
+    """
+    planned = []
+    level_map = {}  # {level: index of last row at that level}
+
+    # Same ordering as the per-row import so the resulting tree is identical
+    for row in sort_rows_by_level(rows):
+        if not row.item_cost_code:
+            continue
+
+        level = row.lvl
+        parent = None
+        for parent_level in range(level - 1, 0, -1):
+            if parent_level in level_map:
+                parent = level_map[parent_level]
+                break
+
+        planned.append(dict(row._asdict(), _parent=parent))
+        level_map[level] = len(planned) - 1
+
+        # Clear deeper levels to maintain proper hierarchy
+        for deeper in [l for l in level_map if l > level]:
+            level_map.pop(deeper, None)
+
+    return planned
+
+
+def plan_boq_id_rows(rows):
+    """In-memory version of `create_boq_id_hierarchy`, including the generated
+    intermediate `PARENT-<boq id>` rows.
+    """
+    planned = []
+    existing_items = {}  # {item_cost_code / boq_id: row index}
+    all_rows = []
+    boq_id_index = BOQIdIndex()
+
+    for row in rows:
+        boq_id_index.add(row)
+        if not row.item_cost_code:
+            continue
+
+        all_rows.append(row)
+        parent = boq_id_index.find_parent(row.boq_id, existing_items)
+        planned.append(dict(row._asdict(), _parent=parent))
+
+        existing_items[row.item_cost_code] = len(planned) - 1
+        if row.boq_id:
+            existing_items[row.boq_id] = len(planned) - 1
+
+    # Then plan missing intermediate BOQ ID levels
+    for row in boq_id_index.first_rows(all_rows):
+        parents = boq_id_index.ancestors(row.boq_id)[::-1]
+        for i, parent_boq_id in enumerate(parents, start=1):
+            if parent_boq_id in existing_items:
+                continue
+
+            div_name = boq_id_index.div_name(parent_boq_id)
+            parent_row = make_parent_group_row(parent_boq_id, i + 3, div_name or row.div_name)
+
+            grandparent = None
+            if i > 1:
+                grandparent = existing_items.get(parents[i-2])
+
+            planned.append(dict(parent_row._asdict(), _parent=grandparent))
+
+            existing_items[parent_boq_id] = len(planned) - 1
+            existing_items[f"PARENT-{parent_boq_id}"] = len(planned) - 1
+
+    return planned
+
+
+def plan_boq_detail_rows(rows, use_boq_id_hierarchy=False):
+    if cint(use_boq_id_hierarchy):
+        return plan_boq_id_rows(rows)
+    return plan_level_based_rows(rows)
+
+
+def get_boq_details_series_key(boq_name):
+    """Series counter used by the BOQ Details naming series `.{boq}.-`"""
+    return f"{boq_name}-"
+
+
+def prepare_boq_detail_rows(rows, boq_name, project_name, warehouse, names=None):
+    """Assign names, parent links and is_group to planned rows in one pass.
+
+    `names` are reserved here unless given, e.g. by a resumed job. Rows are left
+    unnumbered (lft/rgt 0); the writer renumbers the BOQ's tree once all of them are
+    in (see `rebuild_boq_details_tree`).
+    """
+    if names is None:
+        names = make_series_names(get_boq_details_series_key(boq_name), len(rows))
+
+    parents = {row['_parent'] for row in rows if row['_parent'] is not None}
+
+    for index, row in enumerate(rows):
+        parent_name = names[row['_parent']] if row['_parent'] is not None else None
+        row.update({
+            'name': names[index],
+            'boq': boq_name,
+            'project': project_name,
+            'warehouse': warehouse,
+            'parent': boq_name,
+            'parenttype': 'BOQ',
+            'parentfield': 'items',
+            'parent_boq_details': parent_name,
+            'old_parent': parent_name,
+            'lft': 0,
+            'rgt': 0,
+            'is_group': 1 if index in parents else 0,
+        })
+
+    return rows
+
+
+def rebuild_boq_details_tree(boq_name):
+    # Numbered in one pass once every row is in: a range picked before the INSERTs is
+    # not reserved, so any BOQ Details write in between could take it
+    rebuild_tree_subset('BOQ Details', 'parent_boq_details', {'boq': boq_name})
+
+
+def bulk_import_boq_details(sheet_rows, boq_name, project_name, warehouse, use_boq_id_hierarchy=False, tracker=None):
+    """Bulk mode of `import_boq_items_from_excel`; produces the same tree"""
+    start = time.monotonic()
+    if not tracker:
+        tracker = ProgressTracker.start('BOQ Import', 'BOQ', boq_name, event='boq_import_progress')
+
+    rows = plan_boq_detail_rows(sheet_rows, use_boq_id_hierarchy)
+    prepare_boq_detail_rows(rows, boq_name, project_name, warehouse)
+    tracker.set_total(len(rows))
+
+    created = bulk_insert_docs('BOQ Details', rows, on_chunk=tracker.update)
+    rebuild_boq_details_tree(boq_name)
+
+    frappe.db.set_value("BOQ", boq_name, "boq_details_created", 1)
+
+    elapsed = time.monotonic() - start
+    rows_per_second = flt(created / elapsed if elapsed else created, 1)
+
+    message = f"Total BOQ Details created: {created} ({rows_per_second} rows/sec)"
+    tracker.finish(message=message)
+    frappe.db.commit()
+    frappe.msgprint(message)
+
+    return {"success": created, "rows_per_second": rows_per_second, "elapsed": flt(elapsed, 2)}
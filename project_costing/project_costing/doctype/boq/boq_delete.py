@@ -2,6 +2,8 @@ import frappe
 from frappe import _
 from frappe.desk.form.linked_with import get
 
+from project_costing.project_costing.utils.progress import ProgressTracker
+
 def clear_document_references(docname, doctype):
     """
     Remove references of a document from all linked doctypes,
@@ -78,32 +80,42 @@ def background_delete_boq_details(boq):
     if not frappe.db.exists("BOQ", boq):
         frappe.throw(_("BOQ {0} does not exist.").format(boq))
 
+    tracker = ProgressTracker.start("BOQ Details Deletion", "BOQ", boq, event="boq_delete_progress")
+    frappe.db.commit()
+
     try:
         # Get all BOQ Details and BOQ Items before deletion
         boq_details_list = frappe.get_all("BOQ Details", filters={"boq": boq}, pluck="name")
         boq_items_list = frappe.get_all("BOQ Items", filters={"parent": boq}, pluck="name")
 
         frappe.logger().info(f"Found {len(boq_details_list)} BOQ Details and {len(boq_items_list)} BOQ Items to delete")
+        # Every detail is visited twice: once to clear references, once to delete it
+        tracker.set_total(len(boq_details_list) * 2)
 
         # Clear references for each BOQ Detail document
         for detail_name in boq_details_list:
             clear_document_references("BOQ Details",detail_name)
+            tracker.advance(message="Clearing references")
 
 
         # Delete BOQ Details and BOQ Items
         for detail_name in boq_details_list:
             frappe.delete_doc("BOQ Details", detail_name, ignore_permissions=True, force=True)
+            tracker.advance(message="Deleting BOQ Details")
 
 
         # Update BOQ flag
         frappe.db.set_value("BOQ", boq, "boq_details_created", 0)
 
+        tracker.finish()
         frappe.db.commit()
         frappe.logger().info("BOQ Details deletion completed successfully")
         return "success"
 
     except Exception as e:
         frappe.db.rollback()
+        tracker.fail()
+        frappe.db.commit()
         frappe.log_error(f"Error in delete_boq_details: {str(e)}", "BOQ Deletion Error")
         frappe.throw(_("Failed to delete BOQ Details: {0}").format(str(e)))
 
@@ -120,13 +132,17 @@ def delete_wbs_items(boq):
     if not frappe.db.exists("BOQ", boq):
         frappe.throw(_("BOQ {0} does not exist.").format(boq))
 
+    tracker = ProgressTracker.start("WBS Deletion", "BOQ", boq, event="wbs_delete_progress")
+
     try:
         # Get all WBS items for this BOQ
         wbs_items = frappe.get_all("WBS item", filters={"boq": boq}, pluck="name")
+        tracker.set_total(len(wbs_items))
         
         # Clear references for each WBS item
         for wbs_item in wbs_items:
             clear_document_references("WBS item",wbs_item, )
+            tracker.advance(message="Clearing references")
         
         # Delete WBS items
         frappe.db.delete("WBS item", {"boq": boq})
@@ -137,6 +153,7 @@ def delete_wbs_items(boq):
         # Update BOQ flag
         frappe.db.set_value("BOQ", boq, "wbs_item_created", 0)
         
+        tracker.finish()
         frappe.db.commit()
         return "success"
 
@@ -172,21 +189,29 @@ def background_delete_wbs_item(boq):
     """
     Actual deletion logic for WBS Items in background.
     """
+    tracker = ProgressTracker.start("WBS Deletion", "BOQ", boq, event="wbs_delete_progress")
+    frappe.db.commit()
+
     try:
         wbs_items = frappe.get_all("WBS item", filters={"boq": boq}, pluck="name")
+        tracker.set_total(len(wbs_items))
 
         for wbs_item in wbs_items:
             clear_document_references(wbs_item, "WBS item")  # ✅ Correct order
+            tracker.advance(message="Clearing references")
 
         frappe.db.delete("WBS item", {"boq": boq})
         frappe.db.delete("BOQ WBS Item", {"parent": boq})
 
         frappe.db.set_value("BOQ", boq, "wbs_item_created", 0)
 
+        tracker.finish()
         frappe.db.commit()
         frappe.logger().info(f"WBS Items for BOQ {boq} deleted successfully")
 
     except Exception as e:
         frappe.db.rollback()
+        tracker.fail()
+        frappe.db.commit()
         frappe.log_error(f"Error in background_delete_wbs_item: {str(e)}", "WBS Deletion Error")
         frappe.throw(_("Failed to delete WBS Items: {0}").format(str(e)))
@@ -0,0 +1,164 @@
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+from frappe.utils.background_jobs import is_job_enqueued
+
+from project_costing.project_costing.doctype.boq.boq import BOQ_COLUMN_MAP, iter_boq_rows
+from project_costing.project_costing.doctype.boq.boq_bulk_import import (
+    get_boq_details_series_key,
+    plan_boq_detail_rows,
+    prepare_boq_detail_rows,
+    rebuild_boq_details_tree,
+)
+from project_costing.project_costing.doctype.project_costing_job.project_costing_job import create_job
+from project_costing.project_costing.utils.bulk import bulk_insert_docs
+from project_costing.project_costing.utils.naming import format_series_names, reserve_series_block
+from project_costing.project_costing.utils.progress import ProgressTracker
+
+# Background BOQ import. Rows are written in chunks and every chunk is committed
+# together with the job checkpoint, so a failed or killed worker can be resumed
+# from the last committed row instead of starting over. Rows go in unnumbered and
+# the BOQ's tree is renumbered once the job ends, whether it finished or failed.
+
+BOQ_IMPORT_JOB_TIMEOUT = 7200
+
+
+@frappe.whitelist()
+def enqueue_boq_import(file_path, boq_name, project_name, warehouse, use_boq_id_hierarchy=False):
+    """Queue the BOQ import and return the Project Costing Job tracking it"""
+    frappe.has_permission('BOQ', 'write', boq_name, throw=True)
+
+    job = create_job(
+        'BOQ Import',
+        'BOQ',
+        boq_name,
+        parameters={
+            'project_name': project_name,
+            'warehouse': warehouse,
+            'use_boq_id_hierarchy': cint(use_boq_id_hierarchy),
+        },
+        file_url=file_path,
+    )
+    enqueue_job(job.name)
+    return {'job': job.name}
+
+
+@frappe.whitelist()
+def resume_boq_import(job):
+    """Re-queue a failed or interrupted BOQ import; it continues from its checkpoint"""
+    job = frappe.get_doc('Project Costing Job', job)
+    frappe.has_permission('BOQ', 'write', job.reference_name, throw=True)
+
+    if job.job_type != 'BOQ Import':
+        frappe.throw(_("Job {0} is not a BOQ import").format(job.name))
+    if job.status == 'Completed':
+        frappe.throw(_("Job {0} has already completed").format(job.name))
+    if is_job_enqueued(get_queue_job_id(job.name)):
+        frappe.throw(_("Job {0} is already queued or running").format(job.name))
+
+    job.set_status('Queued')
+    enqueue_job(job.name)
+    return {'job': job.name}
+
+
+def get_queue_job_id(job_name):
+    return f"boq_import::{job_name}"
+
+
+def enqueue_job(job_name):
+    frappe.enqueue(
+        'project_costing.project_costing.doctype.boq.boq_import_job.run_boq_import',
+        job_name=job_name,
+        queue='long',
+        timeout=BOQ_IMPORT_JOB_TIMEOUT,
+        job_id=get_queue_job_id(job_name),
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
+
+
+def run_boq_import(job_name):
+    tracker = ProgressTracker.start('BOQ Import', 'BOQ', None, event='boq_import_progress', job=job_name)
+    frappe.db.commit()
+
+    try:
+        created = import_from_checkpoint(tracker)
+    except Exception:
+        frappe.db.rollback()
+        # Committed chunks stay for a resume; number them so the tree is usable meanwhile
+        rebuild_boq_details_tree(tracker.job.reference_name)
+        tracker.fail()
+        frappe.db.commit()
+        raise
+
+    tracker.finish()
+    frappe.db.commit()
+    return {"success": created}
+
+
+def import_from_checkpoint(tracker):
+    """Insert the rows after the job checkpoint; returns the rows written by this run.
+
+    The sheet is re-planned on every run. Names come from the block reserved on the
+    first run, so a resumed run produces exactly the rows the interrupted one would
+    have.
+    """
+    job = tracker.job
+    params = json.loads(job.parameters or '{}')
+    boq_name = job.reference_name
+    rows = plan_boq_detail_rows(iter_boq_rows(job.file_url, BOQ_COLUMN_MAP), params.get('use_boq_id_hierarchy'))
+    series_key = get_boq_details_series_key(boq_name)
+
+    checkpoint = job.get_checkpoint()
+    if not checkpoint:
+        checkpoint = {
+            'total': len(rows),
+            'series_start': reserve_series_block(series_key, len(rows)),
+            'last_row': 0,
+            'boq_ids': {},  # {BOQ ID: BOQ Details name} for committed rows
+        }
+        tracker.set_total(len(rows))
+        job.set_checkpoint(checkpoint, processed_rows=0)
+        frappe.db.commit()
+    elif checkpoint['total'] != len(rows):
+        frappe.throw(_("The import file changed since job {0} started").format(job.name))
+
+    if rows:
+        names = format_series_names(series_key, checkpoint['series_start'], len(rows))
+        prepare_boq_detail_rows(
+            rows, boq_name, params.get('project_name'), params.get('warehouse'),
+            names=names,
+        )
+        validate_checkpoint(job, rows, checkpoint)
+
+    start = checkpoint['last_row']
+    tracker.total = len(rows)
+
+    def save_checkpoint(done):
+        # Runs after each chunk INSERT: rows and checkpoint are committed together
+        for row in rows[checkpoint['last_row']:start + done]:
+            if row['boq_id']:
+                checkpoint['boq_ids'][row['boq_id']] = row['name']
+        checkpoint['last_row'] = start + done
+        job.set_checkpoint(checkpoint, processed_rows=start + done)
+        tracker.update(start + done)
+        frappe.db.commit()
+
+    created = bulk_insert_docs('BOQ Details', rows[start:], on_chunk=save_checkpoint)
+    rebuild_boq_details_tree(boq_name)
+
+    frappe.db.set_value("BOQ", boq_name, "boq_details_created", 1)
+    return created
+
+
+def validate_checkpoint(job, rows, checkpoint):
+    """Committed BOQ IDs must map to the same names after re-planning the sheet"""
+    planned = {}
+    for row in rows[:checkpoint['last_row']]:
+        if row['boq_id']:
+            planned[row['boq_id']] = row['name']
+
+    if planned != checkpoint['boq_ids']:
+        frappe.throw(_("The import file changed since job {0} started").format(job.name))
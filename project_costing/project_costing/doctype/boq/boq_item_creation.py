@@ -0,0 +1,153 @@
+from collections import defaultdict
+
+import frappe
+from frappe import _
+from frappe.utils import create_batch
+
+from project_costing.project_costing.doctype.boq.boq import get_item_naming_series
+from project_costing.project_costing.utils.bulk import bulk_update_rows
+from project_costing.project_costing.utils.naming import (
+    format_series_names,
+    reserve_series_block,
+    split_naming_series,
+)
+from project_costing.project_costing.utils.progress import ProgressTracker
+
+# Batched "Create Missing Items": existing Items are looked up with one query per
+# batch of names, Item Codes are reserved as one naming-series block per series and
+# the links back to BOQ Details / WBS items are written with set-based UPDATEs.
+# Items themselves still go through the Item controller so ERPNext fills in the
+# UOM conversion table and the Item Group defaults.
+
+ITEM_LOOKUP_BATCH_SIZE = 1000
+
+# {BOQ table fieldname: (child doctype, link field, linked doctype, item code field)}
+ITEM_TABLES = {
+    "boq_details": ("BOQ Items", "boq_detail", "BOQ Details", "item_code"),
+    "wbs_item": ("BOQ WBS Item", "wbs_item", "WBS item", "item"),
+}
+
+
+def create_items_for_boq_batched(boq):
+    boq_doc = frappe.get_doc("BOQ", boq)
+    rows = [(table, row) for table in ITEM_TABLES for row in boq_doc.get(table)]
+    tracker = ProgressTracker.start("Item Creation", "BOQ", boq, event="boq_item_creation_progress", total=len(rows))
+
+    existing = get_item_codes_by_name({(row.item or "").strip() for _table, row in rows})
+    links, new_items = plan_item_rows(rows, existing)
+    assign_item_codes(new_items)
+
+    item_names = []
+    for item in new_items:
+        frappe.get_doc(dict(item, doctype="Item")).insert(ignore_permissions=True, set_name=item["item_code"])
+        item_names.append(item["item_code"])
+        tracker.advance()
+
+    write_item_links(links)
+    boq_doc.db_set("missing_item_created", 1)
+    tracker.finish(message=f"Created {len(item_names)} items")
+    return {"created_items": item_names}
+
+
+def get_item_codes_by_name(item_names):
+    """{lower-cased item_name: Item code}; the oldest Item wins for duplicate names"""
+    codes = {}
+    for batch in create_batch(sorted(name for name in item_names if name), ITEM_LOOKUP_BATCH_SIZE):
+        for item in frappe.get_all(
+            "Item",
+            filters={"item_name": ["in", batch]},
+            fields=["name", "item_name"],
+            order_by="creation asc",
+        ):
+            codes.setdefault(item.item_name.strip().lower(), item.name)
+    return codes
+
+
+def plan_item_rows(rows, existing):
+    """Decide, per `(table, row)`, which Item it links to; nothing is written.
+
+    Mirrors the per-row loop: a row whose item name matches an Item (or an Item
+    planned for an earlier row) only gets `created_item`; the first row of a new
+    name with an Item Group plans that Item and also updates its linked record.
+    Returns `(links, new_items)`: links are `(table, row, item, creates)` where
+    `item` is an existing code or one of the planned item dicts and `creates` marks
+    the row that plans it.
+    """
+    links = []
+    new_items = []
+    planned = {}
+
+    for table, row in rows:
+        item_name = (row.item or "").strip()
+        if not item_name:
+            frappe.throw(_("Please set Item name"))
+
+        key = item_name.lower()
+        if key in existing:
+            links.append((table, row, existing[key], False))
+        elif key in planned:
+            links.append((table, row, planned[key], False))
+        elif row.item_group:
+            item = {
+                "item_code": None,
+                "item_name": item_name[:140],
+                "item_group": row.item_group,
+                "stock_uom": row.uom or "Nos",
+                "is_stock_item": row.is_stock_item,
+                "description": row.item,
+                "disabled": 0,
+            }
+            planned[key] = item
+            new_items.append(item)
+            links.append((table, row, item, True))
+
+    return links, new_items
+
+
+def assign_item_codes(new_items):
+    """Fill `item_code` on planned items, reserving one series block per Item Group series"""
+    by_group = defaultdict(list)
+    for item in new_items:
+        by_group[item["item_group"]].append(item)
+
+    group_codes = dict(
+        frappe.get_all(
+            "Item Group",
+            filters={"name": ["in", list(by_group)]},
+            fields=["name", "custom_group_code"],
+            as_list=True,
+        )
+    ) if by_group else {}
+
+    by_series = defaultdict(list)
+    for item_group, items in by_group.items():
+        by_series[split_naming_series(get_item_naming_series(item_group, group_codes.get(item_group)))] += items
+
+    for (prefix, digits), items in by_series.items():
+        first = reserve_series_block(prefix, len(items))
+        for item, code in zip(items, format_series_names(prefix, first, len(items), digits)):
+            item["item_code"] = code
+
+
+def write_item_links(links):
+    created = defaultdict(dict)  # {child doctype: {row name: item code}}
+    linked = defaultdict(dict)  # {linked doctype: {name: values}}
+
+    for table, row, item, creates in links:
+        child_doctype, link_field, linked_doctype, code_field = ITEM_TABLES[table]
+        if isinstance(item, str):
+            created[child_doctype][row.name] = item
+            continue
+
+        created[child_doctype][row.name] = item["item_code"]
+        if creates and row.get(link_field):
+            linked[linked_doctype][row.get(link_field)] = {
+                code_field: item["item_code"],
+                "item_group": item["item_group"],
+                "uom": row.uom,
+            }
+
+    for doctype, updates in created.items():
+        bulk_update_rows(doctype, {name: {"created_item": code} for name, code in updates.items()})
+    for doctype, updates in linked.items():
+        bulk_update_rows(doctype, updates)
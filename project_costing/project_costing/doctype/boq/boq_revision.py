@@ -0,0 +1,159 @@
+import time
+
+import frappe
+from frappe.utils import cstr, flt
+
+from project_costing.project_costing.doctype.boq.boq import BOQ_COLUMN_MAP, BOQ_FLOAT_FIELDS, iter_boq_rows
+from project_costing.project_costing.doctype.boq.boq_bulk_import import (
+    get_boq_details_series_key,
+    plan_boq_detail_rows,
+)
+from project_costing.project_costing.utils.bulk import bulk_insert_docs, bulk_update_rows
+from project_costing.project_costing.utils.naming import make_series_names
+from project_costing.project_costing.utils.nestedset import rebuild_nested_set
+from project_costing.project_costing.utils.progress import ProgressTracker
+
+# Delta import of a revised BOQ sheet. Incoming rows are matched to the existing
+# BOQ Details by BOQ ID (falling back to Item Cost Code); only new rows are inserted,
+# only changed fields are written and rows missing from the revision are flagged
+# `is_removed` instead of deleted, so links from WBS items and purchasing documents
+# stay intact. The nested set is rebuilt once, and only if the tree changed.
+
+REVISION_FIELDS = tuple(BOQ_COLUMN_MAP)
+
+
+@frappe.whitelist()
+def import_boq_revision(file_path: str, boq_name: str, use_boq_id_hierarchy=False):
+    """Apply a revised BOQ sheet to the existing BOQ Details of `boq_name`"""
+    frappe.has_permission('BOQ', 'write', boq_name, throw=True)
+    start = time.monotonic()
+    tracker = ProgressTracker.start('BOQ Revision', 'BOQ', boq_name, event='boq_import_progress')
+
+    rows = plan_boq_detail_rows(iter_boq_rows(file_path, BOQ_COLUMN_MAP), use_boq_id_hierarchy)
+    existing = frappe.get_all(
+        'BOQ Details',
+        filters={'boq': boq_name},
+        fields=['name', 'parent_boq_details', 'lft', 'rgt', 'is_group', 'is_removed', *REVISION_FIELDS],
+        order_by='lft asc, creation asc',
+    )
+    tracker.set_total(len(rows))
+
+    names = match_existing_rows(rows, existing)
+    new_rows = [index for index, name in enumerate(names) if name is None]
+    new_names = iter(make_series_names(get_boq_details_series_key(boq_name), len(new_rows)))
+    for index in new_rows:
+        names[index] = next(new_names)
+
+    by_name = {row.name: row for row in existing}
+    updates = {}
+    inserts = []
+    tree_changed = bool(new_rows)
+    project, warehouse = frappe.db.get_value('BOQ', boq_name, ['project', 'warehouse'])
+
+    for index, row in enumerate(rows):
+        parent = names[row['_parent']] if row['_parent'] is not None else None
+        current = by_name.get(names[index])
+
+        if current is None:
+            inserts.append(make_detail_row(row, names[index], parent, boq_name, project, warehouse))
+            continue
+
+        changed = get_changed_fields(row, current)
+        if cstr(current.parent_boq_details) != cstr(parent):
+            changed['parent_boq_details'] = parent
+            changed['old_parent'] = parent
+            tree_changed = True
+        if current.is_removed:
+            changed['is_removed'] = 0
+        if changed:
+            updates[current.name] = changed
+    tracker.update(len(rows))
+
+    matched = set(names)
+    removed = {row.name: {'is_removed': 1} for row in existing if row.name not in matched and not row.is_removed}
+    restored = sum(1 for values in updates.values() if values.get('is_removed') == 0)
+    updates.update(removed)
+
+    bulk_insert_docs('BOQ Details', inserts)
+    bulk_update_rows('BOQ Details', updates)
+
+    if tree_changed:
+        rebuild_boq_nested_set(boq_name, names)
+
+    result = {
+        'inserted': len(inserts),
+        'updated': len(updates) - len(removed) - restored,
+        'removed': len(removed),
+        'restored': restored,
+        'unchanged': len(rows) - len(inserts) - (len(updates) - len(removed)),
+        'elapsed': flt(time.monotonic() - start, 2),
+    }
+    tracker.finish(message=(
+        f"Inserted {result['inserted']}, updated {result['updated']}, "
+        f"removed {result['removed']}, restored {result['restored']}"
+    ))
+    frappe.db.commit()
+    return result
+
+
+def match_existing_rows(rows, existing):
+    """Existing BOQ Details name for every planned row (None for new rows).
+
+    Rows carrying a BOQ ID are matched on it, the others on Item Cost Code. Every
+    existing row is matched at most once, in sheet order.
+    """
+    by_key = {}
+    for row in existing:
+        by_key.setdefault(get_match_key(row), []).append(row.name)
+
+    names = []
+    for row in rows:
+        candidates = by_key.get(get_match_key(row))
+        names.append(candidates.pop(0) if candidates else None)
+    return names
+
+
+def get_match_key(row):
+    if row['boq_id']:
+        return ('boq_id', cstr(row['boq_id']))
+    return ('item_cost_code', cstr(row['item_cost_code']))
+
+
+def get_changed_fields(row, current):
+    changed = {}
+    for field in REVISION_FIELDS:
+        if field in BOQ_FLOAT_FIELDS:
+            if flt(row[field], 9) != flt(current[field], 9):
+                changed[field] = row[field]
+        elif cstr(row[field]) != cstr(current[field]):
+            changed[field] = row[field]
+    return changed
+
+
+def make_detail_row(row, name, parent, boq_name, project, warehouse):
+    values = {field: row[field] for field in REVISION_FIELDS}
+    values.update({
+        'name': name,
+        'boq': boq_name,
+        'project': project,
+        'warehouse': warehouse,
+        'parent': boq_name,
+        'parenttype': 'BOQ',
+        'parentfield': 'items',
+        'parent_boq_details': parent,
+        'old_parent': parent,
+    })
+    return values
+
+
+def rebuild_boq_nested_set(boq_name, sheet_order):
+    """Renumber the BOQ's tree once: rows in sheet order first, then the rest by `lft`"""
+    position = {name: index for index, name in enumerate(sheet_order)}
+    rows = frappe.get_all(
+        'BOQ Details',
+        filters={'boq': boq_name},
+        fields=['name', 'parent_boq_details as parent', 'lft', 'rgt', 'is_group'],
+        order_by='lft asc, creation asc',
+    )
+    rows.sort(key=lambda row: (row.name not in position, position.get(row.name, 0)))
+    return rebuild_nested_set('BOQ Details', rows)
@@ -0,0 +1,172 @@
+import frappe
+from frappe import _
+from frappe.utils import now_datetime
+from frappe.utils.background_jobs import is_job_enqueued
+
+from project_costing.project_costing.doctype.project_costing_job.project_costing_job import create_job
+from project_costing.project_costing.utils.bulk import bulk_insert_docs
+from project_costing.project_costing.utils.naming import make_series_names, split_naming_series
+from project_costing.project_costing.utils.nestedset import rebuild_tree_subset
+from project_costing.project_costing.utils.progress import ProgressTracker
+
+# Task generation for a BOQ: one group Task per BOQ Details row and one Task per WBS
+# item under it. Names and `parent_task` links are assigned in memory, rows are
+# written with multi-row INSERTs and the Task tree of the BOQ is renumbered once.
+# Rows that already have a Task are skipped, so a re-run only adds what is missing.
+
+TASK_JOB_TIMEOUT = 7200
+DEFAULT_TASK_SERIES = "TASK-.YYYY.-"
+
+
+@frappe.whitelist()
+def enqueue_task_creation(boq_name):
+    """Queue Task generation for the BOQ and return the Project Costing Job tracking it"""
+    frappe.has_permission('BOQ', 'write', boq_name, throw=True)
+    if is_job_enqueued(get_queue_job_id(boq_name)):
+        frappe.throw(_("Tasks for BOQ {0} are already being created").format(boq_name))
+
+    job = create_job('Task Creation', 'BOQ', boq_name)
+    frappe.enqueue(
+        'project_costing.project_costing.doctype.boq.boq_task_creation.run_task_creation',
+        job_name=job.name,
+        queue='long',
+        timeout=TASK_JOB_TIMEOUT,
+        job_id=get_queue_job_id(boq_name),
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
+    return {'job': job.name}
+
+
+def get_queue_job_id(boq_name):
+    return f"boq_tasks::{boq_name}"
+
+
+def run_task_creation(job_name):
+    tracker = ProgressTracker.start('Task Creation', 'BOQ', None, event='boq_task_progress', job=job_name)
+    frappe.db.commit()
+
+    try:
+        created = create_missing_tasks(tracker.job.reference_name, tracker)
+    except Exception:
+        frappe.db.rollback()
+        tracker.fail()
+        frappe.db.commit()
+        raise
+
+    tracker.finish(message=f"Created {len(created)} tasks")
+    frappe.db.commit()
+    return {'created_task': created}
+
+
+def create_missing_tasks(boq_name, tracker=None):
+    """Insert the Tasks the BOQ is missing; returns the names of the new Tasks"""
+    boq_details = frappe.get_all(
+        "BOQ Details",
+        filters={"boq": boq_name},
+        fields=["name", "item_cost_code", "boq", "item", "project"],
+        order_by="lft asc, creation asc",
+    )
+    wbs_items = frappe.get_all(
+        "WBS item",
+        filters={"boq": boq_name},
+        fields=["name", "item_code", "short_description", "project", "boq", "boq_details"],
+        order_by="lft asc, creation asc",
+    )
+    existing = frappe.get_all(
+        "Task",
+        filters={"custom_boq": boq_name},
+        fields=["name", "custom_boq_details", "custom_wbs_item"],
+    )
+
+    naming_series = get_task_naming_series()
+    series_key, digits = split_naming_series(naming_series)
+    rows = plan_task_rows(
+        boq_details,
+        wbs_items,
+        existing,
+        lambda count: make_series_names(series_key, count, digits),
+    )
+    if tracker:
+        tracker.set_total(len(rows))
+
+    companies = get_project_companies({row["project"] for row in rows})
+    timestamp = now_datetime()
+    for row in rows:
+        row.update(naming_series=naming_series, exp_start_date=timestamp, company=companies.get(row["project"]))
+
+    def on_chunk(done):
+        # Every chunk is durable: a failed run is finished by simply running it again
+        frappe.db.commit()
+        if tracker:
+            tracker.update(done)
+
+    bulk_insert_docs("Task", rows, on_chunk=on_chunk)
+    # Task is one tree for the whole site; subtasks users added under BOQ Tasks move with them
+    rebuild_tree_subset("Task", "parent_task", {"custom_boq": boq_name}, with_descendants=True)
+
+    for project in {row["project"] for row in rows if row["project"]}:
+        # Task.on_update would do this once per row
+        frappe.get_doc("Project", project).update_project()
+
+    frappe.db.set_value("BOQ", boq_name, "task_created", 1)
+    return [row["name"] for row in rows]
+
+
+def plan_task_rows(boq_details, wbs_items, existing, make_names):
+    """Task rows for the BOQ Details and WBS items that have no Task yet.
+
+    `make_names(count)` returns the names for the new rows. A WBS item's Task is
+    placed under the Task of its BOQ Details row, whether that one is new or not.
+    """
+    detail_tasks = {task.custom_boq_details: task.name for task in existing
+        if task.custom_boq_details and not task.custom_wbs_item}
+    wbs_tasks = {task.custom_wbs_item for task in existing if task.custom_wbs_item}
+
+    new_details = [row for row in boq_details if row.name not in detail_tasks]
+    new_wbs = [row for row in wbs_items if row.name not in wbs_tasks]
+    names = iter(make_names(len(new_details) + len(new_wbs)))
+
+    rows = []
+    for row in new_details:
+        detail_tasks[row.name] = next(names)
+        rows.append({
+            "name": detail_tasks[row.name],
+            "subject": row.item_cost_code or f"Task for BoQ Details {row.name}",
+            "custom_boq": row.boq,
+            "project": row.project,
+            "custom_boq_details": row.name,
+            "description": row.item,
+            "is_group": 1,
+        })
+
+    for row in new_wbs:
+        parent = detail_tasks.get(row.boq_details) if row.boq_details else None
+        rows.append({
+            "name": next(names),
+            "subject": row.short_description or f"Task for WBS {row.name}",
+            "custom_boq": row.boq,
+            "project": row.project,
+            "custom_wbs_item": row.name,
+            "description": row.item_code,
+            "parent_task": parent,
+            "old_parent": parent,
+        })
+
+    return rows
+
+
+def get_task_naming_series():
+    field = frappe.get_meta("Task").get_field("naming_series")
+    if not field:
+        return DEFAULT_TASK_SERIES
+    return field.default or (field.options or "").split("\n")[0] or DEFAULT_TASK_SERIES
+
+
+def get_project_companies(projects):
+    projects = [project for project in projects if project]
+    if not projects:
+        return {}
+    return dict(frappe.get_all(
+        "Project", filters={"name": ["in", projects]}, fields=["name", "company"], as_list=True
+    ))
@@ -1,9 +1,206 @@
 # Copyright (c) 2025, Finbyz and Contributors
 # See license.txt
 
-# import frappe
+import os
+import tempfile
+from unittest.mock import patch
+
+import frappe
+import pandas as pd
 from frappe.tests.utils import FrappeTestCase
 
+from project_costing.project_costing.doctype.boq.boq import (
+	BOQ_COLUMN_MAP,
+	BOQIdIndex,
+	check_boq_rows,
+	check_level_hierarchy,
+	normalize_boq_frame,
+	safe_float,
+	safe_int,
+	safe_string,
+	to_int_column,
+)
+from project_costing.project_costing.doctype.boq.boq_bulk_import import plan_level_based_rows
+from project_costing.project_costing.doctype.boq.boq_item_creation import plan_item_rows
+from project_costing.project_costing.doctype.boq.boq_revision import get_changed_fields, match_existing_rows
+from project_costing.project_costing.doctype.boq.boq_task_creation import plan_task_rows
+from project_costing.project_costing.utils.import_report import ImportReport
+from project_costing.project_costing.utils.nestedset import compute_nested_set, rebuild_tree_subset
+from project_costing.project_costing.utils.sheet_cache import (
+	evict_sheet_cache,
+	get_storable_frame,
+	restore_stored_frame,
+)
+from project_costing.project_costing.utils.sheet_reader import iter_sheet_chunks
+
 
 class TestBOQ(FrappeTestCase):
-	pass
+	def test_level_based_plan_links_rows_to_nearest_upper_level(self):
+		sheet = pd.DataFrame({"Item Cost Code": ["A11", "A", "A1"], "LvL": [3, 1, 2]})
+		rows = plan_level_based_rows(normalize_boq_frame(sheet, BOQ_COLUMN_MAP))
+
+		self.assertEqual([row["item_cost_code"] for row in rows], ["A", "A1", "A11"])
+		self.assertEqual([row["_parent"] for row in rows], [None, 0, 1])
+
+	def test_boq_id_index_resolves_ancestors_and_div_names(self):
+		sheet = pd.DataFrame({"BOQ ID": ["1.2.3", "1.4"], "DIV. Name": ["Concrete", "Steel"]})
+		index = BOQIdIndex()
+		for row in normalize_boq_frame(sheet, BOQ_COLUMN_MAP):
+			index.add(row)
+
+		self.assertEqual(index.ancestors("1.2.3"), ("1.2", "1"))
+		self.assertEqual(index.div_name("1"), "Concrete")
+		self.assertEqual(index.div_name("1.2"), "Concrete")
+		self.assertEqual(index.find_parent("1.2.3", {"1": "BOQ-0001-00001"}), "BOQ-0001-00001")
+
+	def test_normalized_rows_match_safe_helpers(self):
+		sheet = pd.DataFrame({
+			"Item Cost Code": [" A1 ", None, 12],
+			"BOQ Qty": ["2.5", None, "n/a"],
+			"TakeOff": [1, float("nan"), " 3 "],
+			"LvL": [2.9, None, "x"],
+		})
+		rows = normalize_boq_frame(sheet, BOQ_COLUMN_MAP)
+
+		for row, (_, raw) in zip(rows, sheet.iterrows()):
+			self.assertEqual(row.item_cost_code, safe_string(raw["Item Cost Code"]))
+			self.assertEqual(row.boq_qty, safe_float(raw["BOQ Qty"]))
+			self.assertEqual(row.takeoff, safe_float(raw["TakeOff"]))
+			self.assertEqual(row.lvl, safe_int(raw["LvL"]))
+			self.assertEqual(row.uom, "")
+
+	def test_int_column_matches_safe_int_on_mixed_input(self):
+		values = pd.Series(["2.5", " 3 ", "-4", "3.0", "1e2", 7.9, 5, None, float("nan"), "x", True])
+
+		self.assertEqual(to_int_column(values).tolist(), [safe_int(value) for value in values])
+
+	def test_dry_run_reports_bad_rows_by_sheet_row(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "boq.csv")
+			with open(path, "w") as f:
+				# Sheet row 3 is blank and skipped by the reader
+				f.write("Item Cost Code,LvL,BOQ ID\nA1,2,1.1\n\n,2,1.2\nA2,3,1.1\n")
+			sheet = next(iter_sheet_chunks(path))
+
+		report = ImportReport()
+		rows = check_boq_rows(list(zip(sheet.index, normalize_boq_frame(sheet, BOQ_COLUMN_MAP))), report)
+		check_level_hierarchy(rows, report)
+
+		errors = {(issue["row"], issue["message"]) for issue in report.as_dict()["errors"]}
+		self.assertEqual(errors, {
+			(4, "Missing Item Cost Code; the row would be skipped"),
+			(5, "Duplicate BOQ ID"),
+			(2, "Orphan level: no row at an upper level"),
+		})
+
+	def test_revision_matches_rows_by_boq_id_then_cost_code(self):
+		sheet = pd.DataFrame({
+			"Item Cost Code": ["A-renamed", "B", "C"],
+			"BOQ ID": ["1.1", None, "1.2"],
+			"BOQ Qty": [5, 2, 1],
+		})
+		rows = plan_level_based_rows(normalize_boq_frame(sheet, BOQ_COLUMN_MAP))
+		existing = [
+			frappe._dict(rows[0], name="D-1", item_cost_code="A", lvl="1", uom=None),
+			frappe._dict(rows[1], name="D-2", boq_qty=1.0),
+		]
+
+		self.assertEqual(match_existing_rows(rows, existing), ["D-1", "D-2", None])
+		self.assertEqual(get_changed_fields(rows[0], existing[0]), {"item_cost_code": "A-renamed"})
+		self.assertEqual(get_changed_fields(rows[1], existing[1]), {"boq_qty": 2.0})
+
+	def test_nested_set_bounds(self):
+		bounds = compute_nested_set([("a", None), ("b", "a"), ("c", "a"), ("d", None)], start=5)
+
+		self.assertEqual(bounds, {"a": (5, 10), "b": (6, 7), "c": (8, 9), "d": (11, 12)})
+
+	def test_task_subset_rebuild_takes_subtasks_along(self):
+		def task(name, parent, lft, rgt):
+			return frappe._dict(name=name, parent=parent, lft=lft, rgt=rgt, is_group=0, old_parent=parent)
+
+		levels = [
+			[task("T-1", None, 10, 15), task("T-2", "T-1", 11, 12)],  # BOQ Tasks
+			[task("U-1", "T-1", 13, 14)],  # added by a user, no custom_boq
+			[],
+		]
+		module = "project_costing.project_costing.utils.nestedset"
+		with patch(f"{module}.frappe.get_all", side_effect=levels), \
+				patch(f"{module}.rebuild_nested_set") as rebuild, patch(f"{module}.frappe_rebuild_tree") as full:
+			rebuild_tree_subset("Task", "parent_task", {"custom_boq": "BOQ-1"}, with_descendants=True)
+
+		full.assert_not_called()
+		self.assertEqual([row.name for row in rebuild.call_args.args[1]], ["T-1", "T-2", "U-1"])
+
+		levels = [[task("T-1", "U-0", 10, 13), task("T-2", "T-1", 11, 12)]]
+		with patch(f"{module}.frappe.get_all", side_effect=levels), \
+				patch(f"{module}.rebuild_nested_set") as rebuild, patch(f"{module}.frappe_rebuild_tree") as full:
+			rebuild_tree_subset("Task", "parent_task", {"custom_boq": "BOQ-1"}, with_descendants=True)
+
+		full.assert_called_once_with("Task")
+		rebuild.assert_not_called()
+
+	def test_sheet_cache_evicts_least_recently_used_entries(self):
+		with tempfile.TemporaryDirectory() as root:
+			for key, size, used_at in (("used", 300, 1000), ("old", 400, 2000), ("new", 200, 3000)):
+				os.makedirs(os.path.join(root, key))
+				with open(os.path.join(root, key, "part-00000.parquet"), "wb") as f:
+					f.write(b"x" * size)
+				os.utime(os.path.join(root, key), (used_at, used_at))
+			os.makedirs(os.path.join(root, ".writing"))
+			os.utime(os.path.join(root, "used"))  # read just now
+
+			with patch("project_costing.project_costing.utils.sheet_cache.get_cache_root", return_value=root):
+				left = evict_sheet_cache(max_bytes=600)
+
+			self.assertEqual(left, 500)
+			self.assertEqual(sorted(os.listdir(root)), [".writing", "new", "used"])
+
+	def test_sheet_cache_stores_mixed_columns_as_text(self):
+		chunk = pd.DataFrame({
+			"Cost Code": ["A-1", "A-2", "A-3"],
+			"Finance Code": [1234, "FC-7", 5100.1],
+			"BOQ Qty": [1.5, None, 2.0],
+		})
+
+		stored = get_storable_frame(chunk)
+		restored = restore_stored_frame(stored)
+
+		self.assertEqual(stored["Finance Code"].isna().tolist(), [True, False, True])
+		self.assertEqual(stored["Finance Code"][1], "FC-7")
+		self.assertEqual(stored["__numbers__:Finance Code"].tolist()[::2], [1234.0, 5100.1])
+		self.assertEqual(stored["BOQ Qty"].dtype, float)
+		self.assertEqual(restored["Finance Code"].tolist(), [1234, "FC-7", 5100.1])
+		self.assertEqual(list(restored.columns), list(chunk.columns))
+		self.assertEqual(normalize_boq_frame(restored, BOQ_COLUMN_MAP), normalize_boq_frame(chunk, BOQ_COLUMN_MAP))
+
+	def test_item_plan_creates_each_missing_name_once(self):
+		rows = [
+			("boq_details", frappe._dict(name="R1", item="Cable ", item_group="Electrical", uom="m")),
+			("boq_details", frappe._dict(name="R2", item="Pipe", item_group="Plumbing", uom=None)),
+			("wbs_item", frappe._dict(name="R3", item="cable", item_group="Electrical", uom="m")),
+			("wbs_item", frappe._dict(name="R4", item="Valve", item_group=None, uom=None)),
+		]
+		links, new_items = plan_item_rows(rows, {"pipe": "PLB-00001"})
+
+		self.assertEqual([item["item_name"] for item in new_items], ["Cable"])
+		self.assertEqual(new_items[0]["stock_uom"], "m")
+		self.assertEqual(
+			[(row.name, item if isinstance(item, str) else item["item_name"], creates) for _table, row, item, creates in links],
+			[("R1", "Cable", True), ("R2", "PLB-00001", False), ("R3", "Cable", False)],
+		)
+
+	def test_task_plan_skips_existing_tasks_and_links_parents(self):
+		boq_details = [
+			frappe._dict(name="D1", item_cost_code="A", boq="B", item="a", project="P"),
+			frappe._dict(name="D2", item_cost_code="B", boq="B", item="b", project="P"),
+		]
+		wbs_items = [
+			frappe._dict(name="W1", item_code="w1", short_description="", project="P", boq="B", boq_details="D1"),
+			frappe._dict(name="W2", item_code="w2", short_description="", project="P", boq="B", boq_details="D2"),
+		]
+		existing = [frappe._dict(name="T-OLD", custom_boq_details="D1", custom_wbs_item=None)]
+		rows = plan_task_rows(boq_details, wbs_items, existing, lambda count: [f"T{i}" for i in range(count)])
+
+		self.assertEqual([row["name"] for row in rows], ["T0", "T1", "T2"])
+		self.assertEqual([row.get("parent_task") for row in rows], [None, "T-OLD", "T0"])
+		self.assertEqual(rows[1]["subject"], "Task for WBS W1")
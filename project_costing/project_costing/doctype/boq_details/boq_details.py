@@ -4,20 +4,13 @@
 import frappe
 from frappe.model.document import Document
 
+from project_costing.project_costing.utils.item_cache import apply_item_attributes
+
 
 class BOQDetails(Document):
     def validate(self):
-        existing_item_name = frappe.db.get_value("Item",filters={"name": self.item_code,"disabled": 0, "item_group": ["!=", "WBS"]},fieldname="name")
-
-        if existing_item_name:
-            self.db_set("item_code",existing_item_name)
-            if self.item:
-                self.db_set("item_group",frappe.db.get_value("Item",self.item_code,"item_group"))
-                self.db_set("uom",frappe.db.get_value("Item",self.item_code,"stock_uom"))
-                self.db_set("item_name",frappe.db.get_value("Item",self.item_code,"item_name"))
-        else:
-            self.item_code = None
-            # raise DoesNotExistError(f"Item {self.item_code} does not exist")
+        # One cached Item lookup; changed fields are written by this save
+        apply_item_attributes(self, "item_code", excluded_group="WBS", set_details=bool(self.item))
 
 @frappe.whitelist()
 def get_children(doctype, parent=None, is_root=False, **kwargs):
@@ -0,0 +1,48 @@
+// Copyright (c) 2025, Finbyz and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on("Project Costing Job", {
+	refresh(frm) {
+		if (frm.doc.job_type === "BOQ Import" && ["Failed", "Running"].includes(frm.doc.status)) {
+			frm.add_custom_button(__("Resume"), () => {
+				frappe.call({
+					method: "project_costing.project_costing.doctype.boq.boq_import_job.resume_boq_import",
+					args: { job: frm.doc.name },
+					callback() {
+						frm.reload_doc();
+					},
+				});
+			});
+		}
+
+		clearTimeout(frm.status_poll);
+		if (["Queued", "Running"].includes(frm.doc.status)) {
+			frm.events.poll_status(frm);
+		}
+	},
+
+	poll_status(frm) {
+		frappe.call({
+			method: "project_costing.project_costing.utils.progress.get_job_status",
+			args: { job: frm.doc.name },
+			callback(r) {
+				const state = r.message;
+				if (!state) return;
+
+				if (state.progress != null) {
+					let title = __("{0} of {1} rows", [state.done, state.total]);
+					if (state.eta_seconds != null) {
+						title += " · " + __("{0}s left", [state.eta_seconds]);
+					}
+					frm.dashboard.show_progress(__("Progress"), state.progress, title);
+				}
+
+				if (state.status !== frm.doc.status) {
+					frm.reload_doc();
+				} else {
+					frm.status_poll = setTimeout(() => frm.events.poll_status(frm), 3000);
+				}
+			},
+		});
+	},
+});
@@ -0,0 +1,51 @@
+# Copyright (c) 2025, Finbyz and contributors
+# For license information, please see license.txt
+
+import json
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now_datetime
+
+
+class ProjectCostingJob(Document):
+	def get_checkpoint(self):
+		return json.loads(self.checkpoint) if self.checkpoint else {}
+
+	def set_checkpoint(self, checkpoint, processed_rows=None):
+		"""Store the checkpoint with a direct UPDATE so it lands in the caller's transaction"""
+		values = {"checkpoint": json.dumps(checkpoint)}
+		if processed_rows is not None:
+			values["processed_rows"] = processed_rows
+		self.db_set(values, update_modified=False)
+
+	def set_status(self, status, error=None):
+		values = {"status": status}
+		if status == "Running":
+			values["started_on"] = now_datetime()
+			values["error"] = None
+		elif status in ("Completed", "Failed"):
+			values["ended_on"] = now_datetime()
+		if error:
+			values["error"] = error
+		self.db_set(values)
+		# The cached progress state belongs to the previous status
+		frappe.cache.delete_value(get_status_cache_key(self.name))
+
+
+def get_status_cache_key(job_name):
+	return f"project_costing_job_status:{job_name}"
+
+
+def create_job(job_type, reference_doctype, reference_name, parameters=None, file_url=None):
+	job = frappe.get_doc({
+		"doctype": "Project Costing Job",
+		"job_type": job_type,
+		"status": "Queued",
+		"reference_doctype": reference_doctype,
+		"reference_name": reference_name,
+		"file_url": file_url,
+		"parameters": json.dumps(parameters or {}),
+	})
+	job.insert(ignore_permissions=True)
+	return job
@@ -0,0 +1,22 @@
+# Copyright (c) 2025, Finbyz and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from project_costing.project_costing.utils.progress import ProgressTracker
+
+
+class TestProjectCostingJob(FrappeTestCase):
+	def test_progress_tracker_throttles_by_percent_step(self):
+		job = frappe._dict(name="job", job_type="BOQ Import", status="Running", processed_rows=0, failed_rows=0)
+		tracker = ProgressTracker(job, event="boq_import_progress", total=1000, interval=0, step=10)
+
+		with patch.object(ProgressTracker, "save", return_value={}), patch.object(ProgressTracker, "publish") as publish:
+			for done in range(1, 1001):
+				tracker.update(done)
+
+		# First row, every 10 percent after it, and the last row
+		self.assertEqual(publish.call_count, 11)
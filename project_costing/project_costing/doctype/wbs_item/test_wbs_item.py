@@ -1,9 +1,297 @@
 # Copyright (c) 2025, Finbyz and Contributors
 # See license.txt
 
-# import frappe
+import json
+from datetime import datetime
+from unittest.mock import patch
+
+import frappe
+import pandas as pd
 from frappe.tests.utils import FrappeTestCase
 
+from project_costing.project_costing.doc_events.wbs_item import validate as validate_wbs_item
+from project_costing.project_costing.doctype.wbs_item.wbs_item import (
+	WBSitem,
+	get_stock_figure_changes,
+	get_wbs_item_updates,
+)
+from project_costing.project_costing.doctype.wbs_item.wbs_item_import import (
+	CostCodeTrie,
+	has_wbs_parent,
+	type_wbs_chunk,
+)
+from project_costing.project_costing.doctype.wbs_item.wbs_item_parallel_import import (
+	finish_stale_wbs_imports,
+	pack_subtrees,
+	plan_wbs_rows,
+)
+from project_costing.project_costing.utils.indexes import (
+	ensure_tracking_indexes,
+	get_index_name,
+	get_index_plan,
+	get_used_indexes,
+)
+from project_costing.project_costing.utils.naming import SeriesNameBlock
+
 
 class TestWBSitem(FrappeTestCase):
-	pass
+	def test_dry_run_parent_rules_match_import(self):
+		levels = {"ABC24-01": 1, "ABC24-0102": 2}
+
+		self.assertTrue(has_wbs_parent("ABC24-01-05", 2, levels))
+		self.assertTrue(has_wbs_parent("ABC24-010203", 3, levels))
+		self.assertFalse(has_wbs_parent("ABC24-02-05", 2, levels))
+		self.assertFalse(has_wbs_parent("ABC24-010203", 4, levels))
+
+	def test_trie_finds_first_prefix_one_level_up(self):
+		trie = CostCodeTrie()
+		for code, name, level in (("AB", "W1", 1), ("ABC", "W2", 2), ("A", "W3", 2), ("ABCD", "W4", 3)):
+			trie.add(code, name, level)
+
+		self.assertEqual(trie.find_parent("ABCDE", 2), "W2")
+		self.assertEqual(trie.find_parent("ABCDE", 3), "W4")
+		self.assertEqual(trie.find_parent("ABX", 1), "W1")
+		self.assertIsNone(trie.find_parent("ABCD", 4))
+		self.assertIsNone(trie.find_parent("AB", 1))
+		self.assertIsNone(trie.find_parent("XYZ", 1))
+
+		trie.add("AB", "W5", 2)  # re-added code keeps its place but takes the new level
+		self.assertEqual(trie.find_parent("ABCDE", 2), "W5")
+
+	def test_plan_splits_sheet_into_independent_subtrees(self):
+		sheet = [
+			("ABC-01", 1), ("ABC-01-A", 2), ("ABC-01-A-1", 3), ("ABC-01-A-1-x", 4),
+			("ABC-01-B", 2), ("ABC-01-B-1", 3), ("OLD-9-1", 3), ("ZZZ-1-1", 3), (None, 3),
+		]
+		rows = [(idx, {"wbs_code": code, "level": level}) for idx, (code, level) in enumerate(sheet)]
+		existing = CostCodeTrie()
+		existing.add("OLD-9", "WBS-0001", 2)
+
+		top, subtrees, errors = plan_wbs_rows(
+			rows, {"OLD-9": "WBS-0001"}, existing, lambda count: [f"N{i}" for i in range(count)]
+		)
+
+		self.assertEqual([(row["name"], row["parent"]) for row in top], [("N0", None), ("N1", "N0"), ("N4", "N0")])
+		self.assertEqual(
+			{root: [(row["name"], row["parent"]) for row in rows] for root, rows in subtrees.items()},
+			{
+				"N1": [("N2", "N1"), ("N3", "N2")],
+				"N4": [("N5", "N4")],
+				"WBS-0001": [("N6", "WBS-0001")],
+				None: [("N7", None)],
+			},
+		)
+		self.assertEqual(errors, ["Row 10: Missing Cost Code"])
+		self.assertEqual([len(batch) for batch in pack_subtrees([[1, 2], [3], [4, 5, 6], [7]], 3)], [3, 3, 1])
+
+	def test_stale_parallel_import_gets_its_join_step(self):
+		def job(name, checkpoint):
+			return frappe._dict(name=name, reference_name=f"BOQ-{name}", checkpoint=json.dumps(checkpoint))
+
+		jobs = [
+			job("J1", {"jobs": 2, "enqueued_on": "2026-01-01 08:00:00"}),  # workers gone
+			job("J2", {"jobs": 2, "enqueued_on": "2026-01-01 08:00:00"}),  # a worker still running
+			job("J3", {"jobs": 2, "enqueued_on": "2026-01-01 09:55:00"}),  # just enqueued
+			job("J4", {}),  # sequential import
+		]
+		module = "project_costing.project_costing.doctype.wbs_item.wbs_item_parallel_import"
+		with patch(f"{module}.frappe.get_all", return_value=jobs), \
+				patch(f"{module}.now_datetime", return_value=datetime(2026, 1, 1, 10, 0)), \
+				patch(f"{module}.is_job_enqueued", side_effect=lambda queue_id: queue_id == "wbs_import::J2::1"), \
+				patch(f"{module}.enqueue_finish") as enqueue_finish:
+			self.assertEqual(finish_stale_wbs_imports(), ["J1"])
+
+		enqueue_finish.assert_called_once_with("J1", "BOQ-J1")
+
+	def test_chunk_typing_coerces_whole_columns(self):
+		chunk = pd.DataFrame({
+			"wbs_code": ["A-1", "A-2", "A-3", "A-4"],
+			"level": [1, 2, 3, 3],
+			"BOQ Qty": [" 5 ", "n/a", 2, None],
+			"Finance Code": [1234.0, " FC-7 ", None, "5100.10"],
+			"Unit": ["  m3", "", None, None],
+			"Remarks": ["not imported", None, None, None],
+		})
+		column_types = {
+			"BOQ Qty": ("qty", "number"),
+			"Finance Code": ("cost_center_code", "code"),
+			"Unit": ("uom", "text"),
+		}
+
+		typed = type_wbs_chunk(chunk, column_types)
+
+		self.assertNotIn("Remarks", typed.columns)
+		self.assertEqual(typed["BOQ Qty"].tolist()[:3:2], [5.0, 2.0])
+		self.assertTrue(pd.isna(typed["BOQ Qty"][1]))
+		self.assertEqual(typed["Finance Code"].tolist(), ["1234", "FC-7", None, "5100.10"])
+		self.assertEqual(typed["Unit"].tolist(), ["m3", None, None, None])
+		# A column of numbers only is numeric as a whole
+		self.assertEqual(type_wbs_chunk(chunk.assign(**{"Finance Code": 5100.1}), column_types)["Finance Code"][0], "5100")
+
+	def test_name_block_reserves_counter_once_per_block(self):
+		counter = {"WBS-": 41}
+
+		def reserve(key, count, initial=0):
+			counter[key] += count
+			return counter[key] - count + 1
+
+		block = SeriesNameBlock("WBS-", block_size=3, digits=4)
+		with patch("project_costing.project_costing.utils.naming.reserve_series_block", side_effect=reserve) as reserved:
+			names = [block.next_name() for _ in range(4)]
+
+		self.assertEqual(names, ["WBS-0042", "WBS-0043", "WBS-0044", "WBS-0045"])
+		self.assertEqual(reserved.call_count, 2)
+		self.assertEqual(counter["WBS-"], 47)
+
+	def test_discarded_block_is_reserved_again(self):
+		counter = {"WBS-": 0}
+
+		def reserve(key, count, initial=0):
+			counter[key] += count
+			return counter[key] - count + 1
+
+		block = SeriesNameBlock("WBS-", block_size=10, digits=4)
+		with patch("project_costing.project_costing.utils.naming.reserve_series_block", side_effect=reserve):
+			first = block.next_name()
+			# a failed import row rolled back the counter update of this block
+			counter["WBS-"] = 0
+			block.discard()
+			second = block.next_name()
+
+		self.assertEqual(first, "WBS-0001")
+		self.assertEqual(second, "WBS-0001")
+		self.assertEqual(counter["WBS-"], 10)
+
+	def test_block_is_discarded_when_its_transaction_rolls_back(self):
+		counter = {"WBS-": 0}
+		callbacks = []
+
+		def reserve(key, count, initial=0):
+			counter[key] += count
+			return counter[key] - count + 1
+
+		block = SeriesNameBlock("WBS-", block_size=10, digits=4)
+		naming = "project_costing.project_costing.utils.naming"
+		with patch(f"{naming}.reserve_series_block", side_effect=reserve), patch(f"{naming}.frappe.db") as db:
+			db.after_rollback.add.side_effect = callbacks.append
+			first = block.next_name()
+			# frappe.db.rollback(): the counter update is undone and the callbacks run
+			counter["WBS-"] = 0
+			for callback in callbacks:
+				callback()
+			second = block.next_name()
+
+		self.assertEqual((first, second), ("WBS-0001", "WBS-0001"))
+		self.assertEqual(counter["WBS-"], 10)
+
+	def test_stock_refresh_keeps_quantities_without_stock(self):
+		fields = ("available_qty", "custom_qty_in_hand", "warehouse_qty")
+		row = frappe._dict(
+			available_qty=8, custom_qty_in_hand=8, warehouse_qty=8, resource_rate=5, available_amount=40
+		)
+
+		# No Bin: only the warehouse figure drops to 0
+		self.assertEqual(get_stock_figure_changes(frappe._dict(row, actual_qty=None), fields), {"warehouse_qty": 0})
+		self.assertEqual(
+			get_stock_figure_changes(frappe._dict(row, actual_qty=3), fields),
+			{"available_qty": 3, "custom_qty_in_hand": 3, "warehouse_qty": 3, "available_amount": 15},
+		)
+		self.assertEqual(get_stock_figure_changes(frappe._dict(row, actual_qty=8), fields), {})
+
+	def test_daily_refresh_writes_only_changed_values(self):
+		totals = {"BOQ-1": {"pr__reserved_qty": 5.0, "po_reserved_qty": 2.0}}
+		base = dict(item=None, item_group=None, uom=None, item_name=None, petty_cash_qty=0, petty_cash_amount=0)
+		rows = [
+			frappe._dict(base, name="W1", boq="BOQ-1", pr__reserved_qty=5.0, po_reserved_qty=2.0),
+			frappe._dict(base, name="W2", boq="BOQ-1", pr__reserved_qty=1.0, po_reserved_qty=2.0),
+			frappe._dict(base, name="W3", boq="BOQ-2", pr__reserved_qty=0, po_reserved_qty=3.0,
+				item="OLD", item_code=None),
+		]
+
+		self.assertEqual(get_wbs_item_updates(rows, totals), {
+			"W2": {"pr__reserved_qty": 5.0},
+			"W3": {"po_reserved_qty": 0.0, "item": None},
+		})
+
+	def test_planned_names_get_a_serial_no(self):
+		doc = WBSitem.__new__(WBSitem)
+		doc.__dict__.update(name="WBS-0042", serial_no=None)
+		with patch("project_costing.project_costing.doctype.wbs_item.wbs_item.apply_item_attributes"):
+			doc.validate()
+
+		self.assertEqual(doc.serial_no, "WBS-0042")
+
+	def test_validate_sets_only_recomputed_totals(self):
+		doc = frappe._dict(boq="BOQ-1", pr__reserved_qty=9.0, ledger_pr_reserved_qty=4.0, petty_cash_qty=1.0)
+		totals = {"BOQ-1": {"pr__reserved_qty": 5.0, "po_reserved_qty": 2.0}}
+		with patch(
+			"project_costing.project_costing.doc_events.wbs_item.get_boq_reservation_totals", return_value=totals
+		) as get_totals:
+			validate_wbs_item(doc, "validate")
+
+		get_totals.assert_called_once_with(["BOQ-1"])
+		self.assertEqual(
+			(doc.pr__reserved_qty, doc.po_reserved_qty, doc.petty_cash_qty, doc.petty_cash_amount), (5.0, 2.0, 0.0, 0.0)
+		)
+		self.assertEqual(doc.ledger_pr_reserved_qty, 4.0)
+
+	def test_index_plan_skips_indexes_with_missing_columns(self):
+		plan = {(doctype, name): columns for doctype, name, columns in get_index_plan({
+			"Request for Quotation Item": {"custom_wbs", "project_name", "custom_boq"},
+			"WBS item": {"boq", "parent_wbs_item", "cost_code"},
+		})}
+
+		self.assertEqual(plan["Request for Quotation Item", "pc_custom_wbs_project_name"], ("custom_wbs", "project_name"))
+		self.assertEqual(plan["Request for Quotation Item", "pc_custom_boq_custom_wbs"], ("custom_boq", "custom_wbs"))
+		self.assertIsNone(plan["Request for Quotation Item", "pc_custom_boq_details"])
+		self.assertEqual(plan["Expense Claim Detail", "pc_custom_wbs"], None)
+		self.assertEqual(plan["WBS item", "pc_boq_parent_wbs_item"], ("boq", "parent_wbs_item"))
+		self.assertIsNone(plan["WBS item", "pc_boq_id"])
+		self.assertIsNone(plan["Purchase Order Item", "pc_custom_wbs_project"])
+
+	def test_main_queries_use_tracking_indexes(self):
+		if not getattr(frappe.local, "site", None):
+			self.skipTest("needs a site database")
+
+		present = set(ensure_tracking_indexes()["present"])
+		queries = {
+			# wbs_report
+			("Material Request Item", ("custom_wbs", "project")): ("""
+				SELECT p.docstatus, COUNT(c.name) FROM `tabMaterial Request` p
+				JOIN `tabMaterial Request Item` c ON c.parent = p.name
+				WHERE c.custom_wbs = %s AND c.project = %s GROUP BY p.docstatus
+			""", ("WBS-0001", "PROJ-0001"), "c"),
+			# get_boq_reservation_totals
+			("Purchase Order Item", ("custom_boq", "custom_wbs")): ("""
+				SELECT custom_boq, SUM(qty) FROM `tabPurchase Order Item` c
+				WHERE c.custom_boq IN %s GROUP BY custom_boq
+			""", (("BOQ-0001",),), "c"),
+			# WBS tree of a BOQ
+			("WBS item", ("boq", "parent_wbs_item")): ("""
+				SELECT name FROM `tabWBS item` c WHERE c.boq = %s AND c.parent_wbs_item = %s
+			""", ("BOQ-0001", "WBS-0001"), "c"),
+			("BOQ Details", ("boq_id",)): ("""
+				SELECT name FROM `tabBOQ Details` c WHERE c.boq_id = %s
+			""", ("1.1",), "c"),
+		}
+
+		for (doctype, columns), (query, values, alias) in queries.items():
+			index_name = get_index_name(columns)
+			with self.subTest(doctype=doctype, index=index_name):
+				if not set(columns) <= set(frappe.db.get_table_columns(doctype)):
+					self.skipTest(f"{doctype} has no {', '.join(columns)} fields on this site")
+				# A site with the fields must have the index
+				self.assertIn((doctype, index_name), present)
+				seed_index_rows(doctype, columns)
+				self.assertEqual(get_used_indexes(query, values).get(alias), index_name)
+
+
+def seed_index_rows(doctype, columns, count=500):
+	"""Rows with distinct values in `columns`, so the planner prefers the index over a
+	scan of a near-empty table. Rolled back with the test."""
+	fields = ["name", *columns]
+	values = [
+		[f"_T-IDX-{doctype}-{i}", *(f"_T-{column}-{i}" for column in columns)]
+		for i in range(count)
+	]
+	frappe.db.bulk_insert(doctype, fields, values)
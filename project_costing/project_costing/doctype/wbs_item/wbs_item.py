@@ -1,46 +1,43 @@
+from collections import defaultdict
+
 import frappe
 from frappe import _
+from frappe.utils import create_batch, flt, getdate
 from frappe.utils.nestedset import NestedSet
 import re  
 from erpnext.stock.utils import get_stock_balance
+from project_costing.project_costing.utils.bulk import bulk_update_rows
+from project_costing.project_costing.utils.item_cache import apply_item_attributes
+from project_costing.project_costing.utils.naming import SeriesNameBlock, get_max_series_number, get_name_block
+from project_costing.project_costing.utils.nestedset import is_nested_set_deferred
+
+MATERIAL_ISSUE_BATCH_SIZE = 500
+STOCK_FIGURE_FIELDS = ("available_qty", "custom_qty_in_hand", "warehouse_qty")
+WBS_TOTAL_FIELDS = ("pr__reserved_qty", "po_reserved_qty", "petty_cash_qty", "petty_cash_amount")
+WBS_SERIES_KEY = "WBS-"
+WBS_NAME_DIGITS = 4
 
 
 class WBSitem(NestedSet):
     def autoname(self):
-        # Generate name based on a sequence
-        last_number = frappe.db.get_value("WBS item", {}, "name", order_by="creation desc")
-        
-        if last_number:
-            # Extract and increment the last number
-            parts = last_number.split('-')
-            if len(parts) > 1 and parts[-1].isdigit():
-                new_number = int(parts[-1]) + 1
-            else:
-                new_number = 1  # Reset to 1 if last number part isn't valid
-        else:
-            new_number = 1  # Start at 1 if no WBS item exists
+        # Counter-backed sequence (e.g. WBS-0001); no table scan per insert
+        self.name = get_next_wbs_name()
+
+    def on_update(self):
+        if is_nested_set_deferred(self.doctype):
+            # Bulk writers renumber the whole tree once when they are done
+            self.validate_ledger()
+            return
+        super().on_update()
 
-        # Format the new name (e.g., WBS-0001)
-        new_name = f"WBS-{new_number:04d}"
-        self.name = new_name  # Set the name field for the new record
-        
-        # Set a unique serial number, avoid None or empty value
-        if not self.serial_no:
-            self.serial_no = new_name  # Optionally use the name as the serial number
-            
     def validate(self):
-        existing_item_name = frappe.db.get_value("Item",filters={"name": self.item,"disabled": 0, "item_group": ["!=", "BOQ"]},fieldname="name")
-
-        if existing_item_name:
-            self.db_set("item",existing_item_name)
-            self.item = existing_item_name
-            if self.item:
-                self.db_set("item_group",frappe.db.get_value("Item",self.item,"item_group"))
-                self.db_set("uom",frappe.db.get_value("Item",self.item,"stock_uom"))
-                self.db_set("item_name",frappe.db.get_value("Item",self.item,"item_name"))
-        else:
-            self.item = None 
-            # raise DoesNotExistError(f"Item {self.item_code} does not exist")
+        # Set a unique serial number, avoid None or empty value. Here rather than in
+        # autoname, which imports inserting with a planned name (set_name) skip
+        if not self.serial_no:
+            self.serial_no = self.name  # Optionally use the name as the serial number
+
+        # One cached Item lookup; changed fields are written by this save
+        apply_item_attributes(self, "item", excluded_group="BOQ")
             
             
     def calculation_of_wbs_item(self):
@@ -81,6 +78,69 @@ def get_warehouse_qty(docname):
 
     return {"success": True, "warehouse_qty": available_qty}
 
+@frappe.whitelist()
+def refresh_stock_figures(boq=None, project=None):
+    """Write `Bin.actual_qty` to the stock fields of every WBS item of a BOQ or project.
+
+    Bins are read for all (item, warehouse) pairs with one join and only the rows
+    whose figures changed are written, in bulk, by the rules of
+    `get_stock_figure_changes`.
+    """
+    if not (boq or project):
+        frappe.throw(_("Select a BOQ or a Project to refresh"))
+
+    frappe.has_permission("WBS item", "write", throw=True)
+    conditions, values = [], []
+    if boq:
+        conditions.append("wbs.boq = %s")
+        values.append(boq)
+    if project:
+        conditions.append("wbs.project = %s")
+        values.append(project)
+
+    # custom_qty_in_hand is a site custom field; skip it where it does not exist
+    columns = set(frappe.db.get_table_columns("WBS item"))
+    fields = [field for field in STOCK_FIGURE_FIELDS if field in columns]
+
+    rows = frappe.db.sql(f"""
+        SELECT wbs.name, wbs.resource_rate, wbs.available_amount,
+            {", ".join(f"wbs.`{field}`" for field in fields)}, bin.actual_qty
+        FROM `tabWBS item` wbs
+        LEFT JOIN `tabBin` bin ON bin.item_code = wbs.item AND bin.warehouse = wbs.warehouse
+        WHERE {" AND ".join(conditions)}
+            AND IFNULL(wbs.item, '') != '' AND IFNULL(wbs.warehouse, '') != ''
+    """, values, as_dict=True)
+
+    updates = {}
+    for row in rows:
+        changed = get_stock_figure_changes(row, fields)
+        if changed:
+            updates[row.name] = changed
+
+    bulk_update_rows("WBS item", updates, update_modified=False)
+    frappe.db.commit()
+    return {"checked": len(rows), "updated": len(updates)}
+
+def get_stock_figure_changes(row, fields):
+    """Changed `{field: value}` of a WBS item `row` carrying its Bin `actual_qty`.
+
+    Same rules as the form: `warehouse_qty` is the Bin quantity (0 without a Bin),
+    the other stock `fields` are only replaced by a non-zero stock balance, and
+    `available_amount` follows `available_qty * resource_rate`, since the bulk
+    write skips validation.
+    """
+    actual_qty = flt(row.actual_qty)
+    values = {}
+    for field in fields:
+        if field == "warehouse_qty" or actual_qty:
+            values[field] = actual_qty
+
+    available_qty = flt(values.get("available_qty", row.available_qty))
+    if available_qty and flt(row.resource_rate):
+        values["available_amount"] = available_qty * flt(row.resource_rate)
+
+    return {field: value for field, value in values.items() if flt(row[field], 9) != flt(value, 9)}
+
 def get_total_quantities(doc_name, doc_boq):
     total = 0
     items = frappe.get_all(doc_name, filters = {"custom_boq": doc_boq}, fields=["name", "qty", "custom_boq"])
@@ -90,98 +150,136 @@ def get_total_quantities(doc_name, doc_boq):
     return total
 
 # scheduled_tasks that runs daily to update wbs items, might delete later
-@frappe.whitelist()        
+@frappe.whitelist()
 def update_wbs_items():
-    docs = frappe.get_all("WBS item", fields=["name"])
-    purchase_receipts = frappe.get_all("Purchase Receipt", filters = {"is_petty_cash" : 1}, fields = ["name"])
-    for d in docs:
-        doc = frappe.get_doc("WBS item", d.name)
-        doc.validate()
-        total_petty_cash_qty = 0
-        total_petty_cash_amount = 0
-        total_pr = get_total_quantities("Material Request Item", doc.boq)
-        total_po = get_total_quantities("Purchase Order Item", doc.boq)
-        for pr in purchase_receipts:
-            pr_doc = frappe.get_doc("Purchase Receipt", pr.name)
-            for item in pr_doc.items:
-                if item.custom_boq == doc.boq:
-                    total_petty_cash_qty = total_petty_cash_qty + item.qty
-                    total_petty_cash_amount = total_petty_cash_amount + item.amount
-        doc.petty_cash_qty = total_petty_cash_qty
-        doc.petty_cash_amount = total_petty_cash_amount
-        doc.pr__reserved_qty = total_pr
-        doc.po_reserved_qty = total_po
-        doc.save()
-        frappe.db.commit()
+    """Refresh reserved/petty-cash totals and Item details of every WBS item.
+
+    Totals are computed per BOQ with one GROUP BY query each and Item details with
+    one join; only the rows whose values changed are written, in bulk.
+    """
+    updated = recalculate_wbs_items()
+    frappe.db.commit()
+    return updated
+
+
+def recalculate_wbs_items(names=None):
+    """`update_wbs_items` for the given WBS items only (all when `names` is None)"""
+    condition, values = "", {}
+    if names is not None:
+        if not names:
+            return 0
+        condition, values = "WHERE wbs.name IN %(names)s", {"names": tuple(names)}
+
+    rows = frappe.db.sql(f"""
+        SELECT
+            wbs.name, wbs.boq, wbs.item, wbs.item_group, wbs.uom, wbs.item_name,
+            wbs.pr__reserved_qty, wbs.po_reserved_qty, wbs.petty_cash_qty, wbs.petty_cash_amount,
+            item.name AS item_code, item.item_group AS item_item_group, item.stock_uom AS item_uom,
+            item.item_name AS item_item_name, item.disabled AS item_disabled
+        FROM `tabWBS item` wbs
+        LEFT JOIN `tabItem` item ON item.name = wbs.item
+        {condition}
+    """, values, as_dict=True)
+
+    boqs = None if names is None else {row.boq for row in rows if row.boq}
+    updates = get_wbs_item_updates(rows, get_boq_reservation_totals(boqs))
+    bulk_update_rows("WBS item", updates, update_modified=False)
+    return len(updates)
+
+
+def get_boq_reservation_totals(boqs=None):
+    """{boq: {field: total}} for the reserved and petty-cash fields of WBS items"""
+    totals = defaultdict(dict)
+    if boqs is not None and not boqs:
+        return totals
+
+    # Restricting to some BOQs only narrows the WHERE; the totals are the same
+    condition, values = "", {}
+    if boqs is not None:
+        condition, values = "AND {field} IN %(boqs)s", {"boqs": tuple(boqs)}
+
+    # Only Purchase requests reserve, as in the WBS item validate hook
+    for boq, qty in frappe.db.sql(f"""
+        SELECT mri.custom_boq, SUM(mri.qty)
+        FROM `tabMaterial Request Item` mri
+        JOIN `tabMaterial Request` mr ON mr.name = mri.parent
+        WHERE mr.material_request_type = 'Purchase' AND IFNULL(mri.custom_boq, '') != ''
+            {condition.format(field="mri.custom_boq")}
+        GROUP BY mri.custom_boq
+    """, values):
+        totals[boq]["pr__reserved_qty"] = flt(qty)
+
+    for boq, qty in frappe.db.sql(f"""
+        SELECT custom_boq, SUM(qty) FROM `tabPurchase Order Item`
+        WHERE IFNULL(custom_boq, '') != '' {condition.format(field="custom_boq")} GROUP BY custom_boq
+    """, values):
+        totals[boq]["po_reserved_qty"] = flt(qty)
+
+    for boq, qty, amount in frappe.db.sql(f"""
+        SELECT pri.custom_boq, SUM(pri.qty), SUM(pri.amount)
+        FROM `tabPurchase Receipt Item` pri
+        JOIN `tabPurchase Receipt` pr ON pr.name = pri.parent
+        WHERE pr.is_petty_cash = 1 AND IFNULL(pri.custom_boq, '') != '' {condition.format(field="pri.custom_boq")}
+        GROUP BY pri.custom_boq
+    """, values):
+        totals[boq]["petty_cash_qty"] = flt(qty)
+        totals[boq]["petty_cash_amount"] = flt(amount)
+
+    return totals
+
+
+def get_wbs_item_updates(rows, totals):
+    """`{name: {field: value}}` holding only the values that differ from `rows`.
+
+    Item details follow `WBSitem.validate`: a missing, disabled or BOQ-group Item
+    clears `item`, otherwise its group, stock UOM and name are copied.
+    """
+    updates = {}
+    for row in rows:
+        values = {field: 0.0 for field in WBS_TOTAL_FIELDS}
+        values.update(totals.get(row.boq) or {})
+
+        if row.item:
+            if not row.item_code or row.item_disabled or row.item_item_group == "BOQ":
+                values["item"] = None
+            else:
+                values.update(
+                    item=row.item_code,
+                    item_group=row.item_item_group,
+                    uom=row.item_uom,
+                    item_name=row.item_item_name,
+                )
+
+        changed = {}
+        for field, value in values.items():
+            if field in WBS_TOTAL_FIELDS:
+                if flt(row[field], 9) != flt(value, 9):
+                    changed[field] = value
+            elif (row[field] or None) != (value or None):
+                changed[field] = value
+        if changed:
+            updates[row.name] = changed
+
+    return updates
 
 
 @frappe.whitelist()
 def get_material_issue_total_qty(item_code, warehouse, from_date=None, to_date=None):
     try:
-        # Build filters for stock entry
-        filters = {
-            "docstatus": 1,  # Only submitted entries
-            "purpose": "Material Issue",
-            "stock_entry_type": ["in", frappe.get_all("Stock Entry Type", filters={"purpose": "Material Issue"}, pluck="name")]
-        }
-        
-        # Get all material issue stock entries
-        stock_entries = frappe.get_all(
-            "Stock Entry",
-            filters=filters,
-            fields=["name", "posting_date", "posting_time", "project", "remarks"]
-        )
-        
-        total_qty = 0
-        matching_entries = []
-        
-        for se in stock_entries:
-            # Get items from each stock entry
-            se_items = frappe.get_all(
-                "Stock Entry Detail",
-                filters={
-                    "parent": se.name,
-                    "item_code": item_code,
-                    "s_warehouse": warehouse
-                },
-                fields=["qty", "transfer_qty", "basic_rate", "serial_no", "batch_no"]
-            )
-            
-            for item in se_items:
-                if item.qty > 0:
-                    total_qty += item.qty
-                    matching_entries.append({
-                        "stock_entry": se.name,
-                        "posting_date": se.posting_date,
-                        "posting_time": se.posting_time,
-                        "project": se.project,
-                        "remarks": se.remarks,
-                        "qty": item.qty,
-                        "transfer_qty": item.transfer_qty,
-                        "basic_rate": item.basic_rate,
-                        "serial_no": item.serial_no,
-                        "batch_no": item.batch_no
-                    })
-        
-        # Apply date filters if provided
-        if from_date or to_date:
-            filtered_entries = []
-            for entry in matching_entries:
-                entry_date = entry["posting_date"]
-                
-                if from_date and entry_date < from_date:
-                    continue
-                if to_date and entry_date > to_date:
-                    continue
-                    
-                filtered_entries.append(entry)
-            
-            # Recalculate total for filtered entries
-            total_qty = sum(entry["qty"] for entry in filtered_entries)
-            matching_entries = filtered_entries
-        
+        # One joined query; item, warehouse and dates are filtered in SQL
+        conditions, values = get_material_issue_conditions(from_date, to_date)
+        matching_entries = frappe.db.sql(f"""
+            SELECT
+                se.name AS stock_entry, se.posting_date, se.posting_time, se.project, se.remarks,
+                sed.qty, sed.transfer_qty, sed.basic_rate, sed.serial_no, sed.batch_no
+            FROM `tabStock Entry Detail` sed
+            JOIN `tabStock Entry` se ON se.name = sed.parent
+            WHERE sed.item_code = %s AND sed.s_warehouse = %s {conditions}
+            ORDER BY se.posting_date, se.posting_time, se.name
+        """, [item_code, warehouse, *values], as_dict=True)
+
         return {
-            "total_qty": total_qty,
+            "total_qty": sum(entry.qty for entry in matching_entries),
             "stock_entries": matching_entries,
             "count": len(matching_entries)
         }
@@ -196,6 +294,54 @@ def get_material_issue_total_qty(item_code, warehouse, from_date=None, to_date=N
         }
 
 
+def get_material_issue_totals(pairs, from_date=None, to_date=None):
+    """Issued qty for many `(item_code, warehouse)` pairs: `{(item_code, warehouse): qty}`.
+
+    Same rules as `get_material_issue_total_qty`, one grouped query per batch of pairs;
+    pairs without issues are absent from the result.
+    """
+    pairs = sorted({(item_code, warehouse) for item_code, warehouse in pairs if item_code and warehouse})
+    conditions, values = get_material_issue_conditions(from_date, to_date)
+
+    totals = {}
+    for batch in create_batch(pairs, MATERIAL_ISSUE_BATCH_SIZE):
+        for item_code, warehouse, qty in frappe.db.sql(f"""
+            SELECT sed.item_code, sed.s_warehouse, SUM(sed.qty)
+            FROM `tabStock Entry Detail` sed
+            JOIN `tabStock Entry` se ON se.name = sed.parent
+            WHERE (sed.item_code, sed.s_warehouse) IN ({", ".join(["(%s, %s)"] * len(batch))}) {conditions}
+            GROUP BY sed.item_code, sed.s_warehouse
+        """, [value for pair in batch for value in pair] + values):
+            totals[(item_code, warehouse)] = flt(qty)
+    return totals
+
+
+@frappe.whitelist()
+def get_boq_material_issues(boq, from_date=None, to_date=None):
+    """Issued qty of every WBS item of a BOQ: `{wbs item: qty}`"""
+    frappe.has_permission("BOQ", "read", boq, throw=True)
+    rows = frappe.get_all("WBS item", filters={"boq": boq}, fields=["name", "item", "warehouse"])
+    totals = get_material_issue_totals(((row.item, row.warehouse) for row in rows), from_date, to_date)
+    return {row.name: totals.get((row.item, row.warehouse), 0) for row in rows}
+
+
+def get_material_issue_conditions(from_date=None, to_date=None):
+    """SQL conditions (on `se`/`sed`) for submitted Material Issue rows with a positive qty"""
+    conditions = """
+        AND se.docstatus = 1
+        AND se.purpose = 'Material Issue'
+        AND se.stock_entry_type IN (SELECT name FROM `tabStock Entry Type` WHERE purpose = 'Material Issue')
+        AND sed.qty > 0"""
+    values = []
+    if from_date:
+        conditions += " AND se.posting_date >= %s"
+        values.append(getdate(from_date))
+    if to_date:
+        conditions += " AND se.posting_date <= %s"
+        values.append(getdate(to_date))
+    return conditions, values
+
+
 @frappe.whitelist()
 def get_material_issue_summary(item_code, warehouse):
     try:
@@ -280,3 +426,16 @@ def get_children(doctype, parent=None, is_root=False, **kwargs):
         item.qty = item.qty or 0
 
     return items
+
+
+def get_next_wbs_name():
+    """Next WBS item name; bulk imports take it from their reserved block"""
+    block = get_name_block("WBS item") or SeriesNameBlock(
+        WBS_SERIES_KEY, digits=WBS_NAME_DIGITS, initial=get_wbs_series_start
+    )
+    return block.next_name()
+
+
+def get_wbs_series_start():
+    # Counter is missing (not yet seeded by the patch): continue after existing names
+    return get_max_series_number("WBS item", WBS_SERIES_KEY)
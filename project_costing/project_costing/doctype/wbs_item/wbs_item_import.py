@@ -1,388 +1,692 @@
 import frappe
+import itertools
 import pandas as pd
 import re
 from frappe.utils import now_datetime
+from project_costing.project_costing.doctype.project_costing_job.project_costing_job import create_job
+from project_costing.project_costing.doctype.wbs_item.wbs_item import (
+    WBS_NAME_DIGITS,
+    WBS_SERIES_KEY,
+    get_wbs_series_start,
+)
+from project_costing.project_costing.utils.import_report import (
+    ImportReport,
+    get_existing_values,
+    sheet_row_number,
+)
+from project_costing.project_costing.utils.naming import get_name_block, reserved_name_block
+from project_costing.project_costing.utils.nestedset import deferred_nested_set, rebuild_tree_subset
+from project_costing.project_costing.utils.progress import ProgressTracker
+from project_costing.project_costing.utils.sheet_reader import count_sheet_rows, iter_sheet_chunks
 
 # Optimized WBS import: batch-friendly, cached lookups, single commit, reduced realtime
 # Usage:
 #   import_wbs_from_file_fast(file_name, boq_name, project_name, warehouse)
 # If file_name is a local path (e.g. /mnt/data/...), it will be used directly.
 
+# Sheet column -> WBS item field (only used if present)
+WBS_COLUMN_MAP = {
+    'BOQ Qty': 'qty',
+    'Resource QTY': 'resource_qty',
+    'Waste ratio': 'waste',
+    'Total Resource QTY': 'custom_total_resource_qty',
+    'Material Rate': 'unit_cost',
+    'Budget Rate': 'original_budget',
+    'Total Budget': 'budget',
+    'BOQ ID': 'boq_id',
+    'Finance Code': 'cost_center_code',
+    'Item Description': 'short_description',
+    'Combined Code': 'combined_code',
+    'Item': 'item_code',
+    'Res Type': 'res_type',
+    'Unit': 'uom',
+    "SubContractor Rate": 'subcontractor_rate',
+    "Accessories":"accessories",
+    "Labor":"labor",
+    "Equipment":"equipment",
+    "CSI":"csi",
+    "Res Unit":"res_unit",
+}
+
+# Mapped columns are typed from the WBS item field they fill
+WBS_NUMERIC_FIELDTYPES = ('Int', 'Float', 'Currency', 'Percent')
+# Codes Excel may store as numbers: 1234.0 is the code 1234
+WBS_CODE_COLUMNS = ('Finance Code',)
+# Columns read by the import besides the mapped ones
+WBS_KEY_COLUMNS = ('wbs_code', 'level', 'res_type', 'boq_id')
+
+# Rows are committed in chunks, each row inside its own savepoint
+WBS_IMPORT_COMMIT_SIZE = 500
+WBS_ROW_SAVEPOINT = 'wbs_import_row'
+
 @frappe.whitelist()
-def import_wbs_from_file_fast(file_name, boq_name, project_name, warehouse, progress_interval=20):
-    """Fast import for WBS items.
+def import_wbs_from_file_fast(file_name, boq_name, project_name, warehouse, job=None):
+    """Fast import for WBS items; names come from reserved blocks and the tree is
+    numbered once after all rows are in"""
+    try:
+        with deferred_nested_set('WBS item', 'parent_wbs_item', {'boq': boq_name}), reserved_name_block(
+            'WBS item', WBS_SERIES_KEY, digits=WBS_NAME_DIGITS, initial=get_wbs_series_start
+        ):
+            result = insert_wbs_rows(file_name, boq_name, project_name, warehouse, job=job)
+    except Exception:
+        # Chunks committed before the failure stay; number them so the tree is usable
+        frappe.db.rollback()
+        rebuild_tree_subset('WBS item', 'parent_wbs_item', {'boq': boq_name})
+        frappe.db.commit()
+        raise
+
+    frappe.db.commit()
+    return result
+
+
+def insert_wbs_rows(file_name, boq_name, project_name, warehouse, job=None):
+    """Insert the sheet rows as WBS items.
 
     Key optimizations:
-    - No per-row commits (single commit at end)
+    - Commits every WBS_IMPORT_COMMIT_SIZE rows; a failing row only rolls back
+      its own savepoint, so locks and undo are held for one chunk at most
     - Cached get_value lookups
-    - Reduced publish_realtime frequency
+    - Throttled progress through ProgressTracker (state kept on a Project Costing Job)
     - Avoid get_doc in hot loops
-    - Bulk mark groups at end
+    - Groups and lft/rgt set in one pass by the caller's deferred_nested_set
     """
 
+    file_path, df_columns, first_clean, cleaned_chunks = load_wbs_sheet(file_name)
+
+    # Row count for progress only; the real count is known once the file is read
+    total = count_sheet_rows(file_path) or len(first_clean)
+    tracker = ProgressTracker.start('WBS Import', 'BOQ', boq_name, event='import_progress', total=total, job=job)
+    frappe.db.commit()
+
+    project = get_import_project(first_clean, project_name)
+    builder = WBSRowBuilder(boq_name, project, warehouse, df_columns)
+    # Existing WBS items of this BOQ can be parents of the new rows
+    wbs_code_to_name, code_trie = get_existing_codes(boq_name)
+
+    inserted = []
+    failed = []
+    success = 0
+
+    name_block = get_name_block('WBS item')
+
+    # Process rows chunk by chunk
+    idx = -1
+    for idx, row in enumerate_rows(cleaned_chunks):
+        code = row['wbs_code']
+
+        if not code or pd.isna(code):
+            failed.append(f"Row {idx+2}: Missing Cost Code")
+            tracker.add_error(failed[-1])
+            continue
+
+        try:
+            mapped_level = get_mapped_level(row['level'])
+            parent_name = find_wbs_parent(code, mapped_level, wbs_code_to_name, code_trie)
+            doc = insert_wbs_row(builder, row, parent_name, name_block=name_block)
+        except Exception as e:
+            frappe.log_error(title=f'WBS Import Error Row {idx+2}', message=str(e)[:1000])
+            failed.append(f"Row {idx+2}: Error inserting {code} -> {str(e)}")
+            tracker.add_error(failed[-1])
+            continue
+
+        # Keep maps updated
+        wbs_code_to_name[code] = doc.name
+        code_trie.add(code, doc.name, doc.level)
+
+        inserted.append({'cost_code': doc.cost_code, 'name': doc.name, 'level': doc.level})
+        success += 1
+
+        if success % WBS_IMPORT_COMMIT_SIZE == 0:
+            frappe.db.commit()
+        tracker.update(idx + 1, message=f'Processing row {idx+1}/{total} - {code}')
+
+    total = idx + 1
+    tracker.set_total(total)
+
+    # Commit the last chunk
+    try:
+        frappe.db.commit()
+    except Exception as e:
+        frappe.log_error(title='WBS Import Final Commit Error', message=str(e)[:2000])
+        # If final commit fails, raise so user knows
+        frappe.throw(f"Failed to commit imported WBS items: {e}")
+
+    # Update BOQ flag once
+    try:
+        frappe.db.set_value('BOQ', boq_name, 'wbs_item_created', 1)
+        frappe.db.commit()
+    except Exception as e:
+        # non-fatal
+        frappe.msgprint(f"Warning: Could not update BOQ flag: {e}")
+
+    # Summary msg
+    summary = f"Import finished. Total: {total}, Success: {success}, Failed: {len(failed)}"
+    tracker.finish(message=summary)
+    frappe.db.commit()
+    frappe.msgprint(summary)
+
+    return {"total": total, "success": success, "failed": failed, "inserted": inserted}
+
+
+@frappe.whitelist()
+def dry_run_wbs_import(file_name, boq_name, project_name=None):
+    """Check a WBS sheet the way `import_wbs_from_file_fast` reads it, without writing.
+
+    Item, Cost Center and BOQ Details references are resolved with one query per
+    batch after the pass. Returns an `ImportReport` dict.
+    """
+    report = ImportReport()
+    chunks, rename_dict = read_wbs_sheet(get_wbs_file_path(file_name), file_name)
+
+    for field, label in (('wbs_code', "Cost Code"), ('level', "Level")):
+        if field not in rename_dict.values():
+            report.error(None, "Required column is missing", column=label)
+    if report.error_count:
+        return report.as_dict()
+
+    code_column = next(c for c, f in rename_dict.items() if f == 'wbs_code')
+    level_column = next(c for c, f in rename_dict.items() if f == 'level')
+
+    # {cost code: level} of codes a row could attach to, existing ones first
+    levels = {
+        r.cost_code: int(r.level or 0)
+        for r in frappe.get_all('WBS item', filters={'boq': boq_name}, fields=['cost_code', 'level'])
+    }
+    existing = set(levels)
+    seen = set()
+    number_columns = [column for column, (_fieldname, kind) in get_wbs_column_types().items() if kind == 'number']
+    items, cost_centers, boq_ids = {}, {}, {}  # {value: [sheet row numbers]}
+    first_code = None
+    offset = 0
+
+    for chunk in chunks:
+        chunk = rename_wbs_chunk(chunk, rename_dict)
+        records = chunk.astype(object).where(pd.notnull(chunk), None).to_dict('records')
+
+        for label, record in zip(chunk.index, records):
+            number = sheet_row_number(label)
+            code = str(record['wbs_code']).strip() if record['wbs_code'] is not None else ''
+            if not code or code.lower() == 'nan':
+                report.error(number, "Missing Cost Code; the row would be skipped", column=code_column)
+                continue
+
+            level = pd.to_numeric(record['level'], errors='coerce')
+            if pd.isna(level):
+                report.error(number, "Level is not a number; the row would be skipped", column=level_column, value=record['level'])
+                continue
+
+            level = int(level)
+            first_code = first_code or code
+            if level > 10:
+                report.warning(number, "Level above 10 would be imported as 10", column=level_column, value=level)
+            mapped_level = min(level, 10)
+
+            if code in seen:
+                report.error(number, "Duplicate Cost Code in the sheet", column=code_column, value=code)
+            elif code in existing:
+                report.error(number, "Cost Code already exists in this BOQ", column=code_column, value=code)
+
+            if mapped_level > 1 and not has_wbs_parent(code, mapped_level, levels):
+                report.error(number, "Orphan level: no parent Cost Code above this row", column=code_column, value=code)
+
+            res_type = record.get('res_type')
+            if (level >= 5 or (res_type is not None and str(res_type).strip())) and record.get('Item') is not None:
+                item_code = str(record['Item'])[:140]
+                if item_code.strip():
+                    items.setdefault(item_code, []).append(number)
+
+            if mapped_level == 2:
+                segment = "-".join(code.split("-")[1:])
+                if segment:
+                    cost_centers.setdefault(segment, []).append(number)
+
+            boq_id = record.get('boq_id', record.get('BOQ ID'))
+            if boq_id is not None and str(boq_id).strip():
+                boq_ids.setdefault(str(boq_id).strip(), []).append(number)
+
+            for column in number_columns:
+                value = record.get(column)
+                if value is None or not str(value).strip():
+                    continue
+                try:
+                    float(str(value).strip())
+                except ValueError:
+                    report.warning(number, "Not a number; the value would be skipped", column=column, value=str(value))
+
+            seen.add(code)
+            levels[code] = mapped_level
+
+        offset += len(chunk)
+
+    report.total_rows = offset
+
+    if first_code and not (find_project_for_code(first_code) or project_name):
+        report.error(None, "No Project found for the abbreviation of the first Cost Code", value=first_code)
+
+    lookups = (
+        (items, 'Item', 'item_code', "error", "Unknown Item", 'Item'),
+        (cost_centers, 'Cost Center', 'custom_abbr', "warning", "No Cost Center with this abbreviation; none would be set", code_column),
+        (boq_ids, 'BOQ Details', 'boq_id', "warning", "BOQ ID not found in BOQ Details", 'BOQ ID'),
+    )
+    for values, doctype, fieldname, level, message, column in lookups:
+        if not values:
+            continue
+        known = get_existing_values(doctype, fieldname, values)
+        add = report.error if level == "error" else report.warning
+        for value, numbers in values.items():
+            if value not in known:
+                for number in numbers:
+                    add(number, message, column=column, value=value)
+
+    return report.as_dict()
+
+
+def has_wbs_parent(code, level, levels):
+    """Same parent rules as the import: the code minus its last `-` segment, or any
+    code one level up that is a prefix of this one"""
+    parts = code.split('-')
+    if len(parts) > 1 and '-'.join(parts[:-1]) in levels:
+        return True
+
+    return any(levels.get(code[:end]) == level - 1 for end in range(1, len(code)))
+
+
+def load_wbs_sheet(file_name):
+    """`(file path, columns, first cleaned chunk, all cleaned chunks)` of a WBS sheet"""
+    file_path = get_wbs_file_path(file_name)
+    chunks, rename_dict = read_wbs_sheet(file_path, file_name)
+
+    if 'wbs_code' not in rename_dict.values():
+        frappe.throw("WBS Code column not found. Please ensure your file has a 'Cost Code' or 'WBS' column.")
+    if 'level' not in rename_dict.values():
+        frappe.throw("Level column not found. Please ensure your file has a 'Level' column.")
+
+    # Every chunk is cleaned and typed on its own, so only one chunk is held in memory
+    column_types = get_wbs_column_types()
+    cleaned_chunks = (type_wbs_chunk(clean_wbs_chunk(chunk, rename_dict), column_types) for chunk in chunks)
+    first_clean = next((chunk for chunk in cleaned_chunks if not chunk.empty), None)
+    if first_clean is None:
+        frappe.throw("File contains no rows with valid WBS Codes after cleaning.")
+
+    return file_path, first_clean.columns, first_clean, itertools.chain([first_clean], cleaned_chunks)
+
+
+def get_import_project(first_clean, project_name):
+    # Project detection (from first code) - keep existing behavior but cache results
+    first_code = first_clean.iloc[0]['wbs_code']
+    project = find_project_for_code(first_code) or project_name
+    if not project:
+        frappe.throw(f"No Project found for abbreviation in '{first_code}'. Provide project_name or correct code.")
+    return project
+
+
+class WBSRowBuilder:
+    """Turns a typed sheet row (see `type_wbs_chunk`) into an unsaved WBS item, with
+    cached lookups"""
+
+    def __init__(self, boq_name, project, warehouse, columns):
+        self.boq_name = boq_name
+        self.project = project
+        self.warehouse = warehouse
+        self.columns = set(columns)
+        self.valid_fields = {f.fieldname for f in frappe.get_meta('WBS item').fields}
+        self.mapped_columns = [
+            (column, fieldname) for column, (fieldname, _kind) in get_wbs_column_types().items()
+            if column in self.columns
+        ]
+        self.lookups = {}
+
+    def lookup(self, doctype, fieldname, value):
+        key = (doctype, fieldname, value)
+        if key not in self.lookups:
+            self.lookups[key] = frappe.get_value(doctype, {fieldname: value}, 'name')
+        return self.lookups[key]
+
+    def build(self, row, parent_name=None):
+        code = row['wbs_code']
+        excel_level = int(row['level'])
+        res_type = row.get('res_type') if 'res_type' in row else None
+        columns, valid_fields = self.columns, self.valid_fields
+
+        doc = frappe.new_doc('WBS item')
+        doc.cost_code = code
+        doc.level = get_mapped_level(excel_level)
+        doc.boq = self.boq_name
+        doc.project = self.project
+        doc.warehouse = self.warehouse
+
+        has_resource_type = res_type and pd.notna(res_type) and str(res_type).strip() != ''
+        is_item_like = (excel_level >= 5) or has_resource_type
+        doc.is_group = 0 if is_item_like else 1
+
+        # FIX: Set res_type on doc
+        if pd.notna(res_type) and str(res_type).strip() != '' and 'res_type' in valid_fields:
+            doc.res_type = str(res_type).strip()
+
+        if parent_name:
+            doc.parent_wbs_item = parent_name
+
+        # cost center for level 2
+        if doc.level == 2:
+            seg = "-".join(code.split("-")[1:])
+            cc = self.lookup('Cost Center', 'custom_abbr', seg) if seg else None
+            if cc:
+                doc.cost_center = cc
+
+        # link BOQ details
+        boq_id_val = None
+        if 'BOQ ID' in columns:
+            boq_id_val = row.get('BOQ ID')
+        elif 'boq_id' in row:
+            boq_id_val = row.get('boq_id')
+
+        if pd.notna(boq_id_val) and str(boq_id_val).strip() != '':
+            boq_det = self.lookup('BOQ Details', 'boq_id', str(boq_id_val).strip())
+            if boq_det and 'boq_details' in valid_fields:
+                doc.boq_details = boq_det
+
+        # item-specific handling
+        if is_item_like:
+            item_code_from_excel = row.get('Item') if 'Item' in columns else None
+            if pd.notna(item_code_from_excel) and str(item_code_from_excel).strip() != '':
+                truncated_item_code = str(item_code_from_excel)[:140]
+                if 'item_code' in valid_fields:
+                    doc.item_code = truncated_item_code
+                    existing_item = self.lookup('Item', 'item_code', truncated_item_code)
+                    if existing_item:
+                        doc.item = existing_item
+
+            desc = None
+            if 'Item Description' in columns:
+                desc = row.get('Item Description')
+            if pd.notna(desc) and str(desc).strip() != '':
+                doc.short_description = str(desc).strip()
+
+        # UOM
+        if 'Unit' in columns:
+            uom = row.get('Unit')
+            if pd.notna(uom) and str(uom).strip() != '':
+                doc.uom = str(uom).strip()
+
+        # Map other columns; values were typed for their field up front
+        for column, fieldname in self.mapped_columns:
+            # skip if already handled
+            if is_item_like and column in ('Item', 'Item Description'):
+                continue
+
+            value = row.get(column)
+            if not pd.isna(value):
+                doc.set(fieldname, value)
+
+        return doc
+
+
+def get_mapped_level(level):
+    # Levels above 10 are imported as 10
+    level = int(level)
+    return level if level <= 10 else 10
+
+
+def get_existing_codes(boq_name):
+    """`({cost code: name}, CostCodeTrie)` of the WBS items the BOQ already has"""
+    existing_wbs = frappe.get_all('WBS item', filters={'boq': boq_name}, fields=['name', 'cost_code', 'level'])
+    existing_map = {r['cost_code']: r for r in existing_wbs}
+
+    code_trie = CostCodeTrie()
+    for code, existing in existing_map.items():
+        if code:
+            code_trie.add(code, existing['name'], existing.get('level'))
+    return {k: v['name'] for k, v in existing_map.items()}, code_trie
+
+
+def find_wbs_parent(code, level, code_to_name, code_trie):
+    """Parent of a row: the code minus its last `-` segment, else the first code one
+    level up that is a prefix of this one"""
+    if level <= 1:
+        return None
+
+    # Primary: try direct prefix split (common pattern: ABC-01-02)
+    parts = code.split('-')
+    if len(parts) > 1:
+        parent_name = code_to_name.get('-'.join(parts[:-1]))
+        if parent_name:
+            return parent_name
+
+    return code_trie.find_parent(code, level - 1)
+
+
+def insert_wbs_row(builder, row, parent_name, name=None, name_block=None):
+    """Insert one sheet row inside its own savepoint; a failure undoes only this row"""
+    reserved_upto = name_block.last if name_block else None
+    frappe.db.savepoint(WBS_ROW_SAVEPOINT)
+    try:
+        doc = builder.build(row, parent_name)
+        doc.insert(ignore_permissions=True, set_name=name)
+    except Exception:
+        frappe.db.rollback(save_point=WBS_ROW_SAVEPOINT)
+        if name_block and name_block.last != reserved_upto:
+            # The counter update of a block reserved by this row was undone with it
+            name_block.discard()
+        raise
+
+    frappe.db.release_savepoint(WBS_ROW_SAVEPOINT)
+    return doc
+
+
+class CostCodeTrie:
+    """Cost codes keyed character by character, so finding the parent of a code
+    walks that code once instead of every code imported so far"""
+
+    def __init__(self):
+        self.root = {}
+        self.added = 0
+
+    def add(self, code, name, level):
+        node = self.root
+        for char in code:
+            node = node.setdefault(char, {})
+        # None never collides with a character; a re-added code keeps its position
+        order = node[None][0] if None in node else self.added
+        node[None] = (order, name, level)
+        self.added += 1
+
+    def find_parent(self, code, level):
+        """Name of the first added code at `level` that is a proper prefix of `code`"""
+        node, found = self.root, None
+        for char in code[:-1]:
+            node = node.get(char)
+            if node is None:
+                break
+            entry = node.get(None)
+            if entry and entry[2] == level and (found is None or entry[0] < found[0]):
+                found = entry
+        return found[1] if found else None
+
+
+def get_wbs_file_path(file_name):
     if not file_name:
         frappe.throw("No file provided.")
 
     # Support direct local path uploads (developer helper)
     if file_name.startswith("/mnt/"):
-        file_path = file_name
-    else:
-        file_doc = frappe.get_doc("File", {"file_url": file_name})
-        file_path = file_doc.get_full_path()
+        return file_name
+
+    file_doc = frappe.get_doc("File", {"file_url": file_name})
+    return file_doc.get_full_path()
+
 
+def read_wbs_sheet(file_path, file_name):
+    """Open the sheet and detect its columns; returns (raw chunks, rename dict)"""
     try:
-        if file_path.lower().endswith('.csv'):
-            df = pd.read_csv(file_path, header=0)
-        else:
-            df = pd.read_excel(file_path, header=0)
+        chunks = iter_sheet_chunks(file_path)
+        first_chunk = next(chunks, None)
     except Exception as e:
         frappe.throw(f"Error reading file {file_name}: {e}. Ensure valid CSV/Excel.")
 
-    if df.empty:
+    if first_chunk is None or first_chunk.empty:
         frappe.throw("The uploaded file is empty.")
 
-    df.columns = df.columns.str.strip()
+    rename_dict = detect_wbs_columns([str(c).strip() for c in first_chunk.columns])
+    return itertools.chain([first_chunk], chunks), rename_dict
 
-    # Detect columns
-    wbs_col = next((c for c in df.columns if 'cost code' in c.lower() or 'wbs' in c.lower()), None)
-    level_col = next((c for c in df.columns if 'level' in c.lower()), None)
-    boq_id_col = next((c for c in df.columns if 'boq id' in c.lower()), None)
-    res_type_col = next((c for c in df.columns if 'res' in c.lower() and 'type' in c.lower()), None)
 
-    if not wbs_col:
-        frappe.throw("WBS Code column not found. Please ensure your file has a 'Cost Code' or 'WBS' column.")
-    if not level_col:
-        frappe.throw("Level column not found. Please ensure your file has a 'Level' column.")
+def detect_wbs_columns(columns):
+    """Map the sheet's code/level/BOQ ID/res type headers to their import names"""
+    wbs_col = next((c for c in columns if 'cost code' in c.lower() or 'wbs' in c.lower()), None)
+    level_col = next((c for c in columns if 'level' in c.lower()), None)
+    boq_id_col = next((c for c in columns if 'boq id' in c.lower()), None)
+    res_type_col = next((c for c in columns if 'res' in c.lower() and 'type' in c.lower()), None)
 
-    rename_dict = {wbs_col: 'wbs_code', level_col: 'level'}
+    rename_dict = {}
+    if wbs_col:
+        rename_dict[wbs_col] = 'wbs_code'
+    if level_col:
+        rename_dict[level_col] = 'level'
     if boq_id_col:
         rename_dict[boq_id_col] = 'boq_id'
     if res_type_col:
         rename_dict[res_type_col] = 'res_type'
+    return rename_dict
+
+
+def find_project_for_code(code):
+    """Project whose abbreviation and start year prefix the WBS code, e.g. ABC24-..."""
+    m = re.match(r"([A-Z]+)(\d{2})", code or "")
+    if not m:
+        return None
 
-    df = df.rename(columns=rename_dict)
-    
-    # Fix ONLY cost_center_code before iterating rows
-    if 'Finance Code' in df.columns:
-        df['Finance Code'] = df['Finance Code'].apply(
-            lambda v: str(v).split('.')[0] if isinstance(v, (float, int)) else str(v).strip()
-        )
+    project_abbr, start_year = m.group(1), m.group(2)
+    return frappe.get_value("Project", {
+        "custom_project_abbr": project_abbr,
+        "custom_start_year": ["in", [start_year, int(start_year)]],
+    }, "name")
 
-    if 'cost_center_code' in df.columns:
-        df['cost_center_code'] = df['cost_center_code'].apply(
-            lambda v: str(v).split('.')[0] if isinstance(v, (float, int)) else str(v).strip()
-        )
+
+def rename_wbs_chunk(df, rename_dict):
+    df.columns = [str(c).strip() for c in df.columns]
+    return df.rename(columns=rename_dict)
+
+
+def clean_wbs_chunk(df, rename_dict):
+    """Rename and clean one chunk of the WBS sheet"""
+    df = rename_wbs_chunk(df, rename_dict)
 
     # Clean
-    df.dropna(subset=['wbs_code'], inplace=True)
+    df = df.dropna(subset=['wbs_code'])
     df['wbs_code'] = df['wbs_code'].astype(str).str.strip()
-    df = df[~df['wbs_code'].str.lower().isin(['nan', ''])]
+    df = df[~df['wbs_code'].str.lower().isin(['nan', ''])].copy()
 
     df['level'] = pd.to_numeric(df['level'], errors='coerce')
     df = df.dropna(subset=['level'])
     df['level'] = df['level'].astype(int)
 
-    df['res_type'] = df.get('res_type', pd.NA).apply(lambda v: v.strip() if isinstance(v, str) else v)
-    df.loc[df['res_type'] == '', 'res_type'] = pd.NA
-
-    df = df.reset_index(drop=True)
-    if df.empty:
-        frappe.throw("File contains no rows with valid WBS Codes after cleaning.")
+    if 'res_type' in df.columns:
+        df['res_type'] = to_text_column(df['res_type'])
 
-    total = len(df)
+    return df
 
-    # Project detection (from first code) - keep existing behavior but cache results
-    first_code = df.iloc[0]['wbs_code']
-    m = re.match(r"([A-Z]+)(\d{2})", first_code)
-    project = None
-    if m:
-        project_abbr, start_year = m.group(1), m.group(2)
-        project = frappe.get_value("Project", {
-            "custom_project_abbr": project_abbr,
-            "custom_start_year": ["in", [start_year, int(start_year)]],
-        }, "name")
-    if not project:
-        # fallback to provided project_name if given
-        project = project_name
-    if not project:
-        frappe.throw(f"No Project found for abbreviation in '{first_code}'. Provide project_name or correct code.")
 
-    # Cache metadata and valid fields
+def get_wbs_column_types():
+    """`{sheet column: (WBS item field, kind)}` for the WBS_COLUMN_MAP fields the
+    doctype has; kind is 'number', 'code' or 'text'"""
     meta = frappe.get_meta('WBS item')
-    valid_fields = {f.fieldname for f in meta.fields}
-
-    # Column mapping (only use if present)
-    column_map = {
-        'BOQ Qty': 'qty',
-        'Resource QTY': 'resource_qty',
-        'Waste ratio': 'waste',
-        'Total Resource QTY': 'custom_total_resource_qty',
-        'Material Rate': 'unit_cost',
-        'Budget Rate': 'original_budget',
-        'Total Budget': 'budget',
-        'BOQ ID': 'boq_id',
-        'Finance Code': 'cost_center_code',
-        'Item Description': 'short_description',
-        'Combined Code': 'combined_code',
-        'Item': 'item_code',
-        'Res Type': 'res_type',
-        'Unit': 'uom',
-        "SubContractor Rate": 'subcontractor_rate',
-        "Accessories":"accessories",
-        "Labor":"labor",
-        "Equipment":"equipment",
-        "CSI":"csi",
-        "Res Unit":"res_unit",
-    }
-
-    # Prefetch existing WBS items for this BOQ to help parent lookup
-    existing_wbs = frappe.get_all('WBS item', filters={'boq': boq_name}, fields=['name', 'cost_code', 'level', 'parent_wbs_item'])
-    existing_map = {r['cost_code']: r for r in existing_wbs}
-
-    # Caches to reduce DB hits
-    item_cache = {}
-    cost_center_cache = {}
-    boq_details_cache = {}
-
-    inserted = []
-    failed = []
-    success = 0
-
-    # We'll build an in-memory mapping of code -> name for inserted docs as we go
-    wbs_code_to_name = {k: v['name'] for k, v in existing_map.items()}
-
-    # Helper functions
-    def get_cost_center(abbr):
-        if not abbr:
-            return None
-        if abbr in cost_center_cache:
-            return cost_center_cache[abbr]
-        cc = frappe.get_value('Cost Center', {'custom_abbr': abbr}, 'name')
-        cost_center_cache[abbr] = cc
-        return cc
-
-    def get_boq_details(boq_id):
-        if not boq_id:
-            return None
-        if boq_id in boq_details_cache:
-            return boq_details_cache[boq_id]
-        val = frappe.get_value('BOQ Details', {'boq_id': boq_id}, 'name')
-        boq_details_cache[boq_id] = val
-        return val
-
-    def get_item_by_code(code):
-        if not code:
-            return None
-        if code in item_cache:
-            return item_cache[code]
-        val = frappe.get_value('Item', {'item_code': code}, 'name')
-        item_cache[code] = val
-        return val
-
-    # Process rows
-    for idx, row in df.iterrows():
-        code = row['wbs_code']
-        excel_level = int(row['level'])
-        res_type = row.get('res_type') if 'res_type' in row else None
-
-        if not code or pd.isna(code):
-            failed.append(f"Row {idx+2}: Missing Cost Code")
+    column_types = {}
+    for column, fieldname in WBS_COLUMN_MAP.items():
+        field = meta.get_field(fieldname)
+        if not field:
             continue
+        if field.fieldtype in WBS_NUMERIC_FIELDTYPES:
+            kind = 'number'
+        else:
+            kind = 'code' if column in WBS_CODE_COLUMNS else 'text'
+        column_types[column] = (fieldname, kind)
+    return column_types
 
-        try:
-            # Prepare doc
-            doc = frappe.new_doc('WBS item')
-            doc.cost_code = code
-
-            # Map levels >4 to 4 (same logic as original)
-            mapped_level = excel_level if excel_level <= 10 else 10
-            doc.level = mapped_level
-
-            doc.boq = boq_name
-            doc.project = project
-            doc.warehouse = warehouse
-
-            has_resource_type = res_type and pd.notna(res_type) and str(res_type).strip() != ''
-            is_item_like = (excel_level >= 5) or has_resource_type
-            doc.is_group = 0 if is_item_like else 1
-
-            # FIX: Set res_type on doc
-            if pd.notna(res_type) and str(res_type).strip() != '' and 'res_type' in valid_fields:
-                doc.res_type = str(res_type).strip()
-
-            # Efficient parent resolution:
-            parent_name = None
-
-            if mapped_level > 1:
-                # Primary: try direct prefix split (common pattern: ABC-01-02)
-                parts = code.split('-')
-                if len(parts) > 1:
-                    parent_code = '-'.join(parts[:-1])
-                    parent_name = wbs_code_to_name.get(parent_code)
-
-                # Secondary: try full scan of in-memory map for matching prefix and level-1
-                if not parent_name:
-                    # prefer exact match of parent by checking codes whose level == mapped_level-1
-                    for existing_code, existing_name in wbs_code_to_name.items():
-                        # quick filter: must be shorter and be a prefix
-                        if len(existing_code) < len(code) and code.startswith(existing_code) and existing_map.get(existing_code, {}).get('level') == mapped_level - 1:
-                            parent_name = existing_name
-                            break
-
-            if parent_name:
-                doc.parent_wbs_item = parent_name
-
-            # cost center for level 2
-            if doc.level == 2:
-                seg = "-".join(code.split("-")[1:])
-                cc = get_cost_center(seg)
-                if cc:
-                    doc.cost_center = cc
-
-            # link BOQ details
-            boq_id_val = None
-            if 'BOQ ID' in df.columns:
-                boq_id_val = row.get('BOQ ID')
-            elif 'boq_id' in row.index:
-                boq_id_val = row.get('boq_id')
-
-            if pd.notna(boq_id_val) and str(boq_id_val).strip() != '':
-                boq_det = get_boq_details(str(boq_id_val).strip())
-                if boq_det and 'boq_details' in valid_fields:
-                    doc.boq_details = boq_det
-
-            # item-specific handling
-            if is_item_like:
-                item_code_from_excel = row.get('Item') if 'Item' in df.columns else None
-                if pd.notna(item_code_from_excel) and str(item_code_from_excel).strip() != '':
-                    truncated_item_code = str(item_code_from_excel)[:140]
-                    if 'item_code' in valid_fields:
-                        doc.item_code = truncated_item_code
-                        existing_item = get_item_by_code(truncated_item_code)
-                        if existing_item:
-                            doc.item = existing_item
-
-                desc = None
-                if 'Item Description' in df.columns:
-                    desc = row.get('Item Description')
-                if pd.notna(desc) and str(desc).strip() != '':
-                    doc.short_description = str(desc).strip()
-
-            # UOM
-            if 'Unit' in df.columns:
-                uom = row.get('Unit')
-                if pd.notna(uom) and str(uom).strip() != '':
-                    doc.uom = str(uom).strip()
-
-            # Map other columns - minimal parsing
-            for col, fld in column_map.items():
-                if col not in df.columns:
-                    continue
-               
-                # skip if already handled
-                if is_item_like and col in ['Item', 'Item Description']:
-                    continue
 
-                val = row.get(col)
-                if pd.isna(val) or str(val).strip() == '':
-                    continue
+def type_wbs_chunk(df, column_types):
+    """Coerce the mapped columns of a cleaned chunk to their field's type, whole
+    columns at a time, and drop the columns nothing reads.
 
-                if fld in ['qty', 'resource_qty', 'waste', 'custom_total_resource_qty', 'unit_cost', 'original_budget']:
-                    try:
-                        numeric_val = float(str(val).strip())
-                        if fld in valid_fields:
-                            doc.set(fld, numeric_val)
-                    except Exception:
-                        # skip invalid numeric
-                        pass
-                else:
-                    if fld in valid_fields:
-                        doc.set(fld, str(val).strip())
-
-            # Insert without committing on every row to save IO
-            doc.insert(ignore_permissions=True)
-
-            # Keep maps updated
-            wbs_code_to_name[code] = doc.name
-            # also update existing_map in-memory so later checks can use level info
-            existing_map[code] = {'name': doc.name, 'level': doc.level}
-
-            inserted.append({'cost_code': doc.cost_code, 'name': doc.name, 'level': doc.level})
-            success += 1
-
-            # Progress pub every `progress_interval` rows
-            if (idx + 1) % progress_interval == 0 or (idx + 1) == total:
-                progress = int(((idx + 1) / total) * 100)
-                try:
-                    frappe.publish_realtime('import_progress', {
-                        'status': f'Processing row {idx+1}/{total} - {code}',
-                        'progress': progress
-                    })
-                except Exception:
-                    # non-fatal if realtime fails
-                    pass
+    Numbers that do not parse and blank texts become NA, so the row loop only
+    skips NA and copies the rest as is.
+    """
+    df = df[[column for column in df.columns if column in column_types or column in WBS_KEY_COLUMNS]].copy()
+    for column, (_fieldname, kind) in column_types.items():
+        if column not in df.columns:
+            continue
+        if kind == 'number':
+            df[column] = to_number_column(df[column])
+        else:
+            df[column] = to_text_column(df[column], code=kind == 'code')
+    return df
 
-        except Exception as e:
-            frappe.log_error(title=f'WBS Import Error Row {idx+2}', message=str(e)[:1000])
-            failed.append(f"Row {idx+2}: Error inserting {code} -> {str(e)}")
-            # rollback only the doc insertion in memory; do not rollback entire transaction here
-            frappe.db.rollback()
 
-    # Single commit at end
-    try:
-        frappe.db.commit()
-    except Exception as e:
-        frappe.log_error(title='WBS Import Final Commit Error', message=str(e)[:2000])
-        # If final commit fails, raise so user knows
-        frappe.throw(f"Failed to commit imported WBS items: {e}")
+def to_number_column(column):
+    numbers = pd.to_numeric(column.astype('string').str.strip(), errors='coerce')
+    return numbers.astype('float64')
 
-    # Update BOQ flag once
-    try:
-        frappe.db.set_value('BOQ', boq_name, 'wbs_item_created', 1)
-        frappe.db.commit()
-    except Exception as e:
-        # non-fatal
-        frappe.msgprint(f"Warning: Could not update BOQ flag: {e}")
 
-    # Mark groups (use existing optimized function)
-    try:
-        mark_wbs_groups_as_is_group(boq_name)
-    except Exception:
-        pass
+def to_text_column(column, code=False):
+    text = column.astype('string').str.strip()
+    if code:
+        # Only cells that were numbers in the sheet drop their decimals; a code typed
+        # as text ("5100.10") is kept as it is
+        is_number = column.map(pd.api.types.is_number) & column.notna()
+        text = text.mask(is_number, text.str.split('.').str[0])
+    blank = text.isna() | (text == '').fillna(True)
+    return text.astype(object).mask(blank, None)
 
-    # Summary msg
-    frappe.msgprint(f"Import finished. Total: {total}, Success: {success}, Failed: {len(failed)}")
 
-    return {"total": total, "success": success, "failed": failed, "inserted": inserted}
+def enumerate_rows(chunks):
+    """Number rows across chunks like `iterrows` over a single reset frame"""
+    idx = 0
+    for chunk in chunks:
+        for _, row in chunk.iterrows():
+            yield idx, row
+            idx += 1
 
 
 @frappe.whitelist()
 def import_wbs_from_file_async(file_name, boq_name, project_name, warehouse):
-    """Enqueue the optimized import with a long timeout."""
-    job = frappe.enqueue(
-        'project_costing.project_costing.doctype.wbs_item.wbs_item_import.import_wbs_from_file_fast',
+    """Enqueue the import; its coordinator job fans the subtrees out to workers."""
+    job = create_job('WBS Import', 'BOQ', boq_name, file_url=file_name)
+    queued = frappe.enqueue(
+        'project_costing.project_costing.doctype.wbs_item.wbs_item_parallel_import.run_wbs_import_coordinator',
         file_name=file_name,
         boq_name=boq_name,
         project_name=project_name,
         warehouse=warehouse,
+        job=job.name,
         queue='long',
         timeout=7200
     )
-    return {'job_id': job.id}
+    return {'job_id': queued.id, 'job': job.name}
+
+
+def run_wbs_import_job(job, **kwargs):
+    """Background entry point of the sequential import; records failures on the
+    Project Costing Job"""
+    try:
+        import_wbs_from_file_fast(job=job, **kwargs)
+    except Exception:
+        frappe.db.rollback()
+        frappe.get_doc('Project Costing Job', job).set_status('Failed', error=frappe.get_traceback())
+        frappe.db.commit()
+        raise
 
 
 # Helper remains the same as earlier but slightly optimized
 def mark_wbs_groups_as_is_group(boq_name):
     try:
-        child_parents = frappe.get_all(
-            'WBS item',
-            filters={'boq': boq_name, 'parent_wbs_item': ['!=', '']},
-            fields=['parent_wbs_item']
-        )
-        parent_names = set(c['parent_wbs_item'] for c in child_parents)
-        if parent_names:
-            for parent_name in parent_names:
-                frappe.db.set_value('WBS item', parent_name, 'is_group', 1)
-            frappe.db.commit()
+        frappe.db.sql("""
+            UPDATE `tabWBS item` parent
+            JOIN (
+                SELECT DISTINCT `parent_wbs_item` AS name
+                FROM `tabWBS item`
+                WHERE `boq` = %s AND IFNULL(`parent_wbs_item`, '') != ''
+            ) child ON child.name = parent.name
+            SET parent.is_group = 1
+        """, boq_name)
+        frappe.db.commit()
     except Exception as e:
         frappe.msgprint(f"Warning: Could not mark WBS groups: {e}")
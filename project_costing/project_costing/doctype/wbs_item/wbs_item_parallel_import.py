@@ -0,0 +1,299 @@
+import json
+
+import frappe
+from frappe.utils import add_to_date, get_datetime, now, now_datetime
+from frappe.utils.background_jobs import is_job_enqueued
+
+from project_costing.project_costing.doctype.wbs_item.wbs_item import (
+    WBS_NAME_DIGITS,
+    WBS_SERIES_KEY,
+    get_wbs_series_start,
+)
+from project_costing.project_costing.doctype.wbs_item.wbs_item_import import (
+    WBS_IMPORT_COMMIT_SIZE,
+    WBSRowBuilder,
+    enumerate_rows,
+    find_wbs_parent,
+    get_existing_codes,
+    get_import_project,
+    get_mapped_level,
+    insert_wbs_row,
+    load_wbs_sheet,
+)
+from project_costing.project_costing.utils.naming import format_series_names, reserve_series_block
+from project_costing.project_costing.utils.nestedset import nested_set_updates_deferred, rebuild_tree_subset
+from project_costing.project_costing.utils.progress import ProgressTracker
+
+# Parallel WBS import. A coordinator job reads the sheet, resolves the name and the
+# parent of every row up front (same rules as the sequential import) and inserts the
+# top levels. The rows under each top row form an independent subtree; subtrees are
+# packed into worker jobs that insert in parallel. The last worker to finish, counted
+# on a tabSeries counter, enqueues the join step that numbers the tree once. A worker
+# killed hard never counts itself; `finish_stale_wbs_imports` runs the join for it.
+
+WBS_TOP_LEVEL = 2
+WBS_SUBTREE_JOB_ROWS = 2000  # subtrees are packed whole into jobs of about this size
+WBS_IMPORT_JOB_TIMEOUT = 7200
+WBS_STALE_JOIN_MINUTES = 15  # margin for workers that are enqueued but not visible yet
+MODULE = "project_costing.project_costing.doctype.wbs_item.wbs_item_parallel_import"
+
+
+def run_wbs_import_coordinator(job, file_name, boq_name, project_name, warehouse):
+    """Background entry point; records failures on the Project Costing Job"""
+    try:
+        coordinate_wbs_import(job, file_name, boq_name, project_name, warehouse)
+    except Exception:
+        frappe.db.rollback()
+        # Top rows committed before the failure stay; number them so the tree is usable
+        rebuild_tree_subset('WBS item', 'parent_wbs_item', {'boq': boq_name})
+        frappe.get_doc('Project Costing Job', job).set_status('Failed', error=frappe.get_traceback())
+        frappe.db.commit()
+        raise
+
+
+def coordinate_wbs_import(job, file_name, boq_name, project_name, warehouse):
+    _file_path, columns, first_clean, cleaned_chunks = load_wbs_sheet(file_name)
+    tracker = ProgressTracker.start('WBS Import', 'BOQ', boq_name, event='import_progress', job=job)
+    frappe.db.commit()
+
+    project = get_import_project(first_clean, project_name)
+    rows = [(idx, row.to_dict()) for idx, row in enumerate_rows(cleaned_chunks)]
+    tracker.set_total(len(rows))
+    existing = frappe.db.count('WBS item', {'boq': boq_name})
+
+    def make_names(count):
+        first = reserve_series_block(WBS_SERIES_KEY, count, initial=get_wbs_series_start)
+        return format_series_names(WBS_SERIES_KEY, first, count, WBS_NAME_DIGITS) if first else []
+
+    top, subtrees, errors = plan_wbs_rows(rows, *get_existing_codes(boq_name), make_names)
+    frappe.db.commit()  # the reserved names are taken even if the import fails later
+
+    failed_names = set()
+    with nested_set_updates_deferred('WBS item'):
+        _inserted, top_errors = insert_planned_rows(
+            WBSRowBuilder(boq_name, project, warehouse, columns), top, failed_names, on_row=tracker.advance
+        )
+
+    batches = []
+    for root, subtree in subtrees.items():
+        if root in failed_names:
+            errors += [f"Row {planned['idx']+2}: Parent of {planned['row']['wbs_code']} was not imported"
+                for planned in subtree]
+        else:
+            batches.append(subtree)
+    batches = pack_subtrees(batches, WBS_SUBTREE_JOB_ROWS)
+
+    for message in errors + top_errors:
+        tracker.add_error(message)
+    # Rows reported without an insert count as processed too
+    tracker.update(len(top) + len(errors), force=True)
+    tracker.job.set_checkpoint({'existing': existing, 'jobs': len(batches), 'enqueued_on': now()})
+
+    if not batches:
+        frappe.db.commit()
+        finish_wbs_import(job, boq_name)
+        return
+
+    for index, batch in enumerate(batches):
+        frappe.enqueue(
+            f'{MODULE}.run_wbs_subtree_job',
+            job=job,
+            boq_name=boq_name,
+            project=project,
+            warehouse=warehouse,
+            columns=list(columns),
+            rows=batch,
+            queue='long',
+            timeout=WBS_IMPORT_JOB_TIMEOUT,
+            job_id=get_queue_job_id(job, index),
+            enqueue_after_commit=True,
+        )
+    frappe.db.commit()
+
+
+def plan_wbs_rows(rows, code_to_name, code_trie, make_names):
+    """Name and parent for every sheet row, split into `(top, subtrees, errors)`.
+
+    `rows` are `(idx, row)` pairs; parents are resolved in sheet order against the
+    existing codes and the rows before, like the sequential import. A row up to
+    WBS_TOP_LEVEL whose parent is not in a subtree is a top row. Any other row joins
+    the subtree of its nearest ancestor that is a top row or an existing WBS item
+    (`subtrees` is `{root name: [rows]}`); rows without a parent share root None.
+    No subtree references a row of another one. Planned rows are dicts with `idx`,
+    `row`, `name` and `parent`, parents always before their children.
+    """
+    errors = []
+    valid = []
+    for idx, row in rows:
+        code = row.get('wbs_code')
+        if not code or code != code:  # NaN
+            errors.append(f"Row {idx+2}: Missing Cost Code")
+        else:
+            valid.append((idx, row))
+
+    names = iter(make_names(len(valid)))
+    roots = {}  # {name of a subtree row: its root}
+    top, subtrees = [], {}
+    for idx, row in valid:
+        code = row['wbs_code']
+        level = get_mapped_level(row['level'])
+        parent = find_wbs_parent(code, level, code_to_name, code_trie)
+        planned = {'idx': idx, 'row': row, 'name': next(names), 'parent': parent}
+
+        if level <= WBS_TOP_LEVEL and parent not in roots:
+            top.append(planned)
+        else:
+            roots[planned['name']] = roots.get(parent, parent)
+            subtrees.setdefault(roots[planned['name']], []).append(planned)
+
+        code_to_name[code] = planned['name']
+        code_trie.add(code, planned['name'], level)
+
+    return top, subtrees, errors
+
+
+def pack_subtrees(subtrees, size):
+    """Job batches of about `size` rows; a subtree is never split"""
+    batches, current = [], []
+    for subtree in subtrees:
+        if current and len(current) + len(subtree) > size:
+            batches.append(current)
+            current = []
+        current.extend(subtree)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def insert_planned_rows(builder, rows, failed_names=None, on_row=None):
+    """Insert planned rows in order, committing in chunks; returns `(inserted, errors)`.
+
+    The names of failed rows are added to `failed_names`; rows under them are
+    reported without trying the insert.
+    """
+    failed_names = set() if failed_names is None else failed_names
+    inserted, errors = 0, []
+    for planned in rows:
+        idx, code = planned['idx'], planned['row']['wbs_code']
+        if planned['parent'] and planned['parent'] in failed_names:
+            failed_names.add(planned['name'])
+            errors.append(f"Row {idx+2}: Parent of {code} was not imported")
+            continue
+
+        try:
+            insert_wbs_row(builder, planned['row'], planned['parent'], name=planned['name'])
+        except Exception as e:
+            failed_names.add(planned['name'])
+            frappe.log_error(title=f'WBS Import Error Row {idx+2}', message=str(e)[:1000])
+            errors.append(f"Row {idx+2}: Error inserting {code} -> {str(e)}")
+            continue
+
+        inserted += 1
+        if inserted % WBS_IMPORT_COMMIT_SIZE == 0:
+            frappe.db.commit()
+        if on_row:
+            on_row()
+
+    frappe.db.commit()
+    return inserted, errors
+
+
+def run_wbs_subtree_job(job, boq_name, project, warehouse, columns, rows):
+    errors = []
+    try:
+        with nested_set_updates_deferred('WBS item'):
+            _inserted, errors = insert_planned_rows(WBSRowBuilder(boq_name, project, warehouse, columns), rows)
+    except Exception:
+        # Committed chunks stay; the join step still has to run for the other subtrees
+        frappe.db.rollback()
+        frappe.log_error(title='WBS Import Subtree Job Error')
+        errors.append(f"Rows {rows[0]['idx']+2}-{rows[-1]['idx']+2}: import job failed, see Error Log")
+
+    complete_subtree_job(job, boq_name, len(rows), errors)
+
+
+def complete_subtree_job(job, boq_name, processed, errors):
+    """Add a finished worker's counts to the job; the last worker enqueues the join"""
+    # The counter row lock orders the workers, so each reads the job after the previous
+    done = reserve_series_block(get_workers_done_key(job), 1)
+    tracker = load_tracker(job)
+    for message in errors:
+        tracker.add_error(message)
+    tracker.update(tracker.done + processed, force=True)
+
+    if done >= tracker.job.get_checkpoint().get('jobs', 0):
+        enqueue_finish(job, boq_name)
+    frappe.db.commit()
+
+
+def enqueue_finish(job, boq_name):
+    frappe.enqueue(
+        f'{MODULE}.finish_wbs_import',
+        job=job,
+        boq_name=boq_name,
+        queue='long',
+        timeout=WBS_IMPORT_JOB_TIMEOUT,
+        job_id=get_queue_job_id(job, 'finish'),
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
+
+
+def finish_stale_wbs_imports():
+    """Enqueue the join step of parallel imports none of whose jobs is queued or running.
+
+    Scheduled hourly. Covers workers that died without reaching
+    `complete_subtree_job` (OOM kill, worker restart); their rows stay as committed
+    and are counted as failed by the join. Returns the names of the jobs finished.
+    """
+    cutoff = add_to_date(now_datetime(), minutes=-WBS_STALE_JOIN_MINUTES)
+    finished = []
+    for job in frappe.get_all(
+        'Project Costing Job',
+        filters={'job_type': 'WBS Import', 'status': 'Running'},
+        fields=['name', 'reference_name', 'checkpoint'],
+    ):
+        checkpoint = json.loads(job.checkpoint or '{}')
+        # Sequential imports and coordinators still planning have no worker count
+        if not checkpoint.get('jobs') or get_datetime(checkpoint.get('enqueued_on')) > cutoff:
+            continue
+
+        queue_ids = [get_queue_job_id(job.name, index) for index in range(checkpoint['jobs'])]
+        if any(is_job_enqueued(queue_id) for queue_id in queue_ids + [get_queue_job_id(job.name, 'finish')]):
+            continue
+
+        enqueue_finish(job.name, job.reference_name)
+        finished.append(job.name)
+
+    frappe.db.commit()
+    return finished
+
+
+def finish_wbs_import(job, boq_name):
+    """Join step: number the BOQ's WBS tree and set `is_group` once, then close the job"""
+    rebuild_tree_subset('WBS item', 'parent_wbs_item', {'boq': boq_name})
+    frappe.db.set_value('BOQ', boq_name, 'wbs_item_created', 1)
+    frappe.db.sql("DELETE FROM `tabSeries` WHERE `name` = %s", get_workers_done_key(job))
+
+    tracker = load_tracker(job)
+    total = tracker.total or 0
+    # Rows actually in the database, whatever a worker managed to report
+    success = frappe.db.count('WBS item', {'boq': boq_name}) - tracker.job.get_checkpoint().get('existing', 0)
+    tracker.failed = max(total - success, 0)
+    tracker.finish(message=f"Import finished. Total: {total}, Success: {success}, Failed: {tracker.failed}")
+    frappe.db.commit()
+
+
+def load_tracker(job):
+    job = frappe.get_doc('Project Costing Job', job)
+    tracker = ProgressTracker(job, event='import_progress', total=job.total_rows)
+    tracker.errors = (job.row_errors or '').splitlines()
+    return tracker
+
+
+def get_workers_done_key(job):
+    return f"WBS Import {job}"
+
+
+def get_queue_job_id(job, part):
+    return f"wbs_import::{job}::{part}"
@@ -0,0 +1,62 @@
+# Copyright (c) 2025, Finbyz and Contributors
+# See license.txt
+
+import json
+import os
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from project_costing.project_costing.doc_events import material_request, purchase_order
+from project_costing.project_costing.doctype.wbs_item.wbs_item import STOCK_FIGURE_FIELDS, WBS_TOTAL_FIELDS
+from project_costing.project_costing.doctype.wbs_quantity_ledger.wbs_quantity_ledger import LEDGER_FIELDS
+
+MODULE = "project_costing.project_costing.doctype.wbs_quantity_ledger.wbs_quantity_ledger"
+
+
+class TestWBSQuantityLedger(FrappeTestCase):
+	def test_ledger_folds_into_fields_no_other_writer_sets(self):
+		path = os.path.join(os.path.dirname(__file__), "..", "wbs_item", "wbs_item.json")
+		with open(path) as f:
+			wbs_fields = {field["fieldname"] for field in json.load(f)["fields"]}
+
+		targets = set(LEDGER_FIELDS.values())
+		self.assertLessEqual(targets, wbs_fields)
+		self.assertFalse(targets & {*WBS_TOTAL_FIELDS, *STOCK_FIGURE_FIELDS, "consumed_quantity", "available_amount"})
+
+	def test_purchase_order_submit_posts_its_movements(self):
+		order = SimpleNamespace(
+			doctype="Purchase Order",
+			name="PO-1",
+			items=[
+				frappe._dict(name="R1", custom_wbs="WBS-0001", qty=4, amount=40),
+				frappe._dict(name="R2", custom_wbs="WBS-0002", qty=3, amount=30),
+				frappe._dict(name="R3", custom_wbs=None, qty=9, amount=90),
+			],
+		)
+		boqs = [("WBS-0001", "BOQ-1"), ("WBS-0002", "BOQ-2")]
+
+		with patch(f"{MODULE}.frappe.get_all", return_value=boqs), patch(f"{MODULE}.insert_entries") as insert:
+			purchase_order.on_submit(order, "on_submit")
+
+		voucher_type, voucher_no, entries = insert.call_args.args
+		self.assertEqual((voucher_type, voucher_no), ("Purchase Order", "PO-1"))
+		self.assertEqual(
+			[(entry["voucher_detail_no"], entry["boq"], entry["pr_reserved_qty"], entry["po_reserved_qty"]) for entry in entries],
+			[("R1", "BOQ-1", -4, 4), ("R2", "BOQ-2", -3, 3)],
+		)
+
+	def test_movement_of_unknown_wbs_item_is_rejected(self):
+		request = SimpleNamespace(
+			doctype="Material Request",
+			name="MR-1",
+			items=[frappe._dict(name="R1", custom_wbs="WBS-9999", qty=1)],
+		)
+
+		with patch(f"{MODULE}.frappe.get_all", return_value=[]), patch(f"{MODULE}.insert_entries") as insert:
+			with self.assertRaises(frappe.ValidationError):
+				material_request.on_submit(request, "on_submit")
+
+		insert.assert_not_called()
@@ -0,0 +1,189 @@
+# Copyright (c) 2025, Finbyz and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import add_to_date, flt, now, now_datetime
+
+from project_costing.project_costing.utils.naming import get_locked_series_value, seed_series
+
+# Append-only quantity movements of WBS items. Submitting a Material Request,
+# Purchase Order, Purchase Receipt or Material Issue inserts one row per WBS line
+# and cancelling inserts the reversing rows; nothing is updated in place. The
+# balance of a WBS item is its ledger_* fields (the snapshot) plus the SUM of the
+# entries not folded into them yet; `fold_ledger` moves entries into the snapshot.
+# The ledger_* fields are written by nothing else: the reserved, available and
+# in-hand fields next to them are recomputed from the source documents and stock.
+#
+# Not wired in yet: the submit and cancel hooks and the fold are off (see hooks.py)
+# until the ledger_* snapshot is seeded from the current WBS figures and the
+# recomputed fields are read from the ledger instead.
+
+# {ledger field: WBS item field}
+LEDGER_FIELDS = {
+	field: f"ledger_{field}"
+	for field in (
+		"available_qty",
+		"pr_reserved_qty",
+		"po_reserved_qty",
+		"qty_in_hand",
+		"consumed_qty",
+		"amount",
+		"available_amount",
+	)
+}
+# tabSeries counter holding the last entry folded into the WBS item fields
+FOLDED_UPTO_KEY = "WBS Quantity Ledger Folded"
+FOLD_DELAY_MINUTES = 10
+
+
+class WBSQuantityLedger(Document):
+	pass
+
+
+def on_doctype_update():
+	# wbs_item carries its own index; entries are reversed per voucher
+	frappe.db.add_index("WBS Quantity Ledger", ["voucher_type", "voucher_no"])
+
+
+def post_wbs_movements(voucher, rows, make_deltas):
+	"""Append the ledger entries of a submitted `voucher`; nothing is committed here.
+
+	`make_deltas(row)` returns `{ledger field: change}` for a row carrying
+	`custom_wbs`. Movements are not checked against a balance, so no WBS item is
+	locked either; checks belong here once the ledger is the source of the balances.
+	"""
+	rows = [row for row in rows if row.custom_wbs]
+	if not rows:
+		return
+
+	boqs = dict(frappe.get_all(
+		"WBS item",
+		filters={"name": ["in", list({row.custom_wbs for row in rows})]},
+		fields=["name", "boq"],
+		as_list=True,
+	))
+	entries = []
+	for row in rows:
+		if row.custom_wbs not in boqs:
+			frappe.throw(_("WBS Item {0} not found").format(row.custom_wbs))
+		entries.append(dict(make_deltas(row), wbs_item=row.custom_wbs, boq=boqs[row.custom_wbs], voucher_detail_no=row.name))
+
+	insert_entries(voucher.doctype, voucher.name, entries)
+
+
+def reverse_wbs_movements(voucher):
+	"""Insert entries cancelling every entry posted for `voucher`"""
+	fields = ", ".join(f"`{field}`" for field in LEDGER_FIELDS)
+	negated = ", ".join(f"-`{field}`" for field in LEDGER_FIELDS)
+	timestamp = now()
+	frappe.db.sql(f"""
+		INSERT INTO `tabWBS Quantity Ledger`
+			(`wbs_item`, `boq`, `voucher_type`, `voucher_no`, `voucher_detail_no`, `is_reversal`,
+			`posting_datetime`, `creation`, `modified`, `owner`, `modified_by`, `docstatus`, {fields})
+		SELECT `wbs_item`, `boq`, `voucher_type`, `voucher_no`, `voucher_detail_no`, 1,
+			%(timestamp)s, %(timestamp)s, %(timestamp)s, %(user)s, %(user)s, 0, {negated}
+		FROM `tabWBS Quantity Ledger`
+		WHERE `voucher_type` = %(voucher_type)s AND `voucher_no` = %(voucher_no)s AND `is_reversal` = 0
+	""", {
+		"timestamp": timestamp,
+		"user": frappe.session.user,
+		"voucher_type": voucher.doctype,
+		"voucher_no": voucher.name,
+	})
+
+
+def insert_entries(voucher_type, voucher_no, entries):
+	timestamp = now()
+	fields = [
+		"wbs_item", "boq", "voucher_type", "voucher_no", "voucher_detail_no", "is_reversal",
+		"posting_datetime", "creation", "modified", "owner", "modified_by", "docstatus", *LEDGER_FIELDS,
+	]
+	values = [
+		(
+			entry["wbs_item"], entry.get("boq"), voucher_type, voucher_no, entry.get("voucher_detail_no"), 0,
+			timestamp, timestamp, timestamp, frappe.session.user, frappe.session.user, 0,
+			*(flt(entry.get(field)) for field in LEDGER_FIELDS),
+		)
+		for entry in entries
+	]
+	# The name column is AUTO_INCREMENT, so one multi-row INSERT covers the voucher
+	frappe.db.bulk_insert("WBS Quantity Ledger", fields, values)
+
+
+def get_wbs_balances(wbs_items):
+	"""`{wbs item: _dict(ledger field: balance, boq=...)}`: snapshot plus unfolded entries"""
+	wbs_items = sorted({name for name in wbs_items if name})
+	if not wbs_items:
+		return {}
+
+	folded = get_folded_upto()
+	balances = {}
+	for row in frappe.db.sql(f"""
+		SELECT `name`, `boq`{"".join(f", `{target}`" for target in LEDGER_FIELDS.values())}
+		FROM `tabWBS item`
+		WHERE `name` IN %(wbs_items)s
+	""", {"wbs_items": tuple(wbs_items)}, as_dict=True):
+		balance = frappe._dict({field: flt(row.get(target)) for field, target in LEDGER_FIELDS.items()})
+		balance.boq = row.boq
+		balances[row.name] = balance
+
+	sums = ", ".join(f"SUM(`{field}`) AS `{field}`" for field in LEDGER_FIELDS)
+	for row in frappe.db.sql(f"""
+		SELECT `wbs_item`, {sums}
+		FROM `tabWBS Quantity Ledger`
+		WHERE `wbs_item` IN %(wbs_items)s AND `name` > %(folded)s
+		GROUP BY `wbs_item`
+	""", {"wbs_items": tuple(wbs_items), "folded": folded}, as_dict=True):
+		if row.wbs_item in balances:
+			for field in LEDGER_FIELDS:
+				balances[row.wbs_item][field] += flt(row[field])
+
+	return balances
+
+
+def fold_ledger():
+	"""Add the entries posted since the last run to the ledger_* fields of WBS items.
+
+	Scheduled hourly. The fold counter is locked for the run, so overlapping runs
+	never add the same entries twice; WBS items and counter move in one commit.
+	Returns the id of the last folded entry, or 0 when there was nothing to fold.
+	"""
+	seed_series(FOLDED_UPTO_KEY, 0)  # make sure the counter row exists to be locked
+	folded = get_locked_series_value(FOLDED_UPTO_KEY) or 0
+	# Ids are taken at INSERT but become visible at COMMIT, so a recent entry may
+	# still be followed by a lower id; only entries older than the delay are folded
+	upto = frappe.db.sql("""
+		SELECT `name` FROM `tabWBS Quantity Ledger`
+		WHERE `name` > %s AND `creation` < %s
+		ORDER BY `name` DESC LIMIT 1
+	""", (folded, add_to_date(now_datetime(), minutes=-FOLD_DELAY_MINUTES)))
+	if not upto:
+		frappe.db.rollback()
+		return 0
+	upto = upto[0][0]
+
+	sums = ", ".join(f"SUM(`{field}`) AS `{field}`" for field in LEDGER_FIELDS)
+	assignments = ", ".join(
+		f"wbs.`{target}` = IFNULL(wbs.`{target}`, 0) + movement.`{field}`" for field, target in LEDGER_FIELDS.items()
+	)
+	frappe.db.sql(f"""
+		UPDATE `tabWBS item` wbs
+		JOIN (
+			SELECT `wbs_item`, {sums}
+			FROM `tabWBS Quantity Ledger`
+			WHERE `name` > %(folded)s AND `name` <= %(upto)s
+			GROUP BY `wbs_item`
+		) movement ON movement.wbs_item = wbs.name
+		SET {assignments}
+	""", {"folded": folded, "upto": upto})
+
+	seed_series(FOLDED_UPTO_KEY, upto)
+	frappe.db.commit()
+	return upto
+
+
+def get_folded_upto():
+	folded = frappe.db.sql("SELECT `current` FROM `tabSeries` WHERE `name` = %s", FOLDED_UPTO_KEY)
+	return folded[0][0] if folded and folded[0][0] is not None else 0
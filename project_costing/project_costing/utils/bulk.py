@@ -0,0 +1,85 @@
+from collections import defaultdict
+
+import frappe
+from frappe.utils import create_batch, now
+
+BULK_INSERT_CHUNK_SIZE = 1000
+
+
+def bulk_insert_docs(doctype, rows, chunk_size=BULK_INSERT_CHUNK_SIZE, on_chunk=None):
+    """Write plain `rows` (dicts carrying their own `name`) with multi-row INSERTs.
+
+    Controllers, doc events and nested-set hooks are skipped, so every value
+    (including `lft`/`rgt`) must already be computed. Meta defaults and the standard
+    fields are filled in and keys that are not table columns are dropped.
+    `on_chunk(done)` is called after each chunk is written.
+    """
+    if not rows:
+        return 0
+
+    columns = set(frappe.db.get_table_columns(doctype))
+    template = frappe.new_doc(doctype).get_valid_dict(convert_dates_to_str=True, ignore_nulls=True)
+    template.pop("name", None)
+
+    timestamp = now()
+    template.update(
+        {
+            "owner": frappe.session.user,
+            "modified_by": frappe.session.user,
+            "creation": timestamp,
+            "modified": timestamp,
+            "docstatus": 0,
+        }
+    )
+
+    fields = [field for field in template if field in columns]
+    for row in rows:
+        for field in row:
+            if field in columns and field not in fields:
+                fields.append(field)
+
+    done = 0
+    for chunk in create_batch(rows, chunk_size):
+        values = [tuple(row.get(field, template.get(field)) for field in fields) for row in chunk]
+        frappe.db.bulk_insert(doctype, fields, values, chunk_size=chunk_size)
+        done += len(chunk)
+        if on_chunk:
+            on_chunk(done)
+
+    return done
+
+
+def bulk_update_rows(doctype, updates, chunk_size=BULK_INSERT_CHUNK_SIZE, update_modified=True):
+    """Apply `{name: {field: value}}` with one `CASE name WHEN ...` UPDATE per field and chunk.
+
+    Like `bulk_insert_docs` this bypasses controllers and doc events. Only the given
+    fields of the given rows are written. Returns the number of rows touched.
+    """
+    if not updates:
+        return 0
+
+    columns = set(frappe.db.get_table_columns(doctype))
+    by_field = defaultdict(dict)
+    for name, values in updates.items():
+        for field, value in values.items():
+            if field not in columns:
+                frappe.throw(f"{field} is not a column of {doctype}")
+            by_field[field][name] = value
+
+    timestamp = now()
+    for field, values in by_field.items():
+        for names in create_batch(list(values), chunk_size):
+            params = [param for name in names for param in (name, values[name])]
+            modified = ""
+            if update_modified:
+                modified = ", `modified`=%s, `modified_by`=%s"
+                params += [timestamp, frappe.session.user]
+
+            frappe.db.sql(
+                f"""UPDATE `tab{doctype}`
+                SET `{field}` = CASE `name` {" ".join(["WHEN %s THEN %s"] * len(names))} END{modified}
+                WHERE `name` IN ({", ".join(["%s"] * len(names))})""",
+                params + list(names),
+            )
+
+    return len(updates)
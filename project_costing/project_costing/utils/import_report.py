@@ -0,0 +1,73 @@
+from collections import Counter
+
+import frappe
+from frappe.utils import create_batch
+
+# Structured result of a dry-run import check. Issues keep a stable message so the
+# summary can group them; the offending value and sheet row go in separate keys.
+
+MAX_REPORTED_ISSUES = 500
+LOOKUP_BATCH_SIZE = 1000
+
+
+class ImportReport:
+    def __init__(self, limit=MAX_REPORTED_ISSUES):
+        self.limit = limit
+        self.total_rows = 0
+        self.errors = []
+        self.warnings = []
+        self.counts = Counter()
+
+    def error(self, row, message, column=None, value=None):
+        self.add(self.errors, "error", row, message, column, value)
+
+    def warning(self, row, message, column=None, value=None):
+        self.add(self.warnings, "warning", row, message, column, value)
+
+    def add(self, issues, level, row, message, column, value):
+        self.counts[(level, message)] += 1
+        if len(issues) < self.limit:
+            issues.append({"row": row, "column": column, "value": value, "message": message})
+
+    @property
+    def error_count(self):
+        return sum(count for (level, _message), count in self.counts.items() if level == "error")
+
+    @property
+    def warning_count(self):
+        return sum(count for (level, _message), count in self.counts.items() if level == "warning")
+
+    def as_dict(self):
+        error_count = self.error_count
+        warning_count = self.warning_count
+        return {
+            "valid": not error_count,
+            "total_rows": self.total_rows,
+            "error_count": error_count,
+            "warning_count": warning_count,
+            "summary": [
+                {"level": level, "message": message, "count": count}
+                for (level, message), count in self.counts.most_common()
+            ],
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "truncated": len(self.errors) < error_count or len(self.warnings) < warning_count,
+        }
+
+
+def sheet_row_number(label):
+    """1-based spreadsheet row of a parsed row, from its index `label`: the sheet
+    readers index rows by it, so skipped blank rows do not shift the numbers"""
+    return int(label)
+
+
+def get_existing_values(doctype, fieldname, values):
+    """Subset of `values` present in `doctype.fieldname`, compared case-insensitively
+    like the database does; one query per batch instead of one per row."""
+    found = set()
+    for batch in create_batch(sorted(values), LOOKUP_BATCH_SIZE):
+        found.update(
+            str(value).lower()
+            for value in frappe.get_all(doctype, filters={fieldname: ["in", batch]}, pluck=fieldname)
+        )
+    return {value for value in values if value.lower() in found}
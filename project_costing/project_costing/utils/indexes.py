@@ -0,0 +1,96 @@
+import frappe
+from frappe import _
+
+# Composite indexes on the columns the app filters by: the custom_* tracking fields
+# of the transaction child tables and the BOQ links of the two tree doctypes. The
+# tracking fields are Custom Fields, so an index is only created once all of its
+# columns exist; `after_migrate` picks up the rest after the fields are added.
+
+TRANSACTION_TABLES = (
+    "Material Request Item",
+    "Request for Quotation Item",
+    "Supplier Quotation Item",
+    "Purchase Order Item",
+    "Purchase Receipt Item",
+    "Purchase Invoice Item",
+    "Expense Claim Detail",
+    "Stock Entry Detail",
+)
+# The project of a line is `project_name` on RFQ items and lives on the Expense Claim
+PROJECT_COLUMNS = {"Request for Quotation Item": "project_name", "Expense Claim Detail": None}
+
+TREE_INDEXES = {
+    "WBS item": (
+        ("boq", "parent_wbs_item"),
+        ("boq", "cost_code"),
+        ("boq_id",),
+    ),
+    "BOQ Details": (
+        ("boq", "parent_boq_details"),
+        ("boq", "item_cost_code"),
+        ("boq_id",),
+    ),
+}
+INDEX_PREFIX = "pc_"
+
+
+def after_migrate():
+    ensure_tracking_indexes()
+
+
+def ensure_tracking_indexes():
+    """Create the missing indexes and return `{"present": [...], "skipped": [...]}`.
+
+    Each entry is `(doctype, index name)`; skipped indexes are those with a column
+    the site does not have. Existing indexes are left alone.
+    """
+    table_columns = {}
+    for doctype in get_index_definitions():
+        table_columns[doctype] = set(frappe.db.get_table_columns(doctype)) if frappe.db.table_exists(doctype) else set()
+
+    present, skipped = [], []
+    for doctype, index_name, columns in get_index_plan(table_columns):
+        if columns is None:
+            skipped.append((doctype, index_name))
+            continue
+
+        frappe.db.add_index(doctype, list(columns), index_name)
+        if not frappe.db.has_index(f"tab{doctype}", index_name):
+            frappe.throw(_("Index {0} could not be created on {1}").format(index_name, doctype))
+        present.append((doctype, index_name))
+
+    return {"present": present, "skipped": skipped}
+
+
+def get_index_definitions():
+    """`{doctype: (column tuple, ...)}` for every index the app ships"""
+    definitions = {}
+    for doctype in TRANSACTION_TABLES:
+        project = PROJECT_COLUMNS.get(doctype, "project")
+        definitions[doctype] = (
+            ("custom_wbs", project) if project else ("custom_wbs",),
+            ("custom_boq", "custom_wbs"),
+            ("custom_boq_details",),
+        )
+    definitions.update(TREE_INDEXES)
+    return definitions
+
+
+def get_index_plan(table_columns):
+    """`(doctype, index name, columns)` per index; columns is None when one is missing"""
+    plan = []
+    for doctype, indexes in get_index_definitions().items():
+        available = table_columns.get(doctype) or set()
+        for columns in indexes:
+            index_name = get_index_name(columns)
+            plan.append((doctype, index_name, columns if set(columns) <= available else None))
+    return plan
+
+
+def get_index_name(columns):
+    return INDEX_PREFIX + "_".join(columns)
+
+
+def get_used_indexes(query, values=None):
+    """`{table alias: index}` that the database picks for `query`, from its EXPLAIN"""
+    return {row.table: row.key for row in frappe.db.sql(f"EXPLAIN {query}", values, as_dict=True)}
@@ -0,0 +1,76 @@
+import frappe
+
+# Item attributes read by WBS item / BOQ Details validation, cached per request in
+# `frappe.local` and across workers in Redis. Entries are keyed by the lower-cased
+# item code (the database compares names case-insensitively) and dropped by the Item
+# doc events, so a renamed, edited or deleted Item is never served stale. Each Redis
+# entry is its own key with an expiry, so codes looked up once (typos in a sheet
+# above all) do not pile up.
+
+ITEM_CACHE_KEY = "project_costing:item_attributes"
+ITEM_CACHE_TTL = 6 * 60 * 60
+MISSING_CACHE_TTL = 10 * 60
+ITEM_CACHE_FIELDS = ("name", "item_group", "stock_uom", "item_name", "disabled")
+MISSING = {}  # cached for codes with no Item, so repeated misses skip the database too
+
+
+def get_item_attributes(item_code):
+    """`frappe._dict` of ITEM_CACHE_FIELDS for `item_code`, or None if there is no such Item"""
+    if not item_code:
+        return None
+
+    key = item_code.lower()
+    local_cache = get_local_cache()
+    if key not in local_cache:
+        attributes = frappe.cache.get_value(get_cache_key(key))
+        if attributes is None:
+            attributes = frappe.db.get_value("Item", item_code, ITEM_CACHE_FIELDS, as_dict=True) or MISSING
+            frappe.cache.set_value(
+                get_cache_key(key),
+                dict(attributes),
+                expires_in_sec=ITEM_CACHE_TTL if attributes else MISSING_CACHE_TTL,
+            )
+        local_cache[key] = attributes
+
+    attributes = local_cache[key]
+    return frappe._dict(attributes) if attributes else None
+
+
+def clear_item_attributes(*item_codes):
+    local_cache = get_local_cache()
+    for item_code in item_codes:
+        if item_code:
+            local_cache.pop(item_code.lower(), None)
+            frappe.cache.delete_value(get_cache_key(item_code.lower()))
+
+
+def get_cache_key(key):
+    return f"{ITEM_CACHE_KEY}:{key}"
+
+
+def get_local_cache():
+    if not hasattr(frappe.local, "project_costing_item_attributes"):
+        frappe.local.project_costing_item_attributes = {}
+    return frappe.local.project_costing_item_attributes
+
+
+def apply_item_attributes(doc, item_code_field, excluded_group, set_details=True):
+    """Validate `doc.<item_code_field>` against the cached Item and copy its attributes.
+
+    The code is cleared unless it is an enabled Item outside `excluded_group`.
+    Only fields whose value differs are assigned; the save that runs this
+    validation writes them, so no extra UPDATEs are issued.
+    """
+    item = get_item_attributes(doc.get(item_code_field))
+    if not item or item.disabled or item.item_group == excluded_group:
+        doc.set(item_code_field, None)
+        return None
+
+    values = {item_code_field: item.name}
+    if set_details:
+        values.update(item_group=item.item_group, uom=item.stock_uom, item_name=item.item_name)
+
+    for fieldname, value in values.items():
+        if doc.get(fieldname) != value:
+            doc.set(fieldname, value)
+    return item
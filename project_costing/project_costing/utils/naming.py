@@ -0,0 +1,146 @@
+from contextlib import contextmanager
+
+import frappe
+from frappe.model.naming import parse_naming_series
+from frappe.utils import cint
+
+
+NAME_BLOCK_SIZE = 1000
+
+
+def reserve_series_block(key, count, initial=0):
+    """Reserve `count` consecutive numbers on the `tabSeries` counter `key`.
+
+    Works like `frappe.model.naming.getseries` but moves the counter once for the
+    whole block, so bulk writers can name thousands of rows with a single round trip.
+    The counter row is locked, so parallel workers always get disjoint blocks. A
+    missing counter starts at `initial` (a number, or a callable evaluated only
+    then). Returns the first reserved number.
+    """
+    count = cint(count)
+    if count <= 0:
+        return None
+
+    current = get_locked_series_value(key)
+    if current is None:
+        # IGNORE: a parallel worker may be creating the same counter
+        frappe.db.sql(
+            "INSERT IGNORE INTO `tabSeries` (`name`, `current`) VALUES (%s, %s)",
+            (key, cint(initial() if callable(initial) else initial)),
+        )
+        current = get_locked_series_value(key)
+
+    frappe.db.sql(
+        "UPDATE `tabSeries` SET `current` = `current` + %s WHERE `name`=%s", (count, key)
+    )
+    return current + 1
+
+
+def get_locked_series_value(key):
+    current = frappe.db.sql(
+        "SELECT `current` FROM `tabSeries` WHERE `name`=%s FOR UPDATE", (key,)
+    )
+    if current and current[0][0] is not None:
+        return cint(current[0][0])
+    return None
+
+
+def get_max_series_number(doctype, key):
+    """Highest number used by `doctype` names of the form `{key}{number}`.
+
+    Scans the table, so it is only meant for seeding a counter.
+    """
+    return cint(frappe.db.sql(
+        f"""SELECT IFNULL(MAX(CAST(SUBSTRING(`name`, %s) AS UNSIGNED)), 0)
+        FROM `tab{doctype}` WHERE `name` LIKE %s""",
+        (len(key) + 1, f"{key}%"),
+    )[0][0])
+
+
+def seed_series(key, current):
+    """Move the counter `key` up to `current` (never down)."""
+    frappe.db.sql(
+        """INSERT INTO `tabSeries` (`name`, `current`) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE `current` = GREATEST(`current`, VALUES(`current`))""",
+        (key, cint(current)),
+    )
+
+
+class SeriesNameBlock:
+    """Hands out `{key}{number}` names from blocks reserved on a `tabSeries` counter.
+
+    With `block_size=1` every name costs one counter update; bulk writers use a
+    larger block so the counter is touched once per `block_size` names. Numbers
+    left in the last block are skipped, like numbers of rolled back inserts. A
+    rollback of the transaction that reserved the block undoes the counter update
+    too, so the block is discarded then instead of handing out numbers the counter
+    will give again.
+    """
+
+    def __init__(self, key, block_size=1, digits=5, initial=0):
+        self.key = key
+        self.block_size = max(cint(block_size), 1)
+        self.digits = digits
+        self.initial = initial
+        self.next = None
+        self.last = None
+
+    def next_name(self):
+        if self.next is None or self.next > self.last:
+            self.next = reserve_series_block(self.key, self.block_size, self.initial)
+            self.last = self.next + self.block_size - 1
+            # Cleared by the next commit, which makes the reservation durable
+            frappe.db.after_rollback.add(self.discard)
+
+        name = f"{self.key}{self.next:0{self.digits}d}"
+        self.next += 1
+        return name
+
+    def discard(self):
+        """Forget the current block, e.g. after its reservation was rolled back to a
+        savepoint (full rollbacks discard it on their own)"""
+        self.next = self.last = None
+
+
+@contextmanager
+def reserved_name_block(doctype, key, block_size=NAME_BLOCK_SIZE, digits=5, initial=0):
+    """Bulk-write context: `autoname` of `doctype` takes names from one shared block
+    (see `get_name_block`) instead of reserving a number per document."""
+    blocks = frappe.flags.series_name_blocks or {}
+    frappe.flags.series_name_blocks = {**blocks, doctype: SeriesNameBlock(key, block_size, digits, initial)}
+    try:
+        yield
+    finally:
+        frappe.flags.series_name_blocks = blocks
+
+
+def get_name_block(doctype):
+    return (frappe.flags.series_name_blocks or {}).get(doctype)
+
+
+def make_series_names(key, count, digits=5):
+    """Return `count` fresh names of the form `{key}{number:0digits}`."""
+    first = reserve_series_block(key, count)
+    if first is None:
+        return []
+    return format_series_names(key, first, count, digits)
+
+
+def format_series_names(key, first, count, digits=5):
+    """Names for an already reserved block starting at `first`."""
+    return [f"{key}{number:0{digits}d}" for number in range(first, first + cint(count))]
+
+
+def split_naming_series(naming_series):
+    """`(prefix, digits)` that `make_autoname(naming_series)` would number with."""
+    if "#" not in naming_series:
+        naming_series += ".#####"
+
+    parts = {}
+
+    def capture(prefix, digits):
+        parts.update(prefix=prefix, digits=digits)
+        return "#" * digits
+
+    parse_naming_series(naming_series, number_generator=capture)
+    return parts["prefix"], parts["digits"]
@@ -0,0 +1,164 @@
+from collections import defaultdict
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import cint
+from frappe.utils.nestedset import rebuild_tree as frappe_rebuild_tree
+
+from project_costing.project_costing.utils.bulk import bulk_update_rows
+
+
+def compute_nested_set(nodes, start=1):
+    """Compute `lft`/`rgt` for an in-memory tree.
+
+    `nodes` is an iterable of `(key, parent_key)` pairs in sibling order, i.e. the
+    order a per-row insert would have used. Nodes whose parent is unknown are treated
+    as roots. Returns `{key: (lft, rgt)}` numbered from `start`.
+    """
+    nodes = list(nodes)
+    known = {key for key, _parent in nodes}
+    children = defaultdict(list)
+    roots = []
+
+    for key, parent in nodes:
+        if parent is not None and parent in known and parent != key:
+            children[parent].append(key)
+        else:
+            roots.append(key)
+
+    bounds = {}
+    counter = start
+    stack = [(key, False) for key in reversed(roots)]
+    while stack:
+        key, closing = stack.pop()
+        if closing:
+            bounds[key] = (bounds[key][0], counter)
+            counter += 1
+            continue
+
+        bounds[key] = (counter, None)
+        counter += 1
+        stack.append((key, True))
+        stack.extend((child, False) for child in reversed(children.get(key, ())))
+
+    return bounds
+
+
+def get_next_lft(doctype):
+    """First free `lft` value after every existing node of `doctype`."""
+    max_rgt = frappe.db.sql(f"SELECT IFNULL(MAX(`rgt`), 0) FROM `tab{doctype}`")[0][0]
+    return int(max_rgt or 0) + 1
+
+
+def rebuild_nested_set(doctype, rows, keep_groups=False):
+    """Recompute `lft`/`rgt`/`is_group` for one tree (e.g. the rows of one BOQ).
+
+    `rows` are dicts with `name`, `parent` (a name or None), `lft`, `rgt` and `is_group`,
+    in sibling order; when they carry `old_parent` it is synced to `parent` too. The
+    tree keeps its current `lft` range when it still fits there and no other node
+    lives in it; otherwise (new rows, or rows never numbered) it moves after every
+    existing node. With `keep_groups` childless rows keep their `is_group` flag
+    instead of being cleared. Only changed values are written; returns that count.
+    """
+    if not rows:
+        return 0
+
+    bounds = compute_nested_set(
+        ((row["name"], row["parent"]) for row in rows),
+        start=get_current_range_start(doctype, rows) or get_next_lft(doctype),
+    )
+    parents = {row["parent"] for row in rows if row["parent"] in bounds}
+
+    changes = {}
+    for row in rows:
+        lft, rgt = bounds[row["name"]]
+        is_group = 1 if row["name"] in parents else (cint(row["is_group"]) if keep_groups else 0)
+        values = {"lft": lft, "rgt": rgt, "is_group": is_group}
+        changed = {field: value for field, value in values.items() if cint(row[field]) != value}
+        if "old_parent" in row and (row["old_parent"] or None) != (row["parent"] or None):
+            changed["old_parent"] = row["parent"]
+        if changed:
+            changes[row["name"]] = changed
+
+    return bulk_update_rows(doctype, changes, update_modified=False)
+
+
+def get_current_range_start(doctype, rows):
+    """Start of the `lft` range the rows occupy, if they can be renumbered inside it"""
+    if not all(cint(row["lft"]) and cint(row["rgt"]) for row in rows):
+        return None
+
+    low = min(cint(row["lft"]) for row in rows)
+    high = max(cint(row["rgt"]) for row in rows)
+    if high - low + 1 < 2 * len(rows):
+        return None
+
+    # Another tree may have been numbered inside the range (interleaved inserts)
+    in_range = frappe.db.sql(
+        f"SELECT COUNT(*) FROM `tab{doctype}` WHERE `lft` BETWEEN %s AND %s", (low, high)
+    )[0][0]
+    return low if in_range == len(rows) else None
+
+
+@contextmanager
+def deferred_nested_set(doctype, parent_field, filters):
+    """Bulk-write context for tree doctypes.
+
+    Inside the block controllers skip their per-row nested-set update (see
+    `is_nested_set_deferred`); on a clean exit the rows matching `filters` are
+    renumbered in one pass and `is_group`/`old_parent` are set, with set-based UPDATEs.
+    """
+    with nested_set_updates_deferred(doctype):
+        yield
+
+    rebuild_tree_subset(doctype, parent_field, filters)
+
+
+@contextmanager
+def nested_set_updates_deferred(doctype):
+    """Controllers of `doctype` skip their nested-set update inside the block; for
+    writers whose tree is renumbered by another step (e.g. a later job)"""
+    deferred = frappe.flags.deferred_nested_set or frozenset()
+    frappe.flags.deferred_nested_set = deferred | {doctype}
+    try:
+        yield
+    finally:
+        frappe.flags.deferred_nested_set = deferred
+
+
+def is_nested_set_deferred(doctype):
+    return doctype in (frappe.flags.deferred_nested_set or ())
+
+
+def rebuild_tree_subset(doctype, parent_field, filters, with_descendants=False):
+    """Renumber the rows matching `filters` as a tree of their own, keeping sibling order.
+
+    For doctypes whose tree is shared with rows the filters do not match (e.g. Tasks
+    a user added under BOQ Tasks), `with_descendants` renumbers every descendant of
+    the matching rows with them. When a matching row has a parent outside them, the
+    whole tree of `doctype` is rebuilt instead.
+    """
+    fields = ["name", f"{parent_field} as parent", "lft", "rgt", "is_group", "old_parent"]
+    rows = frappe.get_all(doctype, filters=filters, fields=fields, order_by="creation asc, name asc")
+
+    if with_descendants:
+        names = {row.name for row in rows}
+        if any(row.parent and row.parent not in names for row in rows):
+            frappe_rebuild_tree(doctype)
+            return len(rows)
+
+        level = list(names)
+        while level:
+            children = frappe.get_all(
+                doctype,
+                filters={parent_field: ["in", level], "name": ["not in", list(names)]},
+                fields=fields,
+                order_by="creation asc, name asc",
+            )
+            rows += children
+            level = [row.name for row in children]
+            names.update(level)
+
+    # Numbered rows keep their order; rows added without numbers follow in creation order
+    rows.sort(key=lambda row: (not cint(row.lft), cint(row.lft)))
+    return rebuild_nested_set(doctype, rows, keep_groups=True)
@@ -0,0 +1,188 @@
+import time
+from datetime import timedelta
+
+import frappe
+from frappe.utils import cint, now_datetime
+
+from project_costing.project_costing.doctype.project_costing_job.project_costing_job import (
+    create_job,
+    get_status_cache_key,
+)
+
+# One progress reporter for imports, deletes, item and task creation. Realtime
+# publishes are throttled by time and by percent step, and the state of every run
+# (rows done, failures, ETA) is kept on a Project Costing Job record plus a cache
+# entry that is readable before the run commits.
+
+PUBLISH_INTERVAL = 1.0  # seconds between two publishes
+PUBLISH_STEP = 1.0  # minimum percent change between two publishes
+MAX_KEPT_ERRORS = 50
+STATUS_CACHE_TTL = 24 * 60 * 60
+
+
+class ProgressTracker:
+    def __init__(self, job, event=None, total=None, interval=PUBLISH_INTERVAL, step=PUBLISH_STEP):
+        self.job = job
+        self.event = event
+        self.total = cint(total) or None
+        self.interval = interval
+        self.step = step
+        self.user = frappe.session.user
+
+        self.done = cint(job.processed_rows)
+        self.failed = cint(job.failed_rows)
+        self.errors = []
+        self.message = None
+        self.started = time.monotonic()
+        self.start_done = self.done
+        self.last_publish = None
+        self.last_percent = None
+
+    @classmethod
+    def start(cls, job_type, reference_doctype, reference_name, event=None, total=None, job=None, **kwargs):
+        """Create (or attach to an existing) Project Costing Job and mark it running"""
+        if job:
+            job = frappe.get_doc("Project Costing Job", job)
+        else:
+            job = create_job(job_type, reference_doctype, reference_name)
+
+        job.set_status("Running")
+        return cls(job, event=event, total=total, **kwargs)
+
+    def set_total(self, total):
+        self.total = cint(total) or None
+        self.job.db_set("total_rows", self.total or 0, update_modified=False)
+
+    def advance(self, count=1, message=None):
+        self.update(self.done + count, message=message)
+
+    def add_error(self, message):
+        self.failed += 1
+        if len(self.errors) < MAX_KEPT_ERRORS:
+            self.errors.append(message)
+
+    def update(self, done, message=None, force=False):
+        """Record `done` rows; publishes only when the throttle allows it"""
+        self.done = done
+        if message:
+            self.message = message
+
+        percent = self.percent
+        if not force and not self.is_due(percent):
+            return
+
+        self.last_publish = time.monotonic()
+        self.last_percent = percent
+        self.publish(self.save())
+
+    def is_due(self, percent):
+        if self.last_publish is None or (self.total and self.done >= self.total):
+            return True
+        if time.monotonic() - self.last_publish < self.interval:
+            return False
+        if percent is None or self.last_percent is None:
+            return True
+        return percent - self.last_percent >= self.step
+
+    @property
+    def percent(self):
+        if not self.total:
+            return None
+        return min(self.done / self.total * 100, 100)
+
+    @property
+    def eta_seconds(self):
+        rate_done = self.done - self.start_done
+        if not self.total or rate_done <= 0:
+            return None
+        elapsed = time.monotonic() - self.started
+        return max(self.total - self.done, 0) * elapsed / rate_done
+
+    def get_state(self, status=None):
+        eta_seconds = self.eta_seconds
+        return {
+            "job": self.job.name,
+            "job_type": self.job.job_type,
+            "status": status or self.job.status,
+            "progress": self.percent,
+            "done": self.done,
+            "total": self.total,
+            "failed": self.failed,
+            "eta_seconds": round(eta_seconds) if eta_seconds is not None else None,
+            "message": self.message,
+            "errors": self.errors,
+        }
+
+    def save(self, status=None):
+        state = self.get_state(status)
+        eta_seconds = state["eta_seconds"]
+        self.job.db_set(
+            {
+                "processed_rows": self.done,
+                "failed_rows": self.failed,
+                "eta": now_datetime() + timedelta(seconds=eta_seconds) if eta_seconds is not None else None,
+                "row_errors": "\n".join(self.errors) or None,
+            },
+            update_modified=False,
+        )
+        frappe.cache.set_value(get_status_cache_key(self.job.name), state, expires_in_sec=STATUS_CACHE_TTL)
+        return state
+
+    def publish(self, state):
+        if not self.event:
+            return
+        try:
+            frappe.publish_realtime(self.event, state, user=self.user)
+        except Exception:
+            # Progress is best effort; never fail the operation over it
+            pass
+
+    def finish(self, message=None):
+        if self.total:
+            self.done = max(self.done, self.total)
+        self.message = message or self.message
+        self.job.set_status("Completed")
+        state = self.save()
+        state["progress"] = 100
+        self.publish(state)
+
+    def fail(self, error=None):
+        self.job.set_status("Failed", error=error or frappe.get_traceback())
+        self.publish(self.save())
+
+
+@frappe.whitelist()
+def get_job_status(job=None, job_type=None, reference_doctype=None, reference_name=None):
+    """Current state of a job, or of the latest job of `job_type` for a document"""
+    if not job:
+        job = frappe.db.get_value(
+            "Project Costing Job",
+            {"job_type": job_type, "reference_doctype": reference_doctype, "reference_name": reference_name},
+            "name",
+            order_by="creation desc",
+        )
+        if not job:
+            return None
+
+    doc = frappe.get_doc("Project Costing Job", job)
+    doc.check_permission("read")
+
+    state = frappe.cache.get_value(get_status_cache_key(doc.name))
+    if state:
+        return state
+
+    percent = None
+    if doc.total_rows:
+        percent = min(cint(doc.processed_rows) / doc.total_rows * 100, 100)
+    return {
+        "job": doc.name,
+        "job_type": doc.job_type,
+        "status": doc.status,
+        "progress": percent,
+        "done": cint(doc.processed_rows),
+        "total": cint(doc.total_rows) or None,
+        "failed": cint(doc.failed_rows),
+        "eta": doc.eta,
+        "message": None,
+        "errors": (doc.row_errors or "").splitlines(),
+    }
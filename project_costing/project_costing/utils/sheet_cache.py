@@ -0,0 +1,152 @@
+import hashlib
+import os
+import shutil
+
+import frappe
+import pandas as pd
+
+# On-disk cache of parsed workbooks. Parsing the XLSX is what makes big imports and
+# dry runs slow, and planners re-upload the same workbook while they fix mappings, so
+# the parsed chunks are kept as Parquet files under the site's private files, keyed
+# by a hash of the file content. Least recently used entries are evicted once the
+# cache grows past SHEET_CACHE_MAX_BYTES. The cache is best effort: when it cannot be
+# read or written (e.g. no Parquet engine), the file is parsed as before.
+
+SHEET_CACHE_DIR = "project_costing_sheet_cache"
+SHEET_CACHE_MAX_BYTES = 512 * 1024 * 1024
+SHEET_CACHE_VERSION = 3  # bump when the parsed chunks change shape
+PART_NAME = "part-{:05d}.parquet"
+# Numeric cells of a column that also holds text are stored in a sibling column
+NUMBERS_PREFIX = "__numbers__:"
+
+
+def get_cache_root():
+    return frappe.get_site_path("private", "files", SHEET_CACHE_DIR)
+
+
+def lookup_sheet_cache(file_path, chunksize):
+    """`(key, cached part files or None)`; `(None, None)` when caching is not possible"""
+    try:
+        pd.io.parquet.get_engine("auto")  # raises ImportError without pyarrow/fastparquet
+        key = get_cache_key(file_path, chunksize)
+        return key, get_cached_parts(key)
+    except Exception:
+        return None, None
+
+
+def get_cache_key(file_path, chunksize):
+    """Hash of the file content, the chunk size and the cache version"""
+    digest = hashlib.sha256(f"{SHEET_CACHE_VERSION}:{chunksize}:".encode())
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_cached_parts(key):
+    """Part files of a complete entry, marked as just used; None on a miss"""
+    path = os.path.join(get_cache_root(), key)
+    if not os.path.isdir(path):
+        return None
+
+    os.utime(path)
+    return [os.path.join(path, name) for name in sorted(os.listdir(path))]
+
+
+def iter_cached_chunks(parts):
+    for part in parts:
+        yield restore_stored_frame(pd.read_parquet(part))
+
+
+def cache_chunks(key, chunks):
+    """Pass the parsed `chunks` through while writing them under `key`.
+
+    Chunks go to a hidden directory that is renamed into place only once every
+    chunk was read, so a reader never sees a partial entry. Yields the chunks as
+    they are stored, so this run sees the same data a cached run will.
+    """
+    root = get_cache_root()
+    partial = os.path.join(root, f".{key}.{frappe.generate_hash(length=10)}")
+    try:
+        os.makedirs(partial)
+        writing = True
+    except OSError:
+        writing = False
+
+    complete = False
+    try:
+        for number, chunk in enumerate(chunks):
+            if writing:
+                try:
+                    stored = get_storable_frame(chunk)
+                    # The index holds the sheet row numbers
+                    stored.to_parquet(os.path.join(partial, PART_NAME.format(number)), index=True)
+                    chunk = restore_stored_frame(stored)
+                except Exception:
+                    writing = False
+            yield chunk
+        complete = True
+    finally:
+        if writing and complete:
+            try:
+                os.rename(partial, os.path.join(root, key))
+            except OSError:
+                pass  # a parallel import stored the same file first
+            else:
+                evict_sheet_cache()
+        shutil.rmtree(partial, ignore_errors=True)
+
+
+def get_storable_frame(chunk):
+    """A frame Parquet can store. Columns mixing text and numbers keep their text
+    cells and move the numeric ones to a NUMBERS_PREFIX sibling column, so readers
+    that treat numeric cells apart (e.g. WBS code columns) see them unchanged;
+    other non-text cells are stored as text"""
+    chunk = chunk.copy()
+    for column in list(chunk.columns):
+        values = chunk[column]
+        if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) not in ("string", "empty"):
+            is_number = values.map(lambda value: pd.api.types.is_number(value) and not isinstance(value, bool))
+            chunk[column] = values.astype(str).where(values.notna() & ~is_number, None)
+            if is_number.any():
+                chunk[NUMBERS_PREFIX + str(column)] = pd.to_numeric(values.where(is_number), errors="coerce")
+    return chunk
+
+
+def restore_stored_frame(stored):
+    """Undo `get_storable_frame`: numeric cells go back into their column, whole
+    numbers as int like the Excel readers return them"""
+    siblings = [column for column in stored.columns if str(column).startswith(NUMBERS_PREFIX)]
+    if not siblings:
+        return stored
+
+    stored = stored.copy()
+    for sibling in siblings:
+        column = sibling[len(NUMBERS_PREFIX):]
+        numbers = stored.pop(sibling)
+        values = stored[column].astype(object)
+        for index, number in numbers.dropna().items():
+            values.at[index] = int(number) if float(number).is_integer() else float(number)
+        stored[column] = values
+    return stored
+
+
+def evict_sheet_cache(max_bytes=SHEET_CACHE_MAX_BYTES):
+    """Delete least recently used entries until the cache fits in `max_bytes`;
+    returns the size left"""
+    root = get_cache_root()
+    entries = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.startswith(".") or not os.path.isdir(path):
+            continue  # still being written
+        size = sum(os.path.getsize(os.path.join(path, part)) for part in os.listdir(path))
+        entries.append((os.path.getmtime(path), size, path))
+
+    total = sum(size for _mtime, size, _path in entries)
+    for _mtime, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+    return total
@@ -0,0 +1,134 @@
+import pandas as pd
+from openpyxl import load_workbook
+
+from project_costing.project_costing.utils.sheet_cache import (
+    cache_chunks,
+    iter_cached_chunks,
+    lookup_sheet_cache,
+)
+
+# Streaming readers for the BOQ / WBS import sheets. Rows are pulled lazily from the
+# workbook (openpyxl read-only mode) or from the CSV (pandas chunks), so peak memory
+# depends on the chunk size and not on the size of the uploaded file. Parsed
+# workbooks are kept in the sheet cache, so re-importing the same file skips parsing.
+# Blank rows are skipped and every chunk is indexed by the spreadsheet row of each
+# row (row 1 is the header), so reports can point at the row the user sees.
+
+STREAM_CHUNK_SIZE = 5000
+
+
+def iter_sheet_chunks(file_path, chunksize=STREAM_CHUNK_SIZE):
+    """Yield the first sheet of `file_path` (or the CSV) as DataFrame chunks.
+
+    The first row is used as header, like `pd.read_excel(path, header=0)`.
+    """
+    if file_path.lower().endswith('.csv'):
+        # Chunked CSV reading is as fast as the cache would be
+        yield from parse_sheet_chunks(file_path, chunksize)
+        return
+
+    key, parts = lookup_sheet_cache(file_path, chunksize)
+    if parts is not None:
+        yield from iter_cached_chunks(parts)
+    elif key:
+        yield from cache_chunks(key, parse_sheet_chunks(file_path, chunksize))
+    else:
+        yield from parse_sheet_chunks(file_path, chunksize)
+
+
+def parse_sheet_chunks(file_path, chunksize=STREAM_CHUNK_SIZE):
+    lower_path = file_path.lower()
+
+    if lower_path.endswith('.csv'):
+        # Blank lines are kept while reading so the running index stays the record number
+        for chunk in pd.read_csv(file_path, header=0, chunksize=chunksize, skip_blank_lines=False):
+            chunk = drop_blank_rows(chunk)
+            if not chunk.empty:
+                yield chunk
+        return
+
+    if lower_path.endswith('.xls'):
+        # The legacy binary format has no streaming reader
+        yield drop_blank_rows(pd.read_excel(file_path, header=0))
+        return
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        columns = get_header_names(header)
+        width = len(columns)
+        block, numbers = [], []
+        for number, values in enumerate(rows, start=2):
+            if all(value is None for value in values):
+                continue
+
+            values = tuple(values[:width])
+            block.append(values + (None,) * (width - len(values)))
+            numbers.append(number)
+            if len(block) >= chunksize:
+                yield pd.DataFrame.from_records(block, columns=columns, index=pd.Index(numbers))
+                block, numbers = [], []
+
+        if block:
+            yield pd.DataFrame.from_records(block, columns=columns, index=pd.Index(numbers))
+    finally:
+        workbook.close()
+
+
+def drop_blank_rows(frame):
+    """Index a parsed frame (0 = first data row) by sheet row and drop its blank rows"""
+    frame.index = frame.index + 2
+    return frame.dropna(how='all')
+
+
+def iter_sheet_records(file_path, columns=None, chunksize=STREAM_CHUNK_SIZE):
+    """Yield sheet rows as dicts with empty cells as None.
+
+    When `columns` is given only those headers are kept, which keeps rows small
+    for callers that have to hold on to them.
+    """
+    for chunk in iter_sheet_chunks(file_path, chunksize=chunksize):
+        if columns is not None:
+            chunk = chunk.reindex(columns=[c for c in columns if c in chunk.columns])
+
+        chunk = chunk.astype(object).where(pd.notnull(chunk), None)
+        yield from chunk.to_dict('records')
+
+
+def count_sheet_rows(file_path):
+    """Cheap data row count used for progress; None when it cannot be known upfront"""
+    lower_path = file_path.lower()
+
+    if lower_path.endswith('.csv'):
+        with open(file_path, 'rb') as f:
+            lines = sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b''))
+        return max(lines - 1, 0)
+
+    if lower_path.endswith('.xls'):
+        return None
+
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        max_row = workbook.worksheets[0].max_row
+        return max(max_row - 1, 0) if max_row else None
+    finally:
+        workbook.close()
+
+
+def get_header_names(header):
+    """Column labels for a header row, matching the pandas defaults for blanks and duplicates"""
+    names = []
+    seen = {}
+    for position, value in enumerate(header):
+        name = str(value).strip() if value is not None else f"Unnamed: {position}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names